@@ -0,0 +1,195 @@
+"""
+기한 기반 단계적 품질 낮추기 (degradation)
+요청마다 처리 기한(X-Deadline-Ms 헤더, 기본 FG_DEADLINE_MS)이 있을 때 남은 시간 안에 끝나지 않을 것 같으면
+더 싼 전략으로 바꾼다. 적용한 항목은 응답의 degradations에 남는다.
+
+- pruned_prompt: 명령과 관련된 기기의 스키마/상태만 넣은 프롬프트 (FG_DEVICE_ROUTER=keyword면 원래 적용됨)
+- stt_model:<크기>: 더 작은 Whisper 모델 (FG_STT_FALLBACK_MODEL, 기본 tiny)
+- max_new_tokens:<n>: 평소 생성 길이의 2배도 디코드할 시간이 없으면 남은 시간에 디코드할 수 있는 만큼으로 제한
+  (기한을 넘겨 504가 되는 대신 그때까지 만든 호출이라도 반환. FG_DEGRADE_MIN_NEW_TOKENS 아래로는 줄이지 않음)
+  제한이 기본 MAX_NEW_TOKENS보다 작고 생성이 실제로 그 길이에서 멈췄을 때만 degradations에 남긴다
+
+순서는 품질 손실이 작은 것부터: 프롬프트 줄이기 -> (그래도 안 되면) 작은 STT -> 생성 길이 제한.
+단계별 소요 시간은 관측값의 지수 이동 평균으로 추정하고, 관측 전에는 낮추지 않는다.
+생성 계획은 작업이 워커에서 시작될 때 세우므로 큐에서 기다린 시간도 반영된다.
+
+    size = planner.stt_size(token, "base")
+    plan = planner.plan_generation(token, prune_default)   # 워커 스레드에서
+    planner.observe_generation(result)
+    degradations = plan.applied(result)
+"""
+import os
+import time
+from typing import Optional
+
+from execution import CancelToken
+from function_gemma import MAX_NEW_TOKENS
+
+# 줄인 프롬프트를 관측하기 전, 전체 프롬프트 대비 디코드 외 시간 비율 추정치 (프롬프트가 몇 배 짧아짐)
+PRUNED_PROMPT_PRIOR = 0.5
+
+
+class _Ewma:
+    """지수 이동 평균 (관측 전에는 None)"""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, sample: float):
+        self.value = sample if self.value is None else self.value + self.alpha * (sample - self.value)
+
+
+class GenerationPlan:
+    """생성 한 번의 전략 (prune=None이면 모델 기본값, max_new_tokens=None이면 기본 길이)"""
+
+    __slots__ = ("prune", "max_new_tokens", "degradations")
+
+    def __init__(self, prune: Optional[bool] = None, max_new_tokens: Optional[int] = None):
+        self.prune = prune
+        self.max_new_tokens = max_new_tokens
+        self.degradations: list[str] = []
+
+    def applied(self, result: dict) -> list[str]:
+        """생성 결과에 실제로 적용된 degradation (길이 제한은 생성이 그 길이에서 멈췄을 때만)"""
+        if self.max_new_tokens is not None and result.get("hit_token_limit"):
+            return self.degradations + [f"max_new_tokens:{self.max_new_tokens}"]
+        return list(self.degradations)
+
+
+class DegradationPlanner:
+    """
+    남은 기한과 단계별 추정 시간으로 전략 선택
+
+    관측/계획은 모델 워커 스레드에서 한다 (STT는 whisper 워커, 생성은 gemma 워커가 각자의 값만 갱신).
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        stt_fallback: str = "tiny",
+        min_new_tokens: int = 32,
+        headroom: float = 0.9,
+        alpha: float = 0.2
+    ):
+        self.enabled = enabled
+        self.stt_fallback = stt_fallback
+        self.min_new_tokens = min_new_tokens
+        self.headroom = headroom  # 남은 시간 중 계획에 쓰는 비율 (함수 실행/응답 여유)
+        self.alpha = alpha
+        self._stt: dict[str, _Ewma] = {}
+        # 프롬프트 종류별(pruned 여부) 디코드 외 시간 (템플릿 + prefill + 파싱 + 어댑터 전환)
+        self._fixed = {False: _Ewma(alpha), True: _Ewma(alpha)}
+        self._generated_tokens = _Ewma(alpha)
+        self._seconds_per_token = _Ewma(alpha)
+
+    @classmethod
+    def from_env(cls) -> "DegradationPlanner":
+        return cls(
+            enabled=os.getenv("FG_DEGRADE", "1") == "1",
+            stt_fallback=os.getenv("FG_STT_FALLBACK_MODEL", "tiny"),
+            min_new_tokens=int(os.getenv("FG_DEGRADE_MIN_NEW_TOKENS", "32"))
+        )
+
+    def _budget(self, token: CancelToken) -> Optional[float]:
+        """계획에 쓸 남은 시간 (초). 기한이 없거나 꺼져 있으면 None"""
+        if not self.enabled or token.deadline is None:
+            return None
+        return (token.deadline - time.monotonic()) * self.headroom
+
+    # === 관측 ===
+
+    def observe_stt(self, model_size: str, seconds: float):
+        self._stt.setdefault(model_size, _Ewma(self.alpha)).update(seconds)
+
+    def observe_generation(self, result: dict):
+        """generate_function_call 결과의 timings/토큰 수 반영 (전체 목록 재시도가 섞인 결과는 제외)"""
+        timings = result.get("timings")
+        route = result.get("route") or {}
+        if not timings or route.get("retried"):
+            return
+        decode = timings.get("decode", 0.0)
+        generated = result.get("generated_tokens", 0)
+        self._fixed[bool(route.get("pruned"))].update(sum(timings.values()) - decode)
+        self._generated_tokens.update(generated)
+        if generated > 1:
+            # 첫 토큰은 prefill에 포함됨
+            self._seconds_per_token.update(decode / (generated - 1))
+
+    # === 추정 ===
+
+    def _fixed_seconds(self, pruned: bool) -> Optional[float]:
+        """디코드 외 시간 추정 (줄인 프롬프트를 본 적 없으면 전체 프롬프트 값 * PRUNED_PROMPT_PRIOR)"""
+        fixed = self._fixed[pruned].value
+        if fixed is None and pruned and self._fixed[False].value is not None:
+            fixed = self._fixed[False].value * PRUNED_PROMPT_PRIOR
+        return fixed
+
+    def estimate_generation(self, pruned: bool) -> Optional[float]:
+        """생성 한 번의 예상 시간 (관측 전이면 None)"""
+        fixed = self._fixed_seconds(pruned)
+        if fixed is None or self._seconds_per_token.value is None:
+            return None
+        return fixed + self._generated_tokens.value * self._seconds_per_token.value
+
+    def estimate_stt(self, model_size: str) -> Optional[float]:
+        ewma = self._stt.get(model_size)
+        return ewma.value if ewma is not None else None
+
+    # === 계획 ===
+
+    def stt_size(self, token: CancelToken, model_size: str) -> str:
+        """
+        음성 인식 모델 크기 선택
+
+        기본 모델 + 생성(줄인 프롬프트 기준)이 남은 시간을 넘을 것 같을 때만 작은 모델로 바꾼다.
+        """
+        budget = self._budget(token)
+        stt = self.estimate_stt(model_size)
+        if budget is None or stt is None or self.stt_fallback == model_size:
+            return model_size
+        generation = self.estimate_generation(pruned=True) or 0.0
+        return self.stt_fallback if stt + generation > budget else model_size
+
+    def plan_generation(self, token: CancelToken, prune_default: bool) -> GenerationPlan:
+        """생성 직전(워커 스레드)의 남은 시간으로 프롬프트 줄이기 / 생성 길이 제한 결정"""
+        plan = GenerationPlan()
+        budget = self._budget(token)
+        if budget is None:
+            return plan
+        pruned = prune_default
+        full = self.estimate_generation(pruned=False)
+        if not prune_default and full is not None and full > budget:
+            plan.prune = pruned = True
+            plan.degradations.append("pruned_prompt")
+
+        fixed = self._fixed_seconds(pruned)
+        per_token = self._seconds_per_token.value
+        if fixed is None or per_token is None or per_token <= 0:
+            return plan
+        affordable = int((budget - fixed) / per_token) + 1  # 첫 토큰은 prefill에 포함
+        cap = max(self.min_new_tokens, affordable)
+        if affordable < 2 * self._generated_tokens.value and cap < MAX_NEW_TOKENS:
+            # degradations에는 생성 후 applied()에서 실제로 잘렸을 때만 추가
+            plan.max_new_tokens = cap
+        return plan
+
+    def stats(self) -> dict:
+        def rounded(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds, 4) if seconds is not None else None
+
+        def value(ewma: _Ewma) -> Optional[float]:
+            return rounded(ewma.value)
+
+        return {
+            "enabled": self.enabled,
+            "stt_seconds": {size: value(ewma) for size, ewma in self._stt.items()},
+            "generation_seconds": {
+                "full": rounded(self.estimate_generation(pruned=False)),
+                "pruned": rounded(self.estimate_generation(pruned=True)),
+            },
+            "seconds_per_token": value(self._seconds_per_token),
+            "generated_tokens": value(self._generated_tokens),
+        }
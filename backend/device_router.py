@@ -0,0 +1,117 @@
+"""
+키워드 기반 기기 라우터
+사용자 입력에서 관련 기기 그룹을 골라 프롬프트의 함수 스키마와 기기 상태 줄을 줄인다.
+
+- 기기 키워드(에어컨, 커튼, 넷플릭스 ...)가 하나라도 있으면 해당 그룹만 사용
+- 기기 키워드가 없으면 속성 힌트(볼륨 -> TV/오디오, 온도 -> 에어컨 ...)로 추정
+- 둘 다 없으면 전체 스키마로 대체 (pruned=False)
+
+정규식 하나로 입력을 한 번 훑으므로 수 마이크로초 수준이다.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from home_controller import HOME_FUNCTION_SCHEMAS
+
+DEVICE_GROUPS = ("ac", "tv", "light", "vacuum", "audio", "curtain", "ventilation")
+
+# 기기를 직접 가리키는 키워드 (소문자)
+DEVICE_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "ac": ("에어컨", "에어콘", "냉방", "난방", "냉난방", "air conditioner", "aircon"),
+    "tv": (
+        "tv", "티비", "티브이", "텔레비전", "채널", "유튜브", "youtube", "넷플릭스", "netflix",
+        "디즈니", "disney", "웨이브", "wavve", "티빙", "tving", "왓챠", "watcha", "쿠팡플레이",
+        "coupang", "아마존", "prime", "애플티비", "apple tv", "라프텔", "laftel",
+    ),
+    "light": (
+        "조명", "전등", "거실등", "불 켜", "불 꺼", "불켜", "불꺼", "불 좀", "밝기", "색온도",
+        "light", "lamp", "램프",
+    ),
+    "vacuum": ("청소", "로봇", "충전대", "도킹", "vacuum", "robot"),
+    "audio": ("오디오", "음악", "노래", "스피커", "플레이리스트", "audio", "music", "speaker", "playlist"),
+    "curtain": ("커튼", "블라인드", "curtain", "blind"),
+    "ventilation": ("환풍기", "환기", "ventilation", "ventilator", "후드"),
+}
+
+# 기기 키워드가 없을 때만 쓰는 속성/장면 힌트
+HINT_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "볼륨": ("tv", "audio"),
+    "소리": ("tv", "audio"),
+    "volume": ("tv", "audio"),
+    "온도": ("ac",),
+    "모드": ("ac",),
+    "팬": ("ac", "ventilation"),
+    "속도": ("ac", "ventilation"),
+    "재생": ("audio", "tv"),
+    "일시정지": ("audio", "vacuum"),
+    "멈춰": ("audio", "vacuum", "curtain"),
+    "정지": ("audio", "vacuum", "curtain"),
+    "퍼센트": ("curtain", "light"),
+    "영화": ("tv", "light", "curtain"),
+}
+
+
+def _build_pattern() -> re.Pattern:
+    keywords = {keyword for group in DEVICE_KEYWORDS.values() for keyword in group} | set(HINT_KEYWORDS)
+    alternation = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(alternation)
+
+
+_KEYWORD_PATTERN = _build_pattern()
+_DEVICE_OF = {keyword: group for group, keywords in DEVICE_KEYWORDS.items() for keyword in keywords}
+
+
+@dataclass(frozen=True, slots=True)
+class RouteDecision:
+    """라우팅 결과 (pruned=False면 전체 스키마 사용)"""
+    groups: tuple[str, ...]
+    pruned: bool
+
+    def to_dict(self) -> dict:
+        return {"groups": list(self.groups), "pruned": self.pruned}
+
+
+FULL_ROUTE = RouteDecision(groups=DEVICE_GROUPS, pruned=False)
+
+
+def route_devices(text: str) -> RouteDecision:
+    """입력 문장에서 관련 기기 그룹 선택"""
+    devices: set[str] = set()
+    hints: set[str] = set()
+    for match in _KEYWORD_PATTERN.finditer(text.lower()):
+        keyword = match.group(0)
+        group = _DEVICE_OF.get(keyword)
+        if group is not None:
+            devices.add(group)
+        else:
+            hints.update(HINT_KEYWORDS[keyword])
+
+    selected = devices or hints
+    if not selected or len(selected) == len(DEVICE_GROUPS):
+        return FULL_ROUTE
+    return RouteDecision(groups=tuple(g for g in DEVICE_GROUPS if g in selected), pruned=True)
+
+
+def schema_group(schema: dict) -> Optional[str]:
+    """함수 이름 접두어로 기기 그룹 판별 (알 수 없으면 None)"""
+    prefix = schema["function"]["name"].split("_", 1)[0]
+    return prefix if prefix in DEVICE_GROUPS else None
+
+
+@lru_cache(maxsize=None)
+def schemas_for(groups: tuple[str, ...]) -> list[dict]:
+    """그룹에 해당하는 함수 스키마 (그룹을 알 수 없는 스키마는 항상 포함)"""
+    wanted = set(groups)
+    return [
+        schema for schema in HOME_FUNCTION_SCHEMAS
+        if schema_group(schema) is None or schema_group(schema) in wanted
+    ]
+
+
+def prune_context(context: Optional[dict], groups: tuple[str, ...]) -> Optional[dict]:
+    """프롬프트에 넣을 기기 상태를 그룹으로 제한"""
+    if not context:
+        return context
+    return {key: value for key, value in context.items() if key in groups}
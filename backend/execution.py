@@ -0,0 +1,318 @@
+"""
+모델 패밀리별 실행 자원 관리
+FunctionGemma / Whisper를 각각 전용 워커 스레드(작업 큐)에서 실행한다.
+
+- 패밀리마다 워커 스레드 1개: 같은 모델 호출은 순서대로 처리되고 이벤트 루프는 막히지 않는다
+- 워커마다 torch intra-op 스레드 수 지정 (FG_GEMMA_THREADS, FG_WHISPER_THREADS)
+- 선택적으로 CPU 코어 고정 (FG_GEMMA_CPUS="0-3", FG_WHISPER_CPUS="4,5" ...)
+  워커 스레드에 걸면 그 스레드가 만드는 OpenMP 스레드도 같은 코어를 쓴다
+- 스레드 수를 지정하지 않으면 코어를 나눠 씀: whisper는 코어의 1/3, gemma는 나머지
+  (0이면 torch 기본값 = 전체 코어)
+- 작업 큐는 우선순위 순: 음성 > 대화형 텍스트 > 배치/재생 (같은 우선순위는 도착 순)
+  낮은 우선순위도 FG_SCHEDULER_MAX_WAIT_MS(기본 5000) 넘게 기다리면 먼저 실행해 굶지 않게 한다. (0이면 도착 순)
+  실행 중인 작업을 끊고 끼어들지는 않으므로 배치는 작은 작업으로 나눠 넣는다.
+- CancelToken: 요청 하나의 협조적 취소 신호 (연결 끊김/기한 초과).
+  실행 전에 취소된 작업은 건너뛰고, 실행 중인 생성은 StoppingCriteria로 토큰 단위로 확인해 멈춘다.
+- profile: 작업을 워커 스레드에서 감쌀 요청 단위 프로파일러 (profile.job(family) 컨텍스트 매니저).
+  지정하지 않으면 JOB_PROFILE(프로파일링 미들웨어가 요청 동안 설정)을 쓴다.
+
+torch 스레드 수는 OpenMP 설정이라 호출한 스레드에만 적용되므로 워커 스레드 안에서 설정한다.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Callable, Optional
+
+FAMILIES = ("gemma", "whisper")
+
+# 지금 처리 중인 요청의 프로파일러 (없으면 None). submit 시점에 읽어 작업에 붙인다
+JOB_PROFILE: ContextVar[Optional[Any]] = ContextVar("fg_job_profile", default=None)
+
+
+class Priority(IntEnum):
+    """작업 우선순위 (작을수록 먼저)"""
+    VOICE = 0
+    INTERACTIVE = 1
+    BATCH = 2
+
+
+class JobCancelled(Exception):
+    """취소 신호로 실행하지 않았거나 중간에 멈춘 작업 (reason: "disconnected", "deadline" ...)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """요청 하나의 취소 신호 (스레드 안전, deadline은 time.monotonic() 기준)"""
+
+    __slots__ = ("deadline", "reason", "_event")
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        return False
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.reason)
+
+
+def parse_cpu_list(spec: str) -> list[int]:
+    """ "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11] """
+    cpus: list[int] = []
+    for part in filter(None, (piece.strip() for piece in spec.split(","))):
+        first, separator, last = part.partition("-")
+        if separator:
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(first))
+    return sorted(set(cpus))
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_threads(family: str, cpus: int) -> int:
+    """코어 분할 기본값: 음성 1/3, FunctionGemma 나머지 (최소 1)"""
+    side = max(1, cpus // 3)
+    if family == "gemma":
+        return max(1, cpus - side)
+    return side
+
+
+class _Job:
+    __slots__ = ("priority", "enqueued_at", "fn", "args", "kwargs", "token", "profile", "future")
+
+    def __init__(self, priority: Priority, fn: Callable, args: tuple, kwargs: dict, token: Optional[CancelToken],
+                 profile: Optional[Any] = None):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = token
+        self.profile = profile
+        self.future: Future = Future()
+
+
+class ModelExecutor:
+    """모델 패밀리 하나의 전용 워커 스레드 + 우선순위 작업 큐"""
+
+    def __init__(self, family: str, threads: int, cpus: Optional[list[int]] = None, max_wait: float = 5.0):
+        self.family = family
+        self.threads = threads
+        self.cpus = cpus or None
+        self.max_wait = max_wait
+        self.jobs = 0
+        self.cancelled = 0
+        self.busy_seconds = 0.0
+        self._queues: dict[Priority, deque[_Job]] = {priority: deque() for priority in Priority}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _configure(self):
+        """워커 스레드 시작 시 한 번: 코어 고정 + torch 스레드 수"""
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpus)  # Linux: 0은 호출한 스레드
+        if self.threads > 0:
+            try:
+                import torch
+            except ImportError:  # torch 없이 스텁 모델로 띄운 경우
+                return
+            # 첫 병렬 연산 때 전역 값으로 덮어쓰지 않도록 이 스레드의 초기화를 먼저 끝냄
+            torch.get_num_threads()
+            torch.set_num_threads(self.threads)
+
+    def _next_job(self) -> _Job:
+        """가장 높은 우선순위의 가장 오래된 작업 (max_wait 넘게 기다린 작업이 있으면 그중 가장 오래된 것)"""
+        now = time.monotonic()
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        starving = [job for job in heads if now - job.enqueued_at >= self.max_wait]
+        if starving:
+            job = min(starving, key=lambda job: job.enqueued_at)
+        else:
+            job = min(heads, key=lambda job: job.priority)
+        return self._queues[job.priority].popleft()
+
+    def _worker(self):
+        self._configure()
+        while True:
+            with self._condition:
+                while not self._closed and not self.queued:
+                    self._condition.wait()
+                if not self.queued:
+                    return
+                job = self._next_job()
+            self._execute(job)
+
+    def _execute(self, job: _Job):
+        if not job.future.set_running_or_notify_cancel():
+            return  # 기다리던 쪽이 먼저 취소함
+        if job.token is not None and job.token.cancelled:
+            with self._condition:
+                self.cancelled += 1
+            job.future.set_exception(JobCancelled(job.token.reason))
+            return
+        started = time.perf_counter()
+        try:
+            # 프로파일 중인 요청의 작업이면 이 작업 동안만 이 스레드를 프로파일링
+            with job.profile.job(self.family) if job.profile is not None else nullcontext():
+                result = job.fn(*job.args, **job.kwargs)
+        except BaseException as exc:
+            if isinstance(exc, JobCancelled):
+                with self._condition:
+                    self.cancelled += 1
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._condition:
+                self.jobs += 1
+                self.busy_seconds += elapsed
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        token: Optional[CancelToken] = None,
+        profile: Optional[Any] = None,
+        **kwargs
+    ) -> Future:
+        job = _Job(priority, fn, args, kwargs, token, profile if profile is not None else JOB_PROFILE.get())
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"{self.family} 실행기가 종료되었습니다.")
+            if self._thread is None:
+                # 첫 작업 때 워커 시작 (서버 기동 시 torch를 임포트하지 않도록)
+                self._thread = threading.Thread(target=self._worker, name=f"fg-{self.family}", daemon=True)
+                self._thread.start()
+            self._queues[priority].append(job)
+            self._condition.notify()
+        return job.future
+
+    async def run(
+        self,
+        fn: Callable,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        token: Optional[CancelToken] = None,
+        profile: Optional[Any] = None,
+        **kwargs
+    ):
+        """워커 스레드에서 fn 실행 (우선순위 큐 순서대로). 기다리다 취소되면 token도 취소"""
+        future = self.submit(fn, *args, priority=priority, token=token, profile=profile, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if token is not None:
+                token.cancel("cancelled")
+            raise
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "threads": self.threads,
+                "cpus": self.cpus,
+                "jobs": self.jobs,
+                "queued": self.queued,
+                "queued_by_priority": {priority.name.lower(): len(queue) for priority, queue in self._queues.items()},
+                "cancelled": self.cancelled,
+                "busy_seconds": round(self.busy_seconds, 3),
+            }
+
+    def shutdown(self, wait: bool = True):
+        """새 작업을 막고, 남은 작업을 처리한 뒤 워커 종료"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+
+class ExecutionManager:
+    """패밀리 이름 -> ModelExecutor"""
+
+    def __init__(self, executors: dict[str, ModelExecutor]):
+        self.executors = executors
+
+    @classmethod
+    def from_env(cls) -> "ExecutionManager":
+        cpus = available_cpus()
+        max_wait = float(os.getenv("FG_SCHEDULER_MAX_WAIT_MS", "5000")) / 1000
+        executors = {}
+        for family in FAMILIES:
+            prefix = f"FG_{family.upper()}"
+            threads = os.getenv(f"{prefix}_THREADS")
+            cpu_spec = os.getenv(f"{prefix}_CPUS")
+            cpu_list = parse_cpu_list(cpu_spec) if cpu_spec else None
+            if threads is not None:
+                thread_count = int(threads)
+            elif cpu_list:
+                thread_count = len(cpu_list)
+            else:
+                thread_count = default_threads(family, cpus)
+            executors[family] = ModelExecutor(family, thread_count, cpu_list, max_wait=max_wait)
+        return cls(executors)
+
+    async def run(
+        self,
+        family: str,
+        fn: Callable,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        token: Optional[CancelToken] = None,
+        profile: Optional[Any] = None,
+        **kwargs
+    ):
+        return await self.executors[family].run(fn, *args, priority=priority, token=token, profile=profile, **kwargs)
+
+    def stats(self) -> dict:
+        return {family: executor.stats() for family, executor in self.executors.items()}
+
+    def shutdown(self, wait: bool = True):
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
+
+
+# 전역 인스턴스
+_manager: Optional[ExecutionManager] = None
+
+
+def get_execution_manager() -> ExecutionManager:
+    """실행 자원 관리자 (싱글톤, 환경 변수로 구성)"""
+    global _manager
+    if _manager is None:
+        _manager = ExecutionManager.from_env()
+    return _manager
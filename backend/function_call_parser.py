@@ -0,0 +1,376 @@
+"""
+FunctionGemma 출력 함수 호출 파서 (단일 패스 상태 머신)
+백엔드(function_gemma.py)와 학습 스크립트(training/quick_infer.py)가 함께 사용
+
+지원 형식:
+    <start_function_call>call:name{key:<escape>value<escape>,key:value}<end_function_call>
+    <start_of_function_call>...<end_of_function_call>
+    블록 없는 call:name{...} / call:name(...)
+    JSON ({"name": ..., "arguments": {...}}, {"function": {...}}, {"function_call": {...}})
+
+블록 안의 호출이 하나라도 있으면 그것만 사용하고, 없으면 블록 밖 call:, 그다음 JSON 순으로 대체한다.
+스트리밍 중에는 FunctionCallParser.feed()로 조각을 넣으면 완성된 블록 호출을 바로 돌려준다.
+"""
+import json
+from json.decoder import scanstring
+from typing import Any, Optional
+
+START_PREFIX = "<start_"
+END_PREFIX = "<end_"
+START_TOKENS = ("<start_function_call>", "<start_of_function_call>")
+END_TOKENS = ("<end_function_call>", "<end_of_function_call>")
+ESCAPE = "<escape>"
+CALL_PREFIX = "call:"
+
+_MAX_START = max(len(token) for token in START_TOKENS)
+_MAX_END = max(len(token) for token in END_TOKENS)
+_CLOSERS = {"{": "}", "(": ")"}
+_WHITESPACE = " \t\r\n"
+_SEPARATORS = _WHITESPACE + ",{"
+_JSON_DECODER = json.JSONDecoder()
+
+
+def coerce_value(value: Any) -> Any:
+    """문자열 값을 bool/int/float로 변환 (따옴표 제거, 변환 불가 시 문자열 그대로)"""
+    if not isinstance(value, str):
+        return value
+
+    cleaned = value.strip().strip('"').strip("'")
+    lowered = cleaned.lower()
+
+    if lowered in ("true", "false"):
+        return lowered == "true"
+
+    try:
+        if cleaned.lstrip("+-").isdigit():
+            return int(cleaned)
+        if cleaned.replace(".", "", 1).lstrip("+-").isdigit():
+            return float(cleaned)
+    except ValueError:  # "+-1", 유니코드 숫자 등
+        pass
+
+    return cleaned
+
+
+def _coerce_bare(value: str) -> Any:
+    return None if value == "null" else coerce_value(value)
+
+
+def parse_parameters(text: str) -> dict:
+    """
+    파라미터 본문 파싱 (한 번 훑기)
+
+    key:<escape>value<escape>, key:value, "key": "value", "key": {...} 를 섞어 써도 된다.
+    """
+    text = text.strip()
+    if not text:
+        return {}
+
+    if text[0] == "{" and text[-1] == "}":
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return {k: coerce_value(v) for k, v in parsed.items()}
+
+    params: dict = {}
+    i, n = 0, len(text)
+    while i < n:
+        # 구분자 건너뛰기
+        while i < n and text[i] in _SEPARATORS:
+            i += 1
+        if i >= n:
+            break
+
+        # 키
+        if text[i] in "\"'":
+            quote = text[i]
+            end = text.find(quote, i + 1)
+            if end == -1:
+                break
+            key = text[i + 1:end]
+            i = end + 1
+            while i < n and text[i] in _WHITESPACE:
+                i += 1
+            if i >= n or text[i] != ":":
+                continue
+        else:
+            colon = text.find(":", i)
+            if colon == -1:
+                break
+            comma = text.find(",", i, colon)
+            if comma != -1:
+                i = comma  # 값 없는 조각은 무시
+                continue
+            key = text[i:colon].rstrip()
+            if not key.isidentifier():
+                # 키는 ':' 바로 앞의 단어 문자만 사용 (앞쪽 잡음 무시)
+                k = len(key)
+                while k > 0 and _is_name_char(key[k - 1]):
+                    k -= 1
+                key = key[k:]
+            i = colon
+        i += 1  # ':'
+        while i < n and text[i] in _WHITESPACE:
+            i += 1
+
+        # 값
+        if text.startswith(ESCAPE, i):
+            start = i + len(ESCAPE)
+            end = text.find(ESCAPE, start)
+            if end == -1:
+                value, i = text[start:], n
+            else:
+                value, i = text[start:end], end + len(ESCAPE)
+            value = coerce_value(value)
+        elif i < n and text[i] == '"':
+            try:
+                value, i = scanstring(text, i + 1)
+            except ValueError:
+                value, i = text[i + 1:], n
+            value = coerce_value(value)
+        elif i < n and text[i] in "{[":
+            try:
+                value, i = _JSON_DECODER.raw_decode(text, i)
+            except ValueError:
+                end = text.find(",", i)
+                end = n if end == -1 else end
+                value, i = _coerce_bare(text[i:end].strip()), end
+        else:
+            end = text.find(",", i)
+            end = n if end == -1 else end
+            value, i = _coerce_bare(text[i:end].strip()), end
+
+        if key:
+            params[key] = value
+    return params
+
+
+def parse_json_function_call(json_text: str) -> Optional[dict]:
+    """JSON 형식 함수 호출 파싱"""
+    try:
+        payload = json.loads(json_text)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(payload, dict):
+        return None
+
+    if "function_call" in payload and isinstance(payload["function_call"], dict):
+        payload = payload["function_call"]
+
+    function_block = payload.get("function")
+    if isinstance(function_block, dict):
+        name = function_block.get("name")
+        arguments = function_block.get("arguments", function_block.get("parameters", {}))
+    else:
+        name = payload.get("name") or payload.get("function_name")
+        arguments = payload.get("arguments", payload.get("parameters", {}))
+
+    if not name:
+        return None
+
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            arguments = {}
+
+    if not isinstance(arguments, dict):
+        arguments = {}
+
+    return {
+        "function_name": name,
+        "parameters": {k: coerce_value(v) for k, v in arguments.items()}
+    }
+
+
+def parse_segment(segment: str) -> Optional[dict]:
+    """<start_function_call>...<end_function_call> 블록 내용 하나 파싱"""
+    text = segment.strip()
+    if text.startswith(CALL_PREFIX):
+        text = text[len(CALL_PREFIX):].strip()
+
+    if text.startswith("{"):
+        parsed = parse_json_function_call(text)
+        if parsed:
+            return parsed
+
+    brace_start = text.find("{")
+    brace_end = text.rfind("}")
+    if brace_start == -1 or brace_end == -1 or brace_end <= brace_start:
+        return None
+
+    function_name = text[:brace_start].strip()
+    if not function_name:
+        return None
+
+    return {
+        "function_name": function_name,
+        "parameters": parse_parameters(text[brace_start + 1:brace_end])
+    }
+
+
+def _is_name_start(char: str) -> bool:
+    return char == "_" or ("a" <= char <= "z") or ("A" <= char <= "Z")
+
+
+def _is_name_char(char: str) -> bool:
+    return char == "_" or char.isalnum()
+
+
+def _match_token(text: str, index: int, tokens: tuple[str, str]) -> Optional[str]:
+    if text.startswith(tokens[0], index):
+        return tokens[0]
+    if text.startswith(tokens[1], index):
+        return tokens[1]
+    return None
+
+
+def _scan_bare_calls(text: str) -> list[tuple[str, str]]:
+    """
+    블록 밖 call:name{...} (없으면 call:name(...)) 찾기
+
+    중괄호 형식이 하나라도 있으면 그것만 쓰고, 괄호 형식끼리는 겹치지 않게 센다.
+    """
+    brace_calls: list[tuple[str, str]] = []
+    paren_calls: list[tuple[str, str]] = []
+    paren_until = 0
+    size = len(text)
+    cursor = 0
+    # 다음 '{' / '(' 위치 (앞으로만 이동하므로 전체 선형)
+    next_brace = next_paren = -1
+    while True:
+        position = text.find(CALL_PREFIX, cursor)
+        if position == -1:
+            break
+        name_start = position + len(CALL_PREFIX)
+        if name_start >= size or not _is_name_start(text[name_start]):
+            cursor = position + 1
+            continue
+        if 0 <= next_brace < name_start or next_brace == -1:
+            next_brace = text.find("{", name_start)
+            next_brace = size if next_brace == -1 else next_brace
+        if 0 <= next_paren < name_start or next_paren == -1:
+            next_paren = text.find("(", name_start)
+            next_paren = size if next_paren == -1 else next_paren
+        name_end = min(next_brace, next_paren)
+        name = text[name_start:name_end]
+        if name_end >= size or not (name.isidentifier() or all(_is_name_char(c) for c in name)):
+            cursor = position + 1
+            continue
+        closer = _CLOSERS[text[name_end]]
+        end = text.find(closer, name_end + 1)
+        if end == -1:
+            cursor = position + 1
+            continue
+        body = text[name_end + 1:end]
+        if closer == "}":
+            brace_calls.append((name, body))
+            cursor = end + 1
+        else:
+            # 괄호 형식 안쪽의 중괄호 호출도 찾도록 한 칸만 전진
+            if position >= paren_until:
+                paren_calls.append((name, body))
+                paren_until = end + 1
+            cursor = position + 1
+    return brace_calls or paren_calls
+
+
+class FunctionCallParser:
+    """
+    증분 함수 호출 파서
+
+    버퍼에 이어 붙인 텍스트를 커서 하나로 한 번만 훑으며 <start_function_call> 블록을 찾는다.
+    토큰 경계에서 잘린 마커는 다음 feed()에서 이어서 확인한다.
+    블록 호출이 없을 때만 finish()에서 블록 밖 call: / JSON 형식을 찾는다.
+
+        parser = FunctionCallParser()
+        for piece in stream:
+            for call in parser.feed(piece):   # 완성된 블록 호출
+                ...
+        calls = parser.finish()              # 전체 결과 (parse_function_calls와 동일)
+    """
+
+    __slots__ = ("_buffer", "block_calls", "_cursor", "_segment_start", "_finished")
+
+    def __init__(self):
+        self._buffer = ""
+        self.block_calls: list[dict] = []
+        self._cursor = 0
+        self._segment_start = -1  # 열린 블록의 내용 시작 위치 (-1: 블록 밖)
+        self._finished: Optional[list[dict]] = None
+
+    def feed(self, text: str) -> list[dict]:
+        """텍스트 조각 추가. 이번에 완성된 블록 호출 목록 반환"""
+        if self._finished is not None:
+            raise RuntimeError("finish() 이후에는 feed()를 호출할 수 없습니다.")
+        self._buffer += text
+        return self._scan_blocks()
+
+    def finish(self) -> list[dict]:
+        """입력 종료. 전체 함수 호출 목록 반환"""
+        if self._finished is not None:
+            return self._finished
+
+        calls = self.block_calls
+        if not calls:
+            buffer = self._buffer
+            calls = [
+                {"function_name": name, "parameters": parse_parameters(body)}
+                for name, body in _scan_bare_calls(buffer)
+            ]
+            if not calls:
+                start = buffer.find("{")
+                end = buffer.rfind("}")
+                if start != -1 and end > start:
+                    parsed = parse_json_function_call(buffer[start:end + 1])
+                    if parsed:
+                        calls = [parsed]
+
+        self._finished = calls
+        return calls
+
+    def _scan_blocks(self) -> list[dict]:
+        buffer = self._buffer
+        size = len(buffer)
+        cursor = self._cursor
+        segment_start = self._segment_start
+        completed: list[dict] = []
+        while True:
+            if segment_start < 0:
+                prefix, tokens, longest = START_PREFIX, START_TOKENS, _MAX_START
+            else:
+                prefix, tokens, longest = END_PREFIX, END_TOKENS, _MAX_END
+            index = buffer.find(prefix, cursor)
+            if index == -1:
+                cursor = max(cursor, size - len(prefix) + 1)
+                break
+            token = _match_token(buffer, index, tokens)
+            if token is None:
+                if size - index < longest:
+                    cursor = index  # 마커가 잘렸을 수 있음
+                    break
+                cursor = index + 1
+                continue
+            if segment_start < 0:
+                segment_start = cursor = index + len(token)
+                continue
+            parsed = parse_segment(buffer[segment_start:index])
+            if parsed:
+                self.block_calls.append(parsed)
+                completed.append(parsed)
+            segment_start = -1
+            cursor = index + len(token)
+
+        self._cursor = cursor
+        self._segment_start = segment_start
+        return completed
+
+
+def parse_function_calls(output: str) -> list[dict]:
+    """모델 출력 전체에서 함수 호출 목록 파싱"""
+    parser = FunctionCallParser()
+    parser.feed(output)
+    return parser.finish()
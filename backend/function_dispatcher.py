@@ -0,0 +1,235 @@
+"""
+함수 스키마 기반 디스패처
+HOME_FUNCTION_SCHEMAS로부터 핸들러 테이블과 파라미터 검증/변환기를 한 번만 생성
+
+파라미터 범위는 스키마가 아니라 HOME_PARAMETER_RANGES에 둔다. 스키마는 apply_chat_template(tools=...)로
+프롬프트에 그대로 들어가므로, 학습/평가 때와 같은 툴 선언을 유지하려면 스키마에 키를 추가하면 안 된다.
+"""
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+class InvalidArgument(ValueError):
+    """스키마에 맞지 않는 함수 파라미터"""
+
+
+# 디스패처 전용 정수 파라미터 범위: (함수 이름, 파라미터) -> (최소, 최대). 설명(description)에 적힌 범위와 같음
+HOME_PARAMETER_RANGES: dict[tuple[str, str], tuple[int, int]] = {
+    ("ac_set_temperature", "temperature"): (16, 30),
+    ("tv_set_channel", "channel"): (1, 100),
+    ("tv_set_volume", "volume"): (0, 100),
+    ("light_set_brightness", "brightness"): (0, 100),
+    ("light_set_color_temp", "temp"): (2700, 6500),
+    ("audio_set_volume", "volume"): (0, 100),
+    ("curtain_set_position", "position"): (0, 100),
+}
+
+
+# === 타입별 변환기 ===
+
+def _coerce_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise InvalidArgument("정수가 필요합니다")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        raise InvalidArgument("정수가 필요합니다")
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            number = float(text)
+        except ValueError:
+            raise InvalidArgument("정수가 필요합니다") from None
+        if number.is_integer():
+            return int(number)
+    raise InvalidArgument("정수가 필요합니다")
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise InvalidArgument("숫자가 필요합니다")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise InvalidArgument("숫자가 필요합니다")
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise InvalidArgument("문자열이 필요합니다")
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise InvalidArgument("true/false 값이 필요합니다")
+
+
+_TYPE_COERCERS: dict[str, Callable[[Any], Any]] = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "string": _coerce_string,
+    "boolean": _coerce_boolean,
+}
+
+
+def _build_coercer(spec: dict, value_range: tuple[int, int] | None = None) -> Callable[[Any], Any]:
+    """파라미터 스키마(type/enum)와 범위(최소, 최대)로부터 변환기 생성"""
+    param_type = spec.get("type", "string")
+    base = _TYPE_COERCERS.get(param_type)
+    if base is None:
+        raise ValueError(f"지원하지 않는 파라미터 타입: {param_type}")
+
+    enum = spec.get("enum")
+    if enum:
+        # 정확히 일치하는 값 우선, 없으면 대소문자 무시 매칭
+        canonical = {str(item): item for item in enum}
+        folded: dict[str, Any] = {}
+        for item in enum:
+            folded.setdefault(str(item).casefold(), item)
+        choices = ", ".join(str(item) for item in enum)
+
+        def coerce_enum(value: Any) -> Any:
+            coerced = base(value)
+            key = str(coerced)
+            if key in canonical:
+                return canonical[key]
+            match = folded.get(key.casefold())
+            if match is None:
+                raise InvalidArgument(f"{choices} 중 하나여야 합니다")
+            return match
+
+        return coerce_enum
+
+    if value_range is None:
+        return base
+    minimum, maximum = value_range
+
+    def coerce_range(value: Any) -> Any:
+        coerced = base(value)
+        if coerced < minimum or coerced > maximum:
+            raise InvalidArgument(f"{minimum}-{maximum} 범위여야 합니다")
+        return coerced
+
+    return coerce_range
+
+
+# === 컴파일된 함수 ===
+
+_NO_ARGUMENTS: dict = {}
+
+
+@dataclass(frozen=True)
+class CompiledFunction:
+    """스키마 하나에 대응하는 핸들러와 파라미터 변환기"""
+    name: str
+    handler: Callable[..., dict]
+    params: tuple[tuple[str, Callable[[Any], Any], bool], ...]
+
+    def bind(self, parameters: dict | None) -> dict:
+        """파라미터 검증/변환 (스키마에 없는 키는 무시)"""
+        if not self.params:
+            return _NO_ARGUMENTS
+        if not isinstance(parameters, dict):
+            parameters = _NO_ARGUMENTS
+
+        kwargs = {}
+        for name, coerce, required in self.params:
+            if name not in parameters or parameters[name] is None:
+                if required:
+                    raise InvalidArgument(f"{self.name}: 필수 파라미터 {name}가 없습니다.")
+                continue
+            try:
+                kwargs[name] = coerce(parameters[name])
+            except InvalidArgument as exc:
+                raise InvalidArgument(f"{self.name}: 잘못된 파라미터 {name}={parameters[name]!r} ({exc})") from None
+        return kwargs
+
+
+def _compile_function(
+    schema: dict,
+    target_cls: type,
+    ranges: dict[tuple[str, str], tuple[int, int]]
+) -> CompiledFunction:
+    function = schema["function"]
+    name = function["name"]
+    handler = getattr(target_cls, name, None)
+    if not callable(handler):
+        raise ValueError(f"스키마 {name}에 대응하는 핸들러가 {target_cls.__name__}에 없습니다.")
+
+    spec = function.get("parameters") or {}
+    properties = spec.get("properties") or {}
+    required = set(spec.get("required") or [])
+
+    # 핸들러 시그니처와 스키마 파라미터가 맞는지 컴파일 시점에 확인
+    signature = inspect.signature(handler)
+    handler_params = list(signature.parameters.values())[1:]  # self 제외
+    accepted = {p.name for p in handler_params}
+    for param in properties:
+        if param not in accepted:
+            raise ValueError(f"{name}: 핸들러가 파라미터 {param}를 받지 않습니다.")
+    for param in handler_params:
+        if param.default is inspect.Parameter.empty and param.name not in required:
+            raise ValueError(f"{name}: 핸들러 필수 인자 {param.name}가 스키마 required에 없습니다.")
+
+    params = tuple(
+        (param, _build_coercer(param_spec, ranges.get((name, param))), param in required)
+        for param, param_spec in properties.items()
+    )
+    return CompiledFunction(name=name, handler=handler, params=params)
+
+
+class FunctionDispatcher:
+    """함수 스키마 목록으로부터 컴파일된 디스패처"""
+
+    def __init__(
+        self,
+        schemas: list[dict],
+        target_cls: type,
+        ranges: dict[tuple[str, str], tuple[int, int]] | None = None
+    ):
+        ranges = ranges or {}
+        table: dict[str, CompiledFunction] = {}
+        for schema in schemas:
+            compiled = _compile_function(schema, target_cls, ranges)
+            if compiled.name in table:
+                raise ValueError(f"중복된 함수 스키마: {compiled.name}")
+            table[compiled.name] = compiled
+        for name, param in ranges:
+            if name not in table or param not in {entry[0] for entry in table[name].params}:
+                raise ValueError(f"범위를 지정한 파라미터가 스키마에 없습니다: {name}.{param}")
+        self._table = table
+
+    @property
+    def function_names(self) -> frozenset[str]:
+        return frozenset(self._table)
+
+    def get(self, function_name: str) -> CompiledFunction | None:
+        return self._table.get(function_name)
+
+    def dispatch(self, target: Any, function_name: str, parameters: dict | None = None) -> dict:
+        """검증 통과 시에만 핸들러 실행 (실패 시 상태를 건드리지 않음)"""
+        compiled = self._table.get(function_name)
+        if compiled is None:
+            return {"success": False, "message": f"알 수 없는 함수: {function_name}"}
+        try:
+            kwargs = compiled.bind(parameters)
+        except InvalidArgument as exc:
+            return {"success": False, "message": str(exc)}
+        return compiled.handler(target, **kwargs)
@@ -2,12 +2,14 @@
 FunctionGemma 모델 래퍼
 자연어를 함수 호출로 변환 (홈 IoT 제어용)
 """
-import re
-import json
+import os
+import time
+from contextlib import nullcontext
 from typing import Optional
-from transformers import AutoProcessor, AutoModelForCausalLM
-import torch
 
+from device_router import FULL_ROUTE, RouteDecision, prune_context, route_devices, schemas_for
+from execution import CancelToken
+from function_call_parser import parse_function_calls
 from home_controller import HOME_FUNCTION_SCHEMAS
 
 BASE_SYSTEM_PROMPT_LINES = [
@@ -23,6 +25,123 @@ BASE_SYSTEM_PROMPT_LINES = [
 ]
 
 
+BASE_ADAPTER = "base"  # 어댑터 없이 베이스 모델로 생성
+MAX_NEW_TOKENS = 256  # 기본 생성 길이 (복합 명령을 위해 증가)
+_PEFT_BASE = "__base__"  # peft 혼합 배치에서 베이스 모델을 뜻하는 이름
+
+
+class UnknownAdapter(ValueError):
+    """등록되지 않은 어댑터 이름"""
+
+
+def parse_adapter_spec(spec: str) -> dict[str, str]:
+    """FG_LORA_ADAPTERS="name=path,name2=path2" 파싱 (순서 유지)"""
+    adapters: dict[str, str] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, separator, path = entry.partition("=")
+        name, path = name.strip(), path.strip()
+        if not separator or not name or not path:
+            raise ValueError(f"FG_LORA_ADAPTERS 항목은 name=path 형식이어야 합니다: {entry!r}")
+        if name in (BASE_ADAPTER, _PEFT_BASE) or name in adapters:
+            raise ValueError(f"사용할 수 없는 어댑터 이름입니다: {name!r}")
+        adapters[name] = os.path.expanduser(path)
+    return adapters
+
+
+def _rss_bytes() -> Optional[int]:
+    """현재 프로세스 RSS (Linux /proc 기준, 그 외 None)"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _parameter_bytes(parameters) -> tuple[int, int]:
+    count = size = 0
+    for parameter in parameters:
+        count += parameter.numel()
+        size += parameter.numel() * parameter.element_size()
+    return count, size
+
+
+def describe_devices(context: dict) -> list[str]:
+    """프롬프트에 들어가는 기기 상태 줄 (context에 있는 기기만)"""
+    lines = []
+    # 에어컨
+    if "ac" in context:
+        ac = context["ac"]
+        power = "켜짐" if ac.get("power") else "꺼짐"
+        lines.append(f"- 에어컨: {power}, {ac.get('temperature')}°C, 모드={ac.get('mode')}, 팬={ac.get('fan_speed')}")
+    # TV
+    if "tv" in context:
+        tv = context["tv"]
+        power = "켜짐" if tv.get("power") else "꺼짐"
+        app = f", 앱={tv.get('current_app')}" if tv.get("current_app") else ""
+        lines.append(f"- TV: {power}, 채널={tv.get('channel')}, 볼륨={tv.get('volume')}{app}")
+    # 거실등
+    if "light" in context:
+        light = context["light"]
+        power = "켜짐" if light.get("power") else "꺼짐"
+        lines.append(f"- 거실등: {power}, 밝기={light.get('brightness')}%, 색온도={light.get('color_temp')}K")
+    # 로봇청소기
+    if "vacuum" in context:
+        vacuum = context["vacuum"]
+        zone = f", 구역={vacuum.get('current_zone')}" if vacuum.get("current_zone") else ""
+        lines.append(f"- 로봇청소기: 상태={vacuum.get('status')}{zone}")
+    # 오디오
+    if "audio" in context:
+        audio = context["audio"]
+        power = "켜짐" if audio.get("power") else "꺼짐"
+        playlist = f", 플레이리스트={audio.get('current_playlist')}" if audio.get("current_playlist") else ""
+        lines.append(f"- 오디오: {power}, 볼륨={audio.get('volume')}, 재생={audio.get('playback')}{playlist}")
+    # 전동커튼
+    if "curtain" in context:
+        curtain = context["curtain"]
+        lines.append(f"- 전동커튼: 위치={curtain.get('position')}%")
+    # 환풍기
+    if "ventilation" in context:
+        vent = context["ventilation"]
+        power = "켜짐" if vent.get("power") else "꺼짐"
+        lines.append(f"- 환풍기: {power}, 속도={vent.get('speed')}")
+
+    return lines
+
+
+class _FirstTokenTimer:
+    """
+    첫 토큰 로짓이 나온 시각 기록 (prefill/decode 구간 분리용, 로짓은 그대로 반환)
+
+    LogitsProcessor 규약(__call__)만 따르므로 transformers를 임포트하지 않아도 정의할 수 있다.
+    """
+
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+
+    def __call__(self, input_ids, scores):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return scores
+
+
+class _CancelCriteria:
+    """
+    토큰마다 취소 신호 확인 (연결 끊김/기한 초과면 생성 중단)
+
+    StoppingCriteria 규약(__call__ -> 행별 BoolTensor)만 따른다.
+    """
+
+    def __init__(self, token: CancelToken):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return input_ids.new_full((input_ids.shape[0],), int(self.token.cancelled)).bool()
+
+
+def _stopping_criteria(token: Optional[CancelToken]) -> list:
+    return [_CancelCriteria(token)] if token is not None else []
+
+
 class FunctionGemmaModel:
     """FunctionGemma 모델 래퍼"""
 
@@ -35,6 +154,15 @@ class FunctionGemmaModel:
             for schema in HOME_FUNCTION_SCHEMAS
             if isinstance(schema, dict) and isinstance(schema.get("function"), dict)
         }
+        # FG_DEVICE_ROUTER=keyword: 입력과 관련된 기기의 스키마/상태만 프롬프트에 넣음
+        self.route_prompts = os.getenv("FG_DEVICE_ROUTER", "off") == "keyword"
+        # FG_LORA_ADAPTERS="ko=path,en=path": 베이스 모델 하나에 LoRA 어댑터 여러 개를 올려 요청별로 선택
+        self.adapter_paths = parse_adapter_spec(os.getenv("FG_LORA_ADAPTERS", ""))
+        self.default_adapter = os.getenv("FG_DEFAULT_ADAPTER") or next(iter(self.adapter_paths), BASE_ADAPTER)
+        self.resolve_adapter(self.default_adapter)
+        self.active_adapter: Optional[str] = None
+        self.adapter_info: dict[str, dict] = {}
+        self.base_parameter_bytes = 0
         self.loaded = False
 
     def load(self):
@@ -44,6 +172,10 @@ class FunctionGemmaModel:
 
         print(f"Loading FunctionGemma model: {self.model_name}")
 
+        # 무거운 ML 모듈은 첫 모델 사용 시점에 임포트 (API 기동 시간 단축)
+        import torch
+        from transformers import AutoModelForCausalLM, AutoProcessor
+
         # CPU에서 실행, 메모리 최적화
         self.processor = AutoProcessor.from_pretrained(
             self.model_name,
@@ -56,10 +188,100 @@ class FunctionGemmaModel:
             device_map="cpu",
             trust_remote_code=True
         )
+        _, self.base_parameter_bytes = _parameter_bytes(self.model.parameters())
+        if self.adapter_paths:
+            self._load_adapters()
 
         self.loaded = True
         print("FunctionGemma model loaded successfully!")
 
+    def _load_adapters(self):
+        """베이스 모델에 LoRA 어댑터 등록 (어댑터별 파라미터 메모리/RSS 증가/로드 시간 기록)"""
+        from peft import PeftModel  # 어댑터를 쓸 때만 필요
+
+        for index, (name, path) in enumerate(self.adapter_paths.items()):
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            if index == 0:
+                self.model = PeftModel.from_pretrained(self.model, path, adapter_name=name)
+            else:
+                self.model.load_adapter(path, adapter_name=name)
+            load_seconds = time.perf_counter() - started
+            rss_after = _rss_bytes()
+
+            marker = f".{name}."
+            count, size = _parameter_bytes(
+                parameter for parameter_name, parameter in self.model.named_parameters() if marker in parameter_name
+            )
+            self.adapter_info[name] = {
+                "path": path,
+                "parameters": count,
+                "parameter_bytes": size,
+                "overhead_ratio": size / self.base_parameter_bytes if self.base_parameter_bytes else None,
+                "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                "load_seconds": load_seconds,
+                "requests": 0,
+                "switches": 0,
+                "switch_seconds_total": 0.0,
+            }
+            print(f"LoRA adapter loaded: {name} ({path}, {size / 1e6:.1f} MB)")
+
+        self.model.eval()
+        self.active_adapter = next(iter(self.adapter_paths))
+
+    def resolve_adapter(self, name: Optional[str]) -> str:
+        """요청의 adapter 값을 등록된 이름으로 확인 (None이면 기본 어댑터)"""
+        name = name or self.default_adapter
+        if name != BASE_ADAPTER and name not in self.adapter_paths:
+            raise UnknownAdapter(f"등록되지 않은 어댑터입니다: {name}")
+        return name
+
+    def _activate(self, name: str) -> float:
+        """단일 어댑터 생성 전에 활성 어댑터 전환. 전환에 걸린 시간(초) 반환"""
+        if not self.adapter_paths or name == BASE_ADAPTER or name == self.active_adapter:
+            return 0.0
+        started = time.perf_counter()
+        self.model.set_adapter(name)
+        elapsed = time.perf_counter() - started
+        self.active_adapter = name
+        info = self.adapter_info[name]
+        info["switches"] += 1
+        info["switch_seconds_total"] += elapsed
+        return elapsed
+
+    def _base_only(self, name: Optional[str]):
+        """베이스 모델로 생성하는 구간 (어댑터가 등록된 경우에만 비활성화)"""
+        if self.adapter_paths and name == BASE_ADAPTER:
+            return self.model.disable_adapter()
+        return nullcontext()
+
+    def _count_request(self, name: str):
+        info = self.adapter_info.get(name)
+        if info is not None:
+            info["requests"] += 1
+
+    def adapter_stats(self) -> dict:
+        """어댑터별 메모리 오버헤드와 전환 지연"""
+        adapters = []
+        for name, path in self.adapter_paths.items():
+            info = self.adapter_info.get(name)
+            if info is None:
+                adapters.append({"name": name, "path": path, "loaded": False})
+                continue
+            switches = info["switches"]
+            adapters.append({
+                "name": name,
+                "loaded": True,
+                **info,
+                "mean_switch_ms": info["switch_seconds_total"] / switches * 1000 if switches else None,
+            })
+        return {
+            "default": self.default_adapter,
+            "active": self.active_adapter,
+            "base_parameter_bytes": self.base_parameter_bytes,
+            "adapters": adapters,
+        }
+
     def parse_function_call(self, output: str) -> Optional[dict]:
         """
         모델 출력에서 함수 호출 파싱
@@ -71,183 +293,7 @@ class FunctionGemmaModel:
         return calls[0] if calls else None
 
     def parse_function_calls(self, output: str) -> list[dict]:
-        calls: list[dict] = []
-
-        segments = re.findall(
-            r"<start_(?:of_)?function_call>(.*?)<end_(?:of_)?function_call>",
-            output,
-            flags=re.DOTALL,
-        )
-        for segment in segments:
-            parsed = self._parse_function_segment(segment)
-            if parsed:
-                calls.append(parsed)
-
-        if calls:
-            return calls
-
-        for name, params in re.findall(r"call:([a-zA-Z_]\w*)\{([^}]*)\}", output):
-            calls.append({
-                "function_name": name,
-                "parameters": self._parse_parameters(params),
-            })
-
-        if calls:
-            return calls
-
-        for name, params in re.findall(r"call:([a-zA-Z_]\w*)\(([^)]*)\)", output):
-            calls.append({
-                "function_name": name,
-                "parameters": self._parse_parameters(params),
-            })
-
-        if calls:
-            return calls
-
-        json_candidate = self._extract_json_blob(output)
-        if json_candidate:
-            parsed_json = self._parse_json_function_call(json_candidate)
-            if parsed_json:
-                return [parsed_json]
-
-        return []
-
-    def _extract_function_call_segment(self, output: str) -> Optional[str]:
-        start_tokens = ("<start_function_call>", "<start_of_function_call>")
-        end_tokens = ("<end_function_call>", "<end_of_function_call>")
-
-        for start_token in start_tokens:
-            start_index = output.find(start_token)
-            if start_index == -1:
-                continue
-
-            search_from = start_index + len(start_token)
-            for end_token in end_tokens:
-                end_index = output.find(end_token, search_from)
-                if end_index != -1:
-                    return output[search_from:end_index].strip()
-
-        return None
-
-    def _parse_function_segment(self, segment: str) -> Optional[dict]:
-        text = segment.strip()
-        if text.startswith("call:"):
-            text = text[len("call:"):].strip()
-
-        if text.startswith("{"):
-            parsed_json = self._parse_json_function_call(text)
-            if parsed_json:
-                return parsed_json
-
-        brace_start = text.find("{")
-        brace_end = text.rfind("}")
-        if brace_start == -1 or brace_end == -1 or brace_end <= brace_start:
-            return None
-
-        function_name = text[:brace_start].strip()
-        params_str = text[brace_start + 1:brace_end].strip()
-
-        if not function_name:
-            return None
-
-        return {
-            "function_name": function_name,
-            "parameters": self._parse_parameters(params_str)
-        }
-
-    def _parse_parameters(self, params_str: str) -> dict:
-        if not params_str:
-            return {}
-
-        if "<escape>" in params_str:
-            parameters = {}
-            param_pattern = r"(\w+):<escape>([^<]*)<escape>"
-            for key, value in re.findall(param_pattern, params_str):
-                parameters[key] = self._coerce_value(value)
-            return parameters
-
-        # JSON 형태 파라미터 처리
-        json_text = params_str
-        if not (json_text.startswith("{") and json_text.endswith("}")):
-            json_text = f"{{{json_text}}}"
-
-        try:
-            parsed = json.loads(json_text)
-            if isinstance(parsed, dict):
-                return {k: self._coerce_value(v) for k, v in parsed.items()}
-        except json.JSONDecodeError:
-            pass
-
-        # key:value 형태 간단 파싱
-        parameters = {}
-        for chunk in params_str.split(","):
-            if ":" not in chunk:
-                continue
-            key, value = chunk.split(":", 1)
-            parameters[key.strip()] = self._coerce_value(value.strip())
-        return parameters
-
-    def _coerce_value(self, value):
-        if not isinstance(value, str):
-            return value
-
-        cleaned = value.strip().strip('"').strip("'")
-        lowered = cleaned.lower()
-
-        if lowered in ("true", "false"):
-            return lowered == "true"
-
-        if cleaned.lstrip("+-").isdigit():
-            return int(cleaned)
-
-        if cleaned.replace(".", "", 1).lstrip("+-").isdigit():
-            return float(cleaned)
-
-        return cleaned
-
-    def _parse_json_function_call(self, json_text: str) -> Optional[dict]:
-        try:
-            payload = json.loads(json_text)
-        except json.JSONDecodeError:
-            return None
-
-        if not isinstance(payload, dict):
-            return None
-
-        if "function_call" in payload and isinstance(payload["function_call"], dict):
-            payload = payload["function_call"]
-
-        function_block = payload.get("function")
-        if isinstance(function_block, dict):
-            name = function_block.get("name")
-            arguments = function_block.get("arguments", function_block.get("parameters", {}))
-        else:
-            name = payload.get("name") or payload.get("function_name")
-            arguments = payload.get("arguments", payload.get("parameters", {}))
-
-        if not name:
-            return None
-
-        if isinstance(arguments, str):
-            try:
-                arguments = json.loads(arguments)
-            except json.JSONDecodeError:
-                arguments = {}
-
-        if not isinstance(arguments, dict):
-            arguments = {}
-
-        return {
-            "function_name": name,
-            "parameters": {k: self._coerce_value(v) for k, v in arguments.items()}
-        }
-
-    def _extract_json_blob(self, text: str) -> Optional[str]:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start == -1 or end == -1 or end <= start:
-            return None
-        return text[start:end + 1]
+        return parse_function_calls(output)
 
     def _validate_function_call(self, function_call: Optional[dict]) -> Optional[dict]:
         if not function_call or not isinstance(function_call, dict):
@@ -269,69 +315,16 @@ class FunctionGemmaModel:
         if context:
             prompt_lines.append("")
             prompt_lines.append("현재 기기 상태:")
-            # 에어컨
-            if "ac" in context:
-                ac = context["ac"]
-                power = "켜짐" if ac.get("power") else "꺼짐"
-                prompt_lines.append(f"- 에어컨: {power}, {ac.get('temperature')}°C, 모드={ac.get('mode')}, 팬={ac.get('fan_speed')}")
-            # TV
-            if "tv" in context:
-                tv = context["tv"]
-                power = "켜짐" if tv.get("power") else "꺼짐"
-                app = f", 앱={tv.get('current_app')}" if tv.get("current_app") else ""
-                prompt_lines.append(f"- TV: {power}, 채널={tv.get('channel')}, 볼륨={tv.get('volume')}{app}")
-            # 거실등
-            if "light" in context:
-                light = context["light"]
-                power = "켜짐" if light.get("power") else "꺼짐"
-                prompt_lines.append(f"- 거실등: {power}, 밝기={light.get('brightness')}%, 색온도={light.get('color_temp')}K")
-            # 로봇청소기
-            if "vacuum" in context:
-                vacuum = context["vacuum"]
-                zone = f", 구역={vacuum.get('current_zone')}" if vacuum.get("current_zone") else ""
-                prompt_lines.append(f"- 로봇청소기: 상태={vacuum.get('status')}{zone}")
-            # 오디오
-            if "audio" in context:
-                audio = context["audio"]
-                power = "켜짐" if audio.get("power") else "꺼짐"
-                playlist = f", 플레이리스트={audio.get('current_playlist')}" if audio.get("current_playlist") else ""
-                prompt_lines.append(f"- 오디오: {power}, 볼륨={audio.get('volume')}, 재생={audio.get('playback')}{playlist}")
-            # 전동커튼
-            if "curtain" in context:
-                curtain = context["curtain"]
-                prompt_lines.append(f"- 전동커튼: 위치={curtain.get('position')}%")
-            # 환풍기
-            if "ventilation" in context:
-                vent = context["ventilation"]
-                power = "켜짐" if vent.get("power") else "꺼짐"
-                prompt_lines.append(f"- 환풍기: {power}, 속도={vent.get('speed')}")
+            prompt_lines.extend(describe_devices(context))
 
         return "\n".join(prompt_lines)
 
     def _build_few_shot_messages(self) -> list[dict]:
         return []
 
-    def generate_function_call(self, user_input: str, context: Optional[dict] = None) -> dict:
-        """
-        사용자 입력을 함수 호출로 변환
-
-        Returns:
-            {
-                "raw_output": str,
-                "function_call": {"function_name": str, "parameters": dict} or None,
-                "function_calls": [{"function_name": str, "parameters": dict}, ...],
-                "success": bool
-            }
-        """
-        if not self.loaded:
-            self.load()
-
-        normalized_input = user_input
-
-        # 시스템 프롬프트 구성
+    def _build_messages(self, user_input: str, context: Optional[dict]) -> list[dict]:
         system_prompt = self._build_system_prompt(context)
-
-        messages = [
+        return [
             {
                 "role": "developer",
                 "content": system_prompt
@@ -339,45 +332,47 @@ class FunctionGemmaModel:
             *self._build_few_shot_messages(),
             {
                 "role": "user",
-                "content": normalized_input
+                "content": user_input
             },
         ]
 
-        # 입력 토크나이징
+    def _route(
+        self,
+        user_input: str,
+        context: Optional[dict],
+        prune: Optional[bool]
+    ) -> tuple[RouteDecision, Optional[dict], list[dict]]:
+        """프롬프트에 넣을 기기 상태와 함수 스키마 선택 (prune=None이면 FG_DEVICE_ROUTER 설정)"""
+        if prune is None:
+            prune = self.route_prompts
+        route = route_devices(user_input) if prune else FULL_ROUTE
+        if not route.pruned:
+            return route, context, HOME_FUNCTION_SCHEMAS
+        return route, prune_context(context, route.groups), schemas_for(route.groups)
+
+    def _tokenize(self, user_input: str, context: Optional[dict], tools: list[dict] = HOME_FUNCTION_SCHEMAS):
+        """채팅 템플릿 적용 + 토크나이징"""
+        messages = self._build_messages(user_input, context)
         try:
-            inputs = self.processor.apply_chat_template(
+            return self.processor.apply_chat_template(
                 messages,
-                tools=HOME_FUNCTION_SCHEMAS,
+                tools=tools,
                 add_generation_prompt=True,
                 return_dict=True,
                 return_tensors="pt"
             )
         except Exception:
-            merged_prompt = f"{system_prompt}\n\nUser: {normalized_input}"
-            inputs = self.processor.apply_chat_template(
+            merged_prompt = f"{messages[0]['content']}\n\nUser: {user_input}"
+            return self.processor.apply_chat_template(
                 [{"role": "developer", "content": merged_prompt}],
-                tools=HOME_FUNCTION_SCHEMAS,
+                tools=tools,
                 add_generation_prompt=True,
                 return_dict=True,
                 return_tensors="pt"
             )
 
-        # 생성
-        with torch.inference_mode():
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=256,  # 복합 명령을 위해 증가
-                pad_token_id=self.processor.eos_token_id,
-                do_sample=False
-            )
-
-        # 디코딩
-        raw_output = self.processor.decode(
-            outputs[0][len(inputs["input_ids"][0]):],
-            skip_special_tokens=False
-        )
-
-        # 함수 호출 파싱
+    def _build_result(self, raw_output: str) -> dict:
+        """모델 출력 파싱 + 허용 함수 검증"""
         function_calls = []
         for call in self.parse_function_calls(raw_output):
             validated = self._validate_function_call(call)
@@ -393,6 +388,294 @@ class FunctionGemmaModel:
             "success": bool(function_calls)
         }
 
+    def generate_function_call(
+        self,
+        user_input: str,
+        context: Optional[dict] = None,
+        prune: Optional[bool] = None,
+        adapter: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None,
+        max_new_tokens: Optional[int] = None
+    ) -> dict:
+        """
+        사용자 입력을 함수 호출로 변환
+
+        prune=True면 관련 기기의 스키마/상태만 넣어 생성하고, 호출을 만들지 못하면 전체 스키마로 재시도한다.
+        adapter로 LoRA 어댑터를 고른다 (None이면 기본 어댑터, "base"면 베이스 모델).
+        cancel_token이 취소되면 생성을 토큰 단위로 멈추고 JobCancelled를 던진다.
+        max_new_tokens로 생성 길이를 줄일 수 있다 (기본 MAX_NEW_TOKENS, 잘린 출력은 완성된 호출까지만 파싱).
+
+        Returns:
+            {
+                "raw_output": str,
+                "function_call": {"function_name": str, "parameters": dict} or None,
+                "function_calls": [{"function_name": str, "parameters": dict}, ...],
+                "success": bool,
+                "prompt_tokens": int,
+                "generated_tokens": int,
+                "hit_token_limit": bool,  # 반환한 출력이 EOS 전에 생성 길이 제한에서 멈춤
+                "timings": {"template", "prefill", "decode", "parse", "adapter_switch"},  # 초
+                "route": {"groups": [...], "pruned": bool, "retried": bool},
+                "adapter": str
+            }
+        """
+        adapter = self.resolve_adapter(adapter)
+        if not self.loaded:
+            self.load()
+
+        route, routed_context, tools = self._route(user_input, context, prune)
+        result = self._generate(user_input, routed_context, tools, adapter, cancel_token, max_new_tokens)
+        retried = route.pruned and not result["success"]
+        if retried:
+            result = _merge_cost(
+                self._generate(user_input, context, HOME_FUNCTION_SCHEMAS, adapter, cancel_token, max_new_tokens),
+                result
+            )
+        result["route"] = {**route.to_dict(), "retried": retried}
+        result["adapter"] = adapter
+        self._count_request(adapter)
+        return result
+
+    def _generate(
+        self,
+        user_input: str,
+        context: Optional[dict],
+        tools: list[dict],
+        adapter: str,
+        cancel_token: Optional[CancelToken] = None,
+        max_new_tokens: Optional[int] = None
+    ) -> dict:
+        """단건 생성 (토크나이징/prefill/decode/파싱 시간 측정)"""
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        # 입력 토크나이징
+        started = time.perf_counter()
+        inputs = self._tokenize(user_input, context, tools)
+        prompt_tokens = len(inputs["input_ids"][0])
+        switch_seconds = self._activate(adapter)
+        tokenized = time.perf_counter()
+
+        # 생성
+        import torch
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+
+        timer = _FirstTokenTimer()
+        with torch.inference_mode(), self._base_only(adapter):
+            outputs = self.model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_new_tokens=max_new_tokens or MAX_NEW_TOKENS,
+                pad_token_id=self.processor.eos_token_id,
+                do_sample=False,
+                logits_processor=LogitsProcessorList([timer]),
+                stopping_criteria=StoppingCriteriaList(_stopping_criteria(cancel_token))
+            )
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()  # 중간에 멈춘 출력은 쓰지 않음
+        generated = time.perf_counter()
+        first_token_at = timer.first_token_at or generated
+
+        # 디코딩
+        generated_ids = outputs[0][prompt_tokens:]
+        raw_output = self.processor.decode(generated_ids, skip_special_tokens=False)
+
+        # 함수 호출 파싱
+        result = self._build_result(raw_output)
+        result["prompt_tokens"] = prompt_tokens
+        result["generated_tokens"] = len(generated_ids)
+        result["hit_token_limit"] = (
+            len(generated_ids) >= (max_new_tokens or MAX_NEW_TOKENS)
+            and int(generated_ids[-1]) not in self._eos_token_ids()
+        )
+        result["timings"] = {
+            "template": tokenized - started - switch_seconds,
+            "adapter_switch": switch_seconds,
+            "prefill": first_token_at - tokenized,
+            "decode": generated - first_token_at,
+            "parse": time.perf_counter() - generated,
+        }
+        return result
+
+    def _eos_token_ids(self) -> set[int]:
+        """생성을 끝내는 토큰 id (generation_config에 없으면 프로세서의 EOS)"""
+        eos_token_ids = self.model.generation_config.eos_token_id
+        if eos_token_ids is None:
+            return {self.processor.eos_token_id}
+        if isinstance(eos_token_ids, int):
+            return {eos_token_ids}
+        return set(eos_token_ids)
+
+    def generate_function_calls_batch(
+        self,
+        requests: list[tuple[str, Optional[dict]]],
+        batch_size: int = 8,
+        prune: Optional[bool] = None,
+        adapters: Optional[list[Optional[str]]] = None,
+        cancel_token: Optional[CancelToken] = None,
+        max_new_tokens: Optional[int] = None
+    ) -> list[dict]:
+        """
+        여러 입력을 배치로 생성 (입력 순서대로 결과 반환)
+
+        토큰 길이로 정렬한 뒤 batch_size 단위로 왼쪽 패딩해서 생성한다.
+        greedy 디코딩이므로 결과는 generate_function_call과 같다.
+        adapters로 항목별 LoRA 어댑터를 고르며, 어댑터가 섞인 배치도 한 번에 생성한다 (peft adapter_names).
+        cancel_token이 취소되면 배치 전체를 멈추고 JobCancelled를 던진다.
+        항목별 timings의 prefill/decode는 그 항목이 속한 묶음 전체의 시간이다 (요청이 기다린 시간).
+        """
+        if adapters is None:
+            adapters = [None] * len(requests)
+        adapter_names = [self.resolve_adapter(name) for name in adapters]
+        if not self.loaded:
+            self.load()
+
+        pad_token_id = self.processor.eos_token_id
+        eos_token_ids = self._eos_token_ids()
+
+        limit = max_new_tokens or MAX_NEW_TOKENS
+
+        routes = []
+        tokenized = []
+        template_seconds = []
+        for user_input, context in requests:
+            started = time.perf_counter()
+            route, routed_context, tools = self._route(user_input, context, prune)
+            routes.append(route)
+            tokenized.append(self._tokenize(user_input, routed_context, tools)["input_ids"][0].tolist())
+            template_seconds.append(time.perf_counter() - started)
+        order = sorted(range(len(tokenized)), key=lambda i: len(tokenized[i]))
+
+        results: list[Optional[dict]] = [None] * len(requests)
+        for chunk_start in range(0, len(order), batch_size):
+            chunk = order[chunk_start:chunk_start + batch_size]
+            timer = _FirstTokenTimer()
+            started = time.perf_counter()
+            outputs = self._generate_rows(
+                [tokenized[i] for i in chunk],
+                [adapter_names[i] for i in chunk],
+                pad_token_id,
+                eos_token_ids,
+                cancel_token,
+                limit,
+                timer
+            )
+            generated_at = time.perf_counter()
+            first_token_at = timer.first_token_at or generated_at
+            for index, generated in zip(chunk, outputs):
+                parse_started = time.perf_counter()
+                raw_output = self.processor.decode(generated, skip_special_tokens=False)
+                results[index] = self._build_result(raw_output)
+                results[index]["prompt_tokens"] = len(tokenized[index])
+                results[index]["generated_tokens"] = len(generated)
+                results[index]["hit_token_limit"] = len(generated) >= limit and generated[-1] not in eos_token_ids
+                results[index]["timings"] = {
+                    "template": template_seconds[index],
+                    "prefill": first_token_at - started,
+                    "decode": generated_at - first_token_at,
+                    "parse": time.perf_counter() - parse_started,
+                }
+
+        # 줄인 스키마로 호출을 만들지 못한 항목은 전체 스키마로 한 번 더 배치 생성
+        retry = [i for i, route in enumerate(routes) if route.pruned and not results[i]["success"]]
+        if retry:
+            retried = self.generate_function_calls_batch(
+                [requests[i] for i in retry],
+                batch_size,
+                prune=False,
+                adapters=[adapter_names[i] for i in retry],
+                cancel_token=cancel_token,
+                max_new_tokens=max_new_tokens
+            )
+            for index, result in zip(retry, retried):
+                results[index] = _merge_cost(result, results[index])
+        for index, route in enumerate(routes):
+            results[index]["route"] = {**route.to_dict(), "retried": index in retry}
+            if index not in retry:
+                results[index]["adapter"] = adapter_names[index]
+                self._count_request(adapter_names[index])
+
+        return results
+
+    def _generate_rows(
+        self,
+        rows: list[list[int]],
+        names: list[str],
+        pad_token_id: int,
+        eos_token_ids: set[int],
+        cancel_token: Optional[CancelToken] = None,
+        max_new_tokens: int = MAX_NEW_TOKENS,
+        timer: Optional[_FirstTokenTimer] = None
+    ) -> list[list[int]]:
+        """왼쪽 패딩 배치 생성. 행마다 EOS까지의 생성 토큰 반환 (timer: 첫 토큰 시각 기록)"""
+        import torch
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        max_len = max(len(ids) for ids in rows)
+        input_ids = torch.full((len(rows), max_len), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), max_len), dtype=torch.long)
+        for row, ids in enumerate(rows):
+            input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, max_len - len(ids):] = 1
+
+        uniform = len(set(names)) == 1
+        generate_kwargs = {}
+        if uniform:
+            self._activate(names[0])
+        else:
+            generate_kwargs["adapter_names"] = [_PEFT_BASE if name == BASE_ADAPTER else name for name in names]
+
+        try:
+            with torch.inference_mode(), self._base_only(names[0] if uniform else None):
+                outputs = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=pad_token_id,
+                    do_sample=False,
+                    logits_processor=LogitsProcessorList([timer] if timer is not None else []),
+                    stopping_criteria=StoppingCriteriaList(_stopping_criteria(cancel_token)),
+                    **generate_kwargs
+                )
+        except ValueError:
+            if uniform:
+                raise
+            # 혼합 배치를 지원하지 않는 어댑터 구성이면 어댑터별로 나눠서 생성
+            generated_rows: list[Optional[list[int]]] = [None] * len(rows)
+            for name in dict.fromkeys(names):
+                members = [row for row, row_name in enumerate(names) if row_name == name]
+                for row, generated in zip(members, self._generate_rows(
+                    [rows[row] for row in members], [name] * len(members), pad_token_id, eos_token_ids,
+                    cancel_token, max_new_tokens, timer
+                )):
+                    generated_rows[row] = generated
+            return generated_rows
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        generated_rows = []
+        for row in range(len(rows)):
+            generated = outputs[row][max_len:].tolist()
+            # 먼저 끝난 시퀀스 뒤의 패딩 제거 (단건 생성과 같은 출력)
+            for position, token_id in enumerate(generated):
+                if token_id in eos_token_ids:
+                    generated = generated[:position + 1]
+                    break
+            generated_rows.append(generated)
+        return generated_rows
+
+
+def _merge_cost(retry: dict, first: dict) -> dict:
+    """재시도 결과에 첫 시도의 토큰 수/시간을 합산"""
+    for key in ("prompt_tokens", "generated_tokens"):
+        retry[key] = retry.get(key, 0) + first.get(key, 0)
+    if "timings" in retry and "timings" in first:
+        for stage, seconds in first["timings"].items():
+            retry["timings"][stage] = retry["timings"].get(stage, 0.0) + seconds
+    return retry
+
 
 # 전역 모델 인스턴스 (싱글톤)
 _model_instance: Optional[FunctionGemmaModel] = None
@@ -6,6 +6,8 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import Callable, Any
 
+from function_dispatcher import HOME_PARAMETER_RANGES, FunctionDispatcher
+
 
 # === Enums ===
 
@@ -51,24 +53,39 @@ class CurtainStatus(str, Enum):
 
 # === Device State Dataclasses ===
 
-@dataclass
+@dataclass(slots=True)
 class ACState:
     """에어컨 상태"""
     power: bool = False
     temperature: int = 24  # 16-30
     mode: ACMode = ACMode.COOLING
     fan_speed: FanSpeed = FanSpeed.AUTO
+    indoor_temperature: float = 26.0  # 실내 온도 (시뮬레이터가 갱신)
+    outdoor_temperature: float = 32.0  # 실외 온도 (시뮬레이터가 갱신)
 
     def to_dict(self) -> dict:
         return {
             "power": self.power,
             "temperature": self.temperature,
             "mode": self.mode.value,
-            "fan_speed": self.fan_speed.value
+            "fan_speed": self.fan_speed.value,
+            "indoor_temperature": self.indoor_temperature,
+            "outdoor_temperature": self.outdoor_temperature
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "ACState":
+        return cls(
+            power=data.get("power", False),
+            temperature=data.get("temperature", 24),
+            mode=ACMode(data.get("mode", ACMode.COOLING.value)),
+            fan_speed=FanSpeed(data.get("fan_speed", FanSpeed.AUTO.value)),
+            indoor_temperature=data.get("indoor_temperature", 26.0),
+            outdoor_temperature=data.get("outdoor_temperature", 32.0)
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class TVState:
     """TV 상태"""
     power: bool = False
@@ -84,8 +101,17 @@ class TVState:
             "current_app": self.current_app
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "TVState":
+        return cls(
+            power=data.get("power", False),
+            channel=data.get("channel", 1),
+            volume=data.get("volume", 30),
+            current_app=data.get("current_app")
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class LightState:
     """거실등 상태"""
     power: bool = False
@@ -99,23 +125,45 @@ class LightState:
             "color_temp": self.color_temp
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "LightState":
+        return cls(
+            power=data.get("power", False),
+            brightness=data.get("brightness", 100),
+            color_temp=data.get("color_temp", 4000)
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class VacuumState:
     """로봇청소기 상태"""
     power: bool = False
     status: VacuumStatus = VacuumStatus.IDLE
     current_zone: str | None = None
+    progress: int = 0  # 현재 청소 진행률 0-100%
+    battery: int = 100  # 0-100%
 
     def to_dict(self) -> dict:
         return {
             "power": self.power,
             "status": self.status.value,
-            "current_zone": self.current_zone
+            "current_zone": self.current_zone,
+            "progress": self.progress,
+            "battery": self.battery
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "VacuumState":
+        return cls(
+            power=data.get("power", False),
+            status=VacuumStatus(data.get("status", VacuumStatus.IDLE.value)),
+            current_zone=data.get("current_zone"),
+            progress=data.get("progress", 0),
+            battery=data.get("battery", 100)
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class AudioState:
     """오디오 상태"""
     power: bool = False
@@ -131,21 +179,41 @@ class AudioState:
             "current_playlist": self.current_playlist
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "AudioState":
+        return cls(
+            power=data.get("power", False),
+            volume=data.get("volume", 30),
+            playback=PlaybackStatus(data.get("playback", PlaybackStatus.STOPPED.value)),
+            current_playlist=data.get("current_playlist")
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class CurtainState:
     """전동커튼 상태"""
     position: int = 100  # 0-100% (0=closed, 100=open)
     status: CurtainStatus = CurtainStatus.STOPPED
+    target_position: int = 100  # 이동 목표 위치 (멈춰 있으면 position과 같음)
 
     def to_dict(self) -> dict:
         return {
             "position": self.position,
-            "status": self.status.value
+            "status": self.status.value,
+            "target_position": self.target_position
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "CurtainState":
+        position = data.get("position", 100)
+        return cls(
+            position=position,
+            status=CurtainStatus(data.get("status", CurtainStatus.STOPPED.value)),
+            target_position=data.get("target_position", position)
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class VentilationState:
     """환풍기 상태"""
     power: bool = False
@@ -157,8 +225,15 @@ class VentilationState:
             "speed": self.speed.value
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "VentilationState":
+        return cls(
+            power=data.get("power", False),
+            speed=FanSpeed(data.get("speed", FanSpeed.AUTO.value))
+        )
+
 
-@dataclass
+@dataclass(slots=True)
 class HomeState:
     """전체 홈 상태"""
     ac: ACState = field(default_factory=ACState)
@@ -180,12 +255,27 @@ class HomeState:
             "ventilation": self.ventilation.to_dict()
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "HomeState":
+        """to_dict() 결과로부터 복원 (누락된 기기는 기본값)"""
+        return cls(
+            ac=ACState.from_dict(data.get("ac", {})),
+            tv=TVState.from_dict(data.get("tv", {})),
+            light=LightState.from_dict(data.get("light", {})),
+            vacuum=VacuumState.from_dict(data.get("vacuum", {})),
+            audio=AudioState.from_dict(data.get("audio", {})),
+            curtain=CurtainState.from_dict(data.get("curtain", {})),
+            ventilation=VentilationState.from_dict(data.get("ventilation", {}))
+        )
+
 
 # === Home Controller ===
 
 class HomeController:
     """홈 IoT 컨트롤러 - 7개 기기 상태 관리 및 함수 실행"""
 
+    __slots__ = ("state", "on_state_change", "simulated_motion")
+
     # 온도 범위
     AC_MIN_TEMP = 16
     AC_MAX_TEMP = 30
@@ -210,15 +300,44 @@ class HomeController:
     MIN_POSITION = 0
     MAX_POSITION = 100
 
-    def __init__(self, on_state_change: Callable[[dict], Any] = None):
+    def __init__(self, on_state_change: Callable[[dict], Any] = None, simulated_motion: bool = False):
         self.state = HomeState()
         self.on_state_change = on_state_change
+        # True면 커튼 명령은 목표 위치만 정하고 실제 이동은 시뮬레이터가 진행 (simulator.py가 맡은 홈만)
+        self.simulated_motion = simulated_motion
 
     def _notify_change(self):
         """상태 변경 알림"""
         if self.on_state_change:
             self.on_state_change(self.state.to_dict())
 
+    def apply_simulation(self, updates: dict) -> dict:
+        """시뮬레이터가 계산한 값 반영 ({"ac": {"indoor_temperature": 25.3}, "curtain": {"position": 40}})"""
+        for device, values in updates.items():
+            device_state = getattr(self.state, device)
+            for name, value in values.items():
+                current = getattr(device_state, name)
+                setattr(device_state, name, type(current)(value) if isinstance(current, Enum) else value)
+        self._notify_change()
+        return {"success": True}
+
+    def simulated_values(self) -> dict:
+        """시뮬레이터가 계산하는 값 (apply_simulation 형식, 저널 체크포인트용)"""
+        state = self.state
+        return {
+            "ac": {
+                "indoor_temperature": state.ac.indoor_temperature,
+                "outdoor_temperature": state.ac.outdoor_temperature,
+            },
+            "curtain": {"position": state.curtain.position, "status": state.curtain.status.value},
+            "vacuum": {
+                "status": state.vacuum.status.value,
+                "current_zone": state.vacuum.current_zone,
+                "progress": state.vacuum.progress,
+                "battery": state.vacuum.battery,
+            },
+        }
+
     # === 에어컨 함수들 ===
 
     def ac_power_on(self) -> dict:
@@ -363,7 +482,9 @@ class HomeController:
     # === 로봇청소기 함수들 ===
 
     def vacuum_start(self) -> dict:
-        """로봇청소기 청소 시작"""
+        """로봇청소기 청소 시작 (일시정지 상태였으면 이어서)"""
+        if self.state.vacuum.status != VacuumStatus.PAUSED:
+            self.state.vacuum.progress = 0
         self.state.vacuum.power = True
         self.state.vacuum.status = VacuumStatus.CLEANING
         self._notify_change()
@@ -397,6 +518,7 @@ class HomeController:
             self.state.vacuum.power = True
             self.state.vacuum.status = VacuumStatus.CLEANING
             self.state.vacuum.current_zone = zone_lower
+            self.state.vacuum.progress = 0
             self._notify_change()
             return {"success": True, "zone": zone_lower, "message": f"{zone_names[zone_lower]} 청소를 시작합니다."}
         return {"success": False, "message": "잘못된 구역입니다. living_room, bedroom, kitchen, bathroom 중 선택하세요."}
@@ -468,31 +590,41 @@ class HomeController:
 
     # === 전동커튼 함수들 ===
 
+    def _move_curtain(self, position: int):
+        """커튼 목표 위치 지정 (simulated_motion이면 이동 상태로 두고, 아니면 바로 이동)"""
+        curtain = self.state.curtain
+        curtain.target_position = position
+        if not self.simulated_motion or position == curtain.position:
+            curtain.position = position
+            curtain.status = CurtainStatus.STOPPED
+        elif position > curtain.position:
+            curtain.status = CurtainStatus.OPENING
+        else:
+            curtain.status = CurtainStatus.CLOSING
+
     def curtain_open(self) -> dict:
         """전동커튼 열기"""
-        self.state.curtain.position = 100
-        self.state.curtain.status = CurtainStatus.STOPPED
+        self._move_curtain(100)
         self._notify_change()
         return {"success": True, "position": 100, "message": "커튼을 열었습니다."}
 
     def curtain_close(self) -> dict:
         """전동커튼 닫기"""
-        self.state.curtain.position = 0
-        self.state.curtain.status = CurtainStatus.STOPPED
+        self._move_curtain(0)
         self._notify_change()
         return {"success": True, "position": 0, "message": "커튼을 닫았습니다."}
 
     def curtain_stop(self) -> dict:
         """전동커튼 멈춤"""
         self.state.curtain.status = CurtainStatus.STOPPED
+        self.state.curtain.target_position = self.state.curtain.position
         self._notify_change()
         return {"success": True, "message": "커튼을 멈췄습니다."}
 
     def curtain_set_position(self, position: int) -> dict:
         """전동커튼 위치 설정 (0-100%, 0=닫힘, 100=열림)"""
         position = max(self.MIN_POSITION, min(self.MAX_POSITION, position))
-        self.state.curtain.position = position
-        self.state.curtain.status = CurtainStatus.STOPPED
+        self._move_curtain(position)
         self._notify_change()
         return {"success": True, "position": position, "message": f"커튼을 {position}% 위치로 설정했습니다."}
 
@@ -524,60 +656,8 @@ class HomeController:
     # === 함수 실행기 ===
 
     def execute_function(self, function_name: str, parameters: dict = None) -> dict:
-        """함수 이름과 파라미터로 함수 실행"""
-        parameters = parameters or {}
-
-        function_map = {
-            # 에어컨
-            "ac_power_on": self.ac_power_on,
-            "ac_power_off": self.ac_power_off,
-            "ac_set_temperature": lambda: self.ac_set_temperature(int(parameters.get("temperature", 24))),
-            "ac_adjust_temperature": lambda: self.ac_adjust_temperature(int(parameters.get("delta", 0))),
-            "ac_set_mode": lambda: self.ac_set_mode(parameters.get("mode", "cooling")),
-            "ac_set_fan_speed": lambda: self.ac_set_fan_speed(parameters.get("speed", "auto")),
-            # TV
-            "tv_power_on": self.tv_power_on,
-            "tv_power_off": self.tv_power_off,
-            "tv_set_channel": lambda: self.tv_set_channel(int(parameters.get("channel", 1))),
-            "tv_set_volume": lambda: self.tv_set_volume(int(parameters.get("volume", 30))),
-            "tv_adjust_volume": lambda: self.tv_adjust_volume(int(parameters.get("delta", 0))),
-            "tv_launch_app": lambda: self.tv_launch_app(parameters.get("app_name", "")),
-            # 거실등
-            "light_power_on": self.light_power_on,
-            "light_power_off": self.light_power_off,
-            "light_set_brightness": lambda: self.light_set_brightness(int(parameters.get("brightness", 100))),
-            "light_adjust_brightness": lambda: self.light_adjust_brightness(int(parameters.get("delta", 0))),
-            "light_set_color_temp": lambda: self.light_set_color_temp(int(parameters.get("temp", 4000))),
-            # 로봇청소기
-            "vacuum_start": self.vacuum_start,
-            "vacuum_pause": self.vacuum_pause,
-            "vacuum_stop": self.vacuum_stop,
-            "vacuum_clean_zone": lambda: self.vacuum_clean_zone(parameters.get("zone", "living_room")),
-            "vacuum_return_dock": self.vacuum_return_dock,
-            # 오디오
-            "audio_power_on": self.audio_power_on,
-            "audio_power_off": self.audio_power_off,
-            "audio_set_volume": lambda: self.audio_set_volume(int(parameters.get("volume", 30))),
-            "audio_adjust_volume": lambda: self.audio_adjust_volume(int(parameters.get("delta", 0))),
-            "audio_play": self.audio_play,
-            "audio_pause": self.audio_pause,
-            "audio_stop": self.audio_stop,
-            "audio_play_playlist": lambda: self.audio_play_playlist(parameters.get("playlist", "")),
-            # 전동커튼
-            "curtain_open": self.curtain_open,
-            "curtain_close": self.curtain_close,
-            "curtain_stop": self.curtain_stop,
-            "curtain_set_position": lambda: self.curtain_set_position(int(parameters.get("position", 100))),
-            # 환풍기
-            "ventilation_power_on": self.ventilation_power_on,
-            "ventilation_power_off": self.ventilation_power_off,
-            "ventilation_set_speed": lambda: self.ventilation_set_speed(parameters.get("speed", "auto")),
-        }
-
-        if function_name in function_map:
-            return function_map[function_name]()
-        else:
-            return {"success": False, "message": f"알 수 없는 함수: {function_name}"}
+        """함수 이름과 파라미터로 함수 실행 (스키마 검증 후 디스패치)"""
+        return FUNCTION_DISPATCHER.dispatch(self, function_name, parameters)
 
 
 # === FunctionGemma용 함수 스키마 정의 ===
@@ -1006,3 +1086,8 @@ HOME_FUNCTION_SCHEMAS = [
     }
 ]
 # Total: 37 functions
+
+
+# === 함수 디스패처 (모듈 로드 시 1회 컴파일) ===
+# 스키마마다 핸들러가 없거나 시그니처가 맞지 않으면 import 시점에 실패한다.
+FUNCTION_DISPATCHER = FunctionDispatcher(HOME_FUNCTION_SCHEMAS, HomeController, HOME_PARAMETER_RANGES)
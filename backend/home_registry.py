@@ -0,0 +1,211 @@
+"""
+멀티 테넌트 홈 레지스트리
+home_id별 HomeController를 지연 생성하고, 상태 변경을 home_id와 함께 전달
+홈은 상태를 바꾸는 연산(apply/execute)에서만 생성한다. 조회(state)는 없는 홈이면 기본 상태를 돌려줄 뿐
+저장하지 않으므로, 임의의 home_id로 GET /state, /history, /ws를 보내도 메모리가 늘지 않는다.
+
+- HomeRegistry: 프로세스 내 메모리 (단일 워커)
+- SharedHomeRegistry: 공유 상태 서버 기반 (멀티 워커, FG_STATE_STORE=unix:/path)
+
+FG_JOURNAL_DIR 설정 시 메모리 레지스트리의 적용 연산을 저널에 남기고 재시작 시 복구한다.
+이벤트 루프에서는 apply_async/execute_async/state_async를 쓴다 (공유 모드는 상태 서버 요청을 스레드에서 실행).
+"""
+import asyncio
+import os
+import re
+from functools import partial
+from typing import Any, Callable, Iterator, Optional
+
+from home_controller import HomeController, HomeState
+from state_journal import StateJournal
+from state_store import SocketStateStore, create_state_store
+
+DEFAULT_HOME_ID = "default"
+
+_HOME_ID_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+class InvalidHomeId(ValueError):
+    """허용되지 않는 home_id"""
+
+
+class StateConflictError(RuntimeError):
+    """동시 갱신 충돌이 재시도 한도를 넘음"""
+
+
+def validate_home_id(home_id: str):
+    """home_id 형식 검증 (홈을 만들지 않음)"""
+    if not _HOME_ID_PATTERN.fullmatch(home_id):
+        raise InvalidHomeId(f"잘못된 home_id: {home_id!r}")
+
+
+class HomeRegistry:
+    """home_id -> HomeController 레지스트리"""
+
+    def __init__(self, on_state_change: Callable[[str, dict], Any] = None, journal: Optional[StateJournal] = None):
+        self._homes: dict[str, HomeController] = {}
+        self.on_state_change = on_state_change
+        self.journal = journal
+        self._changed = False
+        if journal is not None:
+            for home_id, state in journal.recover().items():
+                self.get(home_id).state = HomeState.from_dict(state)
+            journal.start()
+
+    def _notify(self, home_id: str, state: dict):
+        self._changed = True
+        if self.on_state_change:
+            self.on_state_change(home_id, state)
+
+    def get(self, home_id: str = DEFAULT_HOME_ID) -> HomeController:
+        """홈 컨트롤러 조회 (없으면 생성, 쓰기 경로 전용)"""
+        controller = self._homes.get(home_id)
+        if controller is None:
+            validate_home_id(home_id)
+            controller = self._create_controller(home_id)
+            self._homes[home_id] = controller
+        return controller
+
+    def _create_controller(self, home_id: str) -> HomeController:
+        return HomeController(on_state_change=partial(self._notify, home_id))
+
+    def apply(self, home_id: str, operation: Callable[..., dict], *args, journal: bool = True) -> dict:
+        """
+        홈 컨트롤러에 연산 적용 (예: apply(home_id, HomeController.ac_power_on))
+
+        journal=False면 저널에 남기지 않음 (시뮬레이터의 연속 값 갱신, 상태 전환만 남김)
+        시뮬레이터가 맡은 홈은 그 사이 값(이동 중인 커튼 위치 등)이 저널에 없으므로, 명령을 남기기 전에
+        명령 직전의 시뮬레이션 값을 apply_simulation으로 먼저 남긴다 (복구 시 같은 위치에서 명령을 재생).
+        """
+        controller = self.get(home_id)
+        if self.journal is None or not journal:
+            return operation(controller, *args)
+
+        simulated = controller.simulated_motion
+        checkpoint = None
+        if simulated and operation is not HomeController.apply_simulation:
+            checkpoint = controller.simulated_values()
+        self._changed = False
+        result = operation(controller, *args)
+        if self._changed:
+            if checkpoint is not None:
+                self.journal.append(home_id, "apply_simulation", (checkpoint,), simulated)
+            self.journal.append(home_id, operation.__name__, args, simulated)
+        return result
+
+    def execute(self, home_id: str, function_name: str, parameters: dict = None) -> dict:
+        """함수 호출 실행"""
+        return self.apply(home_id, HomeController.execute_function, function_name, parameters)
+
+    def state(self, home_id: str = DEFAULT_HOME_ID) -> dict:
+        """홈 상태 조회 (없는 홈은 만들지 않고 기본 상태 반환)"""
+        controller = self._homes.get(home_id)
+        if controller is None:
+            validate_home_id(home_id)
+            return HomeState().to_dict()
+        return controller.state.to_dict()
+
+    async def apply_async(self, home_id: str, operation: Callable[..., dict], *args) -> dict:
+        """이벤트 루프용 apply (메모리 모드는 바로 실행)"""
+        return self.apply(home_id, operation, *args)
+
+    async def execute_async(self, home_id: str, function_name: str, parameters: dict = None) -> dict:
+        """이벤트 루프용 execute"""
+        return await self.apply_async(home_id, HomeController.execute_function, function_name, parameters)
+
+    async def state_async(self, home_id: str = DEFAULT_HOME_ID) -> dict:
+        """이벤트 루프용 state"""
+        return self.state(home_id)
+
+    async def start(self):
+        """백그라운드 작업 시작"""
+
+    async def close(self):
+        """백그라운드 작업 정리"""
+        if self.journal is not None:
+            self.journal.close()
+
+    def home_ids(self) -> Iterator[str]:
+        return iter(self._homes)
+
+    def __contains__(self, home_id: str) -> bool:
+        return home_id in self._homes
+
+    def __len__(self) -> int:
+        return len(self._homes)
+
+
+class SharedHomeRegistry(HomeRegistry):
+    """공유 상태 서버 기반 레지스트리
+
+    연산마다 최신 상태를 읽어 적용한 뒤 버전 비교(CAS)로 저장한다.
+    변경 알림은 상태 서버가 모든 워커(자기 자신 포함)에 모든 홈의 변경을 푸시하므로
+    어느 워커에서 바뀐 홈이든 이력 기록/브로드캐스트가 된다.
+    apply/state는 블로킹 호출이라 이벤트 루프에서는 *_async로 store.executor 스레드에서 실행한다.
+    """
+
+    MAX_RETRIES = 8
+
+    def __init__(self, store: SocketStateStore, on_state_change: Callable[[str, dict], Any] = None):
+        super().__init__(on_state_change=on_state_change)
+        self.store = store
+        self._listener: Optional[asyncio.Task] = None
+
+    def apply(self, home_id: str, operation: Callable[..., dict], *args, journal: bool = True) -> dict:
+        # 상태는 매번 서버에서 읽으므로 컨트롤러를 보관하지 않음
+        # (알림은 상태 서버 푸시로만 전달, 변경 감지용 콜백을 매번 설정)
+        validate_home_id(home_id)
+        controller = HomeController()
+        for _ in range(self.MAX_RETRIES):
+            state, version = self.store.load(home_id)
+            controller.state = HomeState.from_dict(state) if state else HomeState()
+            changes: list[dict] = []
+            controller.on_state_change = changes.append
+            result = operation(controller, *args)
+            if not changes:
+                return result
+            if self.store.compare_and_set(home_id, version, changes[-1]) is not None:
+                return result
+        raise StateConflictError(f"{home_id}: 동시 갱신 충돌")
+
+    def state(self, home_id: str = DEFAULT_HOME_ID) -> dict:
+        validate_home_id(home_id)
+        state, _ = self.store.load(home_id)
+        return state or HomeState().to_dict()
+
+    async def apply_async(self, home_id: str, operation: Callable[..., dict], *args) -> dict:
+        validate_home_id(home_id)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.store.executor, partial(self.apply, home_id, operation, *args))
+
+    async def state_async(self, home_id: str = DEFAULT_HOME_ID) -> dict:
+        validate_home_id(home_id)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.store.executor, self.state, home_id)
+
+    async def start(self):
+        if self._listener is None:
+            self.store.watch_all()
+            self._listener = asyncio.create_task(self.store.listen(self._notify))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.store.close()
+
+
+def create_home_registry(on_state_change: Callable[[str, dict], Any] = None) -> HomeRegistry:
+    """FG_STATE_STORE 설정에 맞는 레지스트리 생성 (기본: 메모리)"""
+    store = create_state_store(os.getenv("FG_STATE_STORE"))
+    if store is None:
+        journal = None
+        journal_dir = os.getenv("FG_JOURNAL_DIR")
+        if journal_dir:
+            journal = StateJournal(
+                journal_dir,
+                snapshot_every=int(os.getenv("FG_JOURNAL_SNAPSHOT_EVERY", "100000")),
+                commit_interval=float(os.getenv("FG_JOURNAL_COMMIT_MS", "5")) / 1000,
+            )
+        return HomeRegistry(on_state_change=on_state_change, journal=journal)
+    return SharedHomeRegistry(store, on_state_change=on_state_change)
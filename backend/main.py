@@ -4,13 +4,30 @@ FunctionGemma 홈 IoT 음성 제어 API
 """
 import asyncio
 import json
-from typing import Set
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Header, Request, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
-from home_controller import HomeController, HomeState
-from function_gemma import get_model
+import metrics
+from degradation import DegradationPlanner
+from execution import CancelToken, JobCancelled, Priority, get_execution_manager
+from home_controller import HomeController
+from home_registry import (
+    DEFAULT_HOME_ID,
+    InvalidHomeId,
+    SharedHomeRegistry,
+    StateConflictError,
+    create_home_registry,
+    validate_home_id,
+)
+from profiling import ProfileStore, ProfilingMiddleware
+from single_flight import SingleFlight, command_key
+from state_history import StateHistory
+from function_gemma import UnknownAdapter, get_model
 from speech_to_text import get_stt
 
 
@@ -29,49 +46,171 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket 연결 관리
-connected_clients: Set[WebSocket] = set()
+# 온디맨드 프로파일링 (FG_PROFILE_DIR 설정 시에만 미들웨어 등록)
+profile_store: ProfileStore | None = None
+if os.getenv("FG_PROFILE_DIR"):
+    profile_store = ProfileStore(
+        os.getenv("FG_PROFILE_DIR"),
+        max_profiles=int(os.getenv("FG_PROFILE_MAX", "20")),
+        sample_interval=float(os.getenv("FG_PROFILE_INTERVAL_MS", "5")) / 1000,
+        admin_token=os.getenv("FG_ADMIN_TOKEN") or None
+    )
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+
+# WebSocket 연결 관리 (home_id별 룸)
+rooms: dict[str, set[WebSocket]] = {}
 
 
-async def broadcast_state(state: dict):
-    """모든 연결된 클라이언트에게 상태 전송"""
-    if connected_clients:
+async def broadcast_state(home_id: str, state: dict):
+    """해당 홈에 연결된 클라이언트에게만 상태 전송"""
+    clients = rooms.get(home_id)
+    if clients:
+        started = time.perf_counter()
         message = json.dumps({
             "type": "state_update",
             "state": state
         })
         disconnected = set()
-        for client in connected_clients:
+        for client in list(clients):
             try:
                 await client.send_text(message)
-            except:
+            except Exception:
                 disconnected.add(client)
-        connected_clients.difference_update(disconnected)
+        clients.difference_update(disconnected)
+        metrics.observe_stage("broadcast", time.perf_counter() - started)
+
+
+# 필드별 상태 변경 이력 (1분 버킷 링 버퍼로 24시간, 최근 갱신된 홈 FG_HISTORY_MAX_HOMES개)
+state_history = StateHistory.from_env()
+metrics.REGISTRY.gauge(
+    "fg_state_history_bytes",
+    "Bytes held by the state history ring buffers",
+    source=state_history.nbytes
+)
+
+
+# 기기 동작 시뮬레이터 (FG_SIMULATOR=1일 때 시작 이벤트에서 생성)
+simulator = None
+simulator_task = None
+
+
+def on_state_change(home_id: str, state: dict):
+    """홈 상태 변경 콜백 (이력 기록 후 구독자가 있는 홈에만 브로드캐스트)"""
+    state_history.record(home_id, state)
+    if simulator is not None:
+        simulator.observe(home_id, state)
+    if rooms.get(home_id):
+        asyncio.create_task(broadcast_state(home_id, state))
+
+
+# 모델 패밀리별 전용 워커 스레드 (FG_GEMMA_THREADS / FG_WHISPER_CPUS ...)
+execution = get_execution_manager()
+
+# 홈 레지스트리 (home_id별 컨트롤러, FG_STATE_STORE 설정 시 공유 상태 서버 사용)
+home_registry = create_home_registry(on_state_change=on_state_change)
+
+# 연결된 WebSocket 클라이언트 수 (수집 시점에 계산)
+metrics.REGISTRY.gauge(
+    "fg_websocket_clients",
+    "Connected WebSocket clients",
+    source=lambda: sum(len(clients) for clients in rooms.values())
+)
+
+# 홈 단위 API 라우터: /homes/{home_id}/... 와 기존 경로(?home_id=, 기본 홈) 양쪽에 등록
+router = APIRouter()
+
+
+@app.exception_handler(InvalidHomeId)
+async def invalid_home_id_handler(request: Request, exc: InvalidHomeId):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
-def on_state_change(state: dict):
-    """홈 상태 변경 콜백"""
-    asyncio.create_task(broadcast_state(state))
+@app.exception_handler(StateConflictError)
+async def state_conflict_handler(request: Request, exc: StateConflictError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
 
 
-# 홈 컨트롤러 인스턴스
-home_controller = HomeController(on_state_change=on_state_change)
+@app.exception_handler(UnknownAdapter)
+async def unknown_adapter_handler(request: Request, exc: UnknownAdapter):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(JobCancelled)
+async def job_cancelled_handler(request: Request, exc: JobCancelled):
+    return _cancelled_response(exc.reason)
+
+
+def _cancelled_response(reason: str, commands: int = 1) -> JSONResponse:
+    """취소된 명령 수를 기록하고 취소 응답 생성"""
+    counter = metrics.CANCELLED_COMMANDS.get(reason)
+    if counter is not None:
+        counter.inc(commands)
+    if reason == "deadline":
+        return JSONResponse(status_code=504, content={"detail": "처리 기한을 넘겨 명령을 취소했습니다."})
+    # 499: 클라이언트가 먼저 연결을 끊음 (nginx 관례, 실제로 받을 클라이언트는 없음)
+    return JSONResponse(status_code=499, content={"detail": "클라이언트 연결이 끊겨 명령을 취소했습니다."})
 
 
 class TextCommand(BaseModel):
-    """텍스트 명령"""
+    """텍스트 명령 (adapter: LoRA 어댑터 이름, 없으면 기본 어댑터)"""
     text: str
+    adapter: str | None = None
 
 
 class CommandResponse(BaseModel):
     """명령 응답"""
     success: bool
+    home_id: str = DEFAULT_HOME_ID
     input_text: str
     function_call: dict | None
     function_calls: list[dict] | None = None
     result: dict | None
     results: list[dict] | None = None
     raw_output: str | None
+    error: str | None = None
+    adapter: str | None = None
+    coalesced: bool = False
+    degradations: list[str] = []
+
+
+class BatchCommandItem(BaseModel):
+    """배치 명령 항목"""
+    home_id: str = DEFAULT_HOME_ID
+    text: str
+    adapter: str | None = None
+
+
+class BatchCommandRequest(BaseModel):
+    """배치 명령 요청"""
+    items: list[BatchCommandItem]
+
+
+class BatchCommandResponse(BaseModel):
+    """배치 명령 응답 (items 순서대로)"""
+    results: list[CommandResponse]
+    succeeded: int
+    failed: int
+
+
+# 배치 명령 설정
+BATCH_MAX_ITEMS = int(os.getenv("FG_BATCH_MAX_ITEMS", "256"))
+GENERATION_BATCH_SIZE = int(os.getenv("FG_GENERATION_BATCH_SIZE", "8"))
+
+# 동시에 들어온 같은 명령(텍스트/음성)은 생성과 실행을 한 번만 (FG_SINGLE_FLIGHT=0이면 끔)
+# 처리 중이던 명령이 취소되면 기다리던 같은 명령이 다시 처리한다
+command_flights = SingleFlight(
+    enabled=os.getenv("FG_SINGLE_FLIGHT", "1") == "1",
+    retry_on=(JobCancelled,)
+)
+
+# 텍스트/음성 명령 처리 기한 (ms, 0이면 없음. 요청마다 X-Deadline-Ms로 지정) / 클라이언트 연결 끊김 확인 주기
+COMMAND_DEADLINE_MS = float(os.getenv("FG_DEADLINE_MS", "0"))
+DISCONNECT_POLL_INTERVAL = float(os.getenv("FG_DISCONNECT_POLL_MS", "100")) / 1000
+
+# 기한이 급하면 더 싼 전략(줄인 프롬프트, 작은 STT, 짧은 생성)으로 처리 (FG_DEGRADE=0이면 끔)
+STT_MODEL = os.getenv("FG_STT_MODEL", "base")
+degradation = DegradationPlanner.from_env()
+stt_warming: dict[str, asyncio.Task] = {}
 
 
 @app.on_event("startup")
@@ -80,6 +219,42 @@ async def startup_event():
     print("Loading models...")
     # 백그라운드에서 모델 로드 (시작 시간 단축을 위해)
     # 실제 요청 시 로드됨
+    await home_registry.start()
+    if os.getenv("FG_SIMULATOR", "0") == "1":
+        start_simulator()
+
+
+def start_simulator():
+    """기기 동작 시뮬레이터 시작 (메모리 레지스트리 전용)"""
+    global simulator, simulator_task
+    if isinstance(home_registry, SharedHomeRegistry):
+        print("FG_SIMULATOR는 FG_STATE_STORE(멀티 워커)와 함께 쓸 수 없어 비활성화합니다.")
+        return
+    from simulator import DeviceSimulator  # numpy는 시뮬레이터를 켤 때만 로드
+
+    simulator = DeviceSimulator(home_registry, publish_slice=int(os.getenv("FG_SIMULATOR_PUBLISH_SLICE", "256")))
+    for home_id in list(home_registry.home_ids()):
+        simulator.add_home(home_id)
+    simulator.populate(int(os.getenv("FG_SIMULATOR_HOMES", "0")))
+    metrics.REGISTRY.gauge("fg_simulator_homes", "Homes driven by the device simulator", source=lambda: simulator.size)
+    metrics.REGISTRY.gauge(
+        "fg_simulator_step_seconds",
+        "Duration of the last simulator tick including state notifications",
+        source=lambda: simulator.last_step_seconds
+    )
+    simulator_task = asyncio.create_task(simulator.run(
+        interval=float(os.getenv("FG_SIMULATOR_TICK_MS", "1000")) / 1000,
+        speed=float(os.getenv("FG_SIMULATOR_SPEED", "1"))
+    ))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """서버 종료 시 정리"""
+    if simulator_task is not None:
+        simulator_task.cancel()
+    await home_registry.close()
+    execution.shutdown(wait=False)
 
 
 @app.get("/")
@@ -88,49 +263,252 @@ async def root():
     return {"status": "ok", "message": "FunctionGemma Home IoT Controller API"}
 
 
-@app.get("/state")
-async def get_state():
+@app.get("/metrics")
+async def get_metrics():
+    """파이프라인 메트릭 (Prometheus 텍스트 포맷)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/adapters")
+async def get_adapters():
+    """등록된 LoRA 어댑터 (어댑터별 메모리 오버헤드, 전환 지연, 요청 수)"""
+    return get_model().adapter_stats()
+
+
+def _require_profile_store(admin_token: str | None) -> ProfileStore:
+    if profile_store is None:
+        raise HTTPException(status_code=404, detail="프로파일링이 비활성화되어 있습니다. (FG_PROFILE_DIR)")
+    if not profile_store.authorized(admin_token):
+        raise HTTPException(status_code=403, detail="관리자 토큰이 필요합니다.")
+    return profile_store
+
+
+@app.post("/admin/profile/arm")
+async def arm_profile(count: int = 1, x_admin_token: str | None = Header(default=None)):
+    """다음 count건의 /command/text, /command/voice 요청 프로파일링 예약"""
+    store = _require_profile_store(x_admin_token)
+    return {"armed": store.arm(count)}
+
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: str | None = Header(default=None)):
+    """저장된 프로파일 목록 (최신순)"""
+    store = _require_profile_store(x_admin_token)
+    return {"profiles": store.list(), "armed": store.armed}
+
+
+@app.get("/admin/profiles/{profile_id}/{filename}")
+async def download_profile(profile_id: str, filename: str, x_admin_token: str | None = Header(default=None)):
+    """프로파일 파일 다운로드 (python.collapsed, torch.json, torch_ops.txt, meta.json)"""
+    store = _require_profile_store(x_admin_token)
+    path = store.file_path(profile_id, filename)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="프로파일 파일을 찾을 수 없습니다.")
+    return FileResponse(path, filename=f"{profile_id}-{filename}")
+
+
+@router.get("/state")
+async def get_state(home_id: str = DEFAULT_HOME_ID):
     """현재 홈 상태 조회"""
-    return home_controller.state.to_dict()
+    return await home_registry.state_async(home_id)
 
 
-@app.post("/command/text", response_model=CommandResponse)
-async def process_text_command(command: TextCommand):
+@router.get("/history")
+async def get_history(
+    home_id: str = DEFAULT_HOME_ID,
+    fields: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+    step: float | None = None
+):
     """
-    텍스트 명령 처리
+    기기 상태 변경 이력 조회
 
-    자연어 텍스트를 받아서 FunctionGemma로 함수 호출 생성,
-    홈 기기 상태 변경 후 결과 반환
+    fields: 쉼표로 구분한 필드 (예: ac.temperature,light.brightness, 없으면 전체)
+    start/end: 유닉스 시각(초), 기본은 최근 24시간
+    step: 있으면 step초 단위로 다운샘플 (구간별 last/min/max/mean, 버킷 단위로 올림). 없으면 버킷별 마지막 변경
+    """
+    current = await home_registry.state_async(home_id)
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    try:
+        return state_history.query(home_id, names, start=start, end=end, step=step, current=current)
+    except KeyError as exc:
+        raise HTTPException(status_code=400, detail=exc.args[0])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _command_token(deadline_ms: float | None = None) -> CancelToken:
+    """요청 하나의 취소 토큰 (deadline_ms > 0이면 지금부터 그 시간 뒤가 기한, None이면 FG_DEADLINE_MS)"""
+    if deadline_ms is None:
+        deadline_ms = COMMAND_DEADLINE_MS
+    return CancelToken(time.monotonic() + deadline_ms / 1000 if deadline_ms > 0 else None)
+
+
+@asynccontextmanager
+async def _cancel_on_disconnect(request: Request, token: CancelToken):
+    """
+    처리하는 동안 클라이언트 연결 끊김을 주기적으로 확인해 token 취소
+
+    Starlette는 연결이 끊겨도 핸들러를 멈추지 않으므로, 받을 곳 없는 생성이 끝까지 돌지 않게 한다.
+    """
+    async def watch():
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel("disconnected")
+                return
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield token
+    finally:
+        watcher.cancel()
+
+
+def _stt_model_size(token: CancelToken) -> tuple[str, list[str]]:
+    """
+    음성 인식 모델 크기와 적용한 degradation
+
+    작은 모델이 아직 로드되지 않았으면 이번 요청은 기본 모델로 처리하고 whisper 워커에서 미리 로드해 둔다.
     """
+    model_size = degradation.stt_size(token, STT_MODEL)
+    if model_size == STT_MODEL:
+        return STT_MODEL, []
+    if not get_stt(model_size).loaded:
+        _warm_stt(model_size)
+        return STT_MODEL, []
+    return model_size, [f"stt_model:{model_size}"]
+
+
+def _warm_stt(model_size: str):
+    """STT 모델을 whisper 워커에서 배치 우선순위로 로드 (크기별 한 번)"""
+    if model_size in stt_warming:
+        return
+
+    def done(task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            del stt_warming[model_size]  # 다음에 필요할 때 다시 시도
+
+    task = asyncio.create_task(execution.run("whisper", get_stt(model_size).load, priority=Priority.BATCH))
+    task.add_done_callback(done)
+    stt_warming[model_size] = task
+
+
+def _text_priority(x_priority: str | None) -> Priority:
+    """X-Priority: batch면 배치 우선순위로 낮춤 (재생/일괄 트래픽용, 높이는 것은 허용하지 않음)"""
+    return Priority.BATCH if (x_priority or "").strip().lower() == "batch" else Priority.INTERACTIVE
+
+
+async def _execute_function_calls(home_id: str, generation_result: dict) -> tuple[list[dict], list[dict]]:
+    """생성된 함수 호출들을 해당 홈에 순차 실행 (멀티턴)"""
+    function_calls = generation_result.get("function_calls") or []
+    if not function_calls and generation_result.get("function_call"):
+        function_calls = [generation_result["function_call"]]
+
+    results = []
+    with metrics.stage_timer("execute_function"):
+        for function_call in function_calls:
+            results.append(
+                await home_registry.execute_async(
+                    home_id,
+                    function_call["function_name"],
+                    function_call["parameters"]
+                )
+            )
+    return function_calls, results
+
+
+async def _generate_and_execute(
+    home_id: str,
+    text: str,
+    adapter: str,
+    token: CancelToken,
+    priority: Priority = Priority.INTERACTIVE
+) -> tuple[dict, list[dict], list[dict], bool]:
+    """
+    함수 호출 생성 + 실행 -> (생성 결과, 함수 호출들, 실행 결과들, coalesced)
+
+    같은 홈/어댑터/정규화 텍스트/관련 기기 상태의 명령이 처리 중이면 새로 생성하지 않고
+    그 결과를 공유한다 (함수 실행도 한 번, coalesced=True). 처리 기한이 처리 중인 요청보다 이르면
+    기다리면 자기 기한을 못 지킬 수 있어 따로 처리하고, 처리 중인 요청이 기한 때문에 낮춘 전략(degradation)으로
+    처리됐으면 그 결과를 받지 않고 자기 기한으로 다시 처리한다.
+    token이 취소되면 생성을 멈추고 기기도 움직이지 않는다 (JobCancelled).
+    """
+    context = await home_registry.state_async(home_id)
     model = get_model()
 
-    # 함수 호출 생성
-    generation_result = model.generate_function_call(
-        command.text,
-        context=home_controller.state.to_dict()
+    def generate() -> dict:
+        # 워커가 작업을 꺼낸 시점의 남은 시간으로 전략 결정 (큐 대기 시간 반영)
+        plan = degradation.plan_generation(token, model.route_prompts)
+        generation_result = model.generate_function_call(
+            text,
+            context=context,
+            adapter=adapter,
+            prune=plan.prune,
+            cancel_token=token,
+            max_new_tokens=plan.max_new_tokens
+        )
+        degradation.observe_generation(generation_result)
+        generation_result["degradations"] = plan.applied(generation_result)
+        return generation_result
+
+    async def generate_and_execute() -> tuple[dict, list[dict], list[dict]]:
+        generation_result = await execution.run("gemma", generate, priority=priority, token=token)
+        metrics.record_generation(generation_result)
+        metrics.record_degradations(generation_result["degradations"])
+        if not generation_result["success"]:
+            return generation_result, [], []
+        token.raise_if_cancelled()  # 응답을 받을 곳이 없거나 기한이 지났으면 실행하지 않음
+        function_calls, results = await _execute_function_calls(home_id, generation_result)
+        return generation_result, function_calls, results
+
+    key = command_key(home_id, adapter, text, context)
+    (generation_result, function_calls, results), coalesced = await command_flights.run(
+        key,
+        generate_and_execute,
+        deadline=token.deadline,
+        share=lambda shared: not shared[0]["degradations"]
     )
+    if coalesced:
+        metrics.COALESCED_COMMANDS.inc()
+    return generation_result, function_calls, results, coalesced
+
+
+@router.post("/command/text", response_model=CommandResponse)
+@metrics.track_queue_depth
+async def process_text_command(
+    command: TextCommand,
+    request: Request,
+    home_id: str = DEFAULT_HOME_ID,
+    x_priority: str | None = Header(default=None),
+    x_deadline_ms: float | None = Header(default=None, ge=0)
+):
+    """
+    텍스트 명령 처리
+
+    자연어 텍스트를 받아서 FunctionGemma로 함수 호출 생성,
+    홈 기기 상태 변경 후 결과 반환 (X-Priority: batch면 음성/대화형 명령 뒤로 양보)
+    X-Deadline-Ms: 처리 기한 (기본 FG_DEADLINE_MS, 0이면 없음). 급하면 더 싼 전략으로 처리하고 degradations에 표시
+    """
+    model = get_model()
+    adapter = model.resolve_adapter(command.adapter)
+    async with _cancel_on_disconnect(request, _command_token(x_deadline_ms)) as token:
+        generation_result, function_calls, results, coalesced = await _generate_and_execute(
+            home_id, command.text, adapter, token, _text_priority(x_priority)
+        )
 
     if not generation_result["success"]:
         return CommandResponse(
             success=False,
+            home_id=home_id,
             input_text=command.text,
             function_call=None,
             result={"message": "함수 호출을 생성하지 못했습니다."},
-            raw_output=generation_result["raw_output"]
-        )
-
-    function_calls = generation_result.get("function_calls") or []
-    if not function_calls and generation_result.get("function_call"):
-        function_calls = [generation_result["function_call"]]
-
-    # 함수 실행 (멀티턴: 여러 함수 순차 실행)
-    results = []
-    for function_call in function_calls:
-        results.append(
-            home_controller.execute_function(
-                function_call["function_name"],
-                function_call["parameters"]
-            )
+            raw_output=generation_result["raw_output"],
+            adapter=adapter,
+            coalesced=coalesced,
+            degradations=generation_result["degradations"]
         )
 
     function_call = function_calls[0] if function_calls else None
@@ -138,29 +516,191 @@ async def process_text_command(command: TextCommand):
 
     return CommandResponse(
         success=True,
+        home_id=home_id,
         input_text=command.text,
         function_call=function_call,
         function_calls=function_calls,
         result=result,
         results=results,
-        raw_output=generation_result["raw_output"]
+        raw_output=generation_result["raw_output"],
+        adapter=adapter,
+        coalesced=coalesced,
+        degradations=generation_result["degradations"]
     )
 
 
-@app.post("/command/voice")
-async def process_voice_command(audio: UploadFile = File(...)):
+@app.post("/command/batch", response_model=BatchCommandResponse)
+@metrics.track_queue_depth
+async def process_batch_command(
+    batch: BatchCommandRequest,
+    request: Request,
+    x_deadline_ms: float | None = Header(default=None, ge=0)
+):
+    """
+    배치 텍스트 명령 처리
+
+    여러 {home_id, text}를 한 번에 받아 FunctionGemma 배치 생성 후 순서대로 실행.
+    항목별로 성공/실패를 반환하며 일부 실패가 다른 항목에 영향을 주지 않는다.
+    생성은 배치 우선순위로 GENERATION_BATCH_SIZE개씩 나눠 넣어 음성/대화형 명령이 사이에 끼어들 수 있다.
+    X-Deadline-Ms: 배치 전체의 처리 기한 (기본 없음). 묶음마다 남은 시간으로 전략을 정해 degradations에 표시하고,
+    기한이 지나면 남은 항목 모두를 취소 명령으로 기록한다.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"items는 최대 {BATCH_MAX_ITEMS}개입니다.")
+
+    responses: list[CommandResponse | None] = [None] * len(batch.items)
+
+    def failure(item: BatchCommandItem, error: str, raw_output: str | None = None) -> CommandResponse:
+        return CommandResponse(
+            success=False,
+            home_id=item.home_id,
+            input_text=item.text,
+            function_call=None,
+            result={"message": error},
+            raw_output=raw_output,
+            error=error
+        )
+
+    # 홈/어댑터 검증 + 컨텍스트 수집 (배치 시작 시점 상태 기준)
+    model = get_model()
+    pending: list[int] = []
+    requests: list[tuple[str, dict]] = []
+    adapters: list[str] = []
+    for index, item in enumerate(batch.items):
+        try:
+            adapter = model.resolve_adapter(item.adapter)
+            context = await home_registry.state_async(item.home_id)
+        except (InvalidHomeId, UnknownAdapter) as exc:
+            responses[index] = failure(item, str(exc))
+            continue
+        pending.append(index)
+        requests.append((item.text, context))
+        adapters.append(adapter)
+
+    def generate_chunk(chunk_requests: list[tuple[str, dict]], chunk_adapters: list[str]) -> list[dict]:
+        # 묶음이 워커에서 시작될 때의 남은 시간으로 전략 결정 (단건 명령과 같은 계획, 관측은 단건 생성만)
+        plan = degradation.plan_generation(token, model.route_prompts)
+        chunk_results = model.generate_function_calls_batch(
+            chunk_requests,
+            batch_size=GENERATION_BATCH_SIZE,
+            prune=plan.prune,
+            adapters=chunk_adapters,
+            cancel_token=token,
+            max_new_tokens=plan.max_new_tokens
+        )
+        for generation_result in chunk_results:
+            generation_result["degradations"] = plan.applied(generation_result)
+        return chunk_results
+
+    # 길이순으로 묶어 패딩을 줄이고, 묶음마다 따로 실행 큐에 넣음
+    generation_results: list[dict | None] = [None] * len(requests)
+    order = sorted(range(len(requests)), key=lambda position: len(requests[position][0]))
+    try:
+        async with _cancel_on_disconnect(request, _command_token(x_deadline_ms or 0)) as token:
+            for start in range(0, len(order), GENERATION_BATCH_SIZE):
+                chunk = order[start:start + GENERATION_BATCH_SIZE]
+                try:
+                    chunk_results = await execution.run(
+                        "gemma",
+                        generate_chunk,
+                        [requests[position] for position in chunk],
+                        [adapters[position] for position in chunk],
+                        priority=Priority.BATCH,
+                        token=token
+                    )
+                except JobCancelled:
+                    raise
+                except Exception as exc:
+                    # 실패한 묶음의 항목만 실패 처리하고 다음 묶음은 계속 생성
+                    for position in chunk:
+                        responses[pending[position]] = failure(batch.items[pending[position]], f"생성 실패: {exc}")
+                    continue
+                # 단건 명령과 같은 메트릭을 묶음이 끝날 때마다 기록
+                for position, generation_result in zip(chunk, chunk_results):
+                    metrics.record_generation(generation_result)
+                    metrics.record_degradations(generation_result["degradations"])
+                    generation_results[position] = generation_result
+            token.raise_if_cancelled()  # 기한이 지났으면 실행하지 않음
+    except JobCancelled as exc:
+        # 배치 항목 하나하나가 명령이므로 실행하지 못한 항목 수만큼 취소로 기록
+        return _cancelled_response(exc.reason, commands=sum(1 for index in pending if responses[index] is None))
+
+    # 항목 순서대로 실행
+    for index, generation_result in zip(pending, generation_results):
+        if generation_result is None:
+            continue
+        item = batch.items[index]
+        if not generation_result["success"]:
+            responses[index] = failure(item, "함수 호출을 생성하지 못했습니다.", generation_result["raw_output"])
+            continue
+        try:
+            function_calls, results = await _execute_function_calls(item.home_id, generation_result)
+        except Exception as exc:
+            responses[index] = failure(item, f"실행 실패: {exc}", generation_result["raw_output"])
+            continue
+        responses[index] = CommandResponse(
+            success=True,
+            home_id=item.home_id,
+            input_text=item.text,
+            function_call=function_calls[0] if function_calls else None,
+            function_calls=function_calls,
+            result=results[0] if results else None,
+            results=results,
+            raw_output=generation_result["raw_output"],
+            adapter=generation_result.get("adapter"),
+            degradations=generation_result["degradations"]
+        )
+
+    succeeded = sum(1 for response in responses if response.success)
+    return BatchCommandResponse(
+        results=responses,
+        succeeded=succeeded,
+        failed=len(responses) - succeeded
+    )
+
+
+@router.post("/command/voice")
+@metrics.track_queue_depth
+async def process_voice_command(
+    request: Request,
+    audio: UploadFile = File(...),
+    home_id: str = DEFAULT_HOME_ID,
+    adapter: str | None = None,
+    x_deadline_ms: float | None = Header(default=None, ge=0)
+):
     """
     음성 명령 처리
 
     음성 파일을 받아서:
     1. Whisper로 텍스트 변환
-    2. FunctionGemma로 함수 호출 생성
+    2. FunctionGemma로 함수 호출 생성 (adapter: LoRA 어댑터 이름)
     3. 홈 기기 상태 변경
+    음성 명령은 가장 높은 우선순위로 실행 큐에 들어간다.
+    X-Deadline-Ms 기한이 급하면 작은 STT 모델/줄인 프롬프트/짧은 생성으로 처리한다 (degradations).
     """
-    # 음성 -> 텍스트
-    stt = get_stt("base")
+    validate_home_id(home_id)
+    model = get_model()
+    adapter = model.resolve_adapter(adapter)  # 음성 인식 전에 어댑터 이름 검증
+    async with _cancel_on_disconnect(request, _command_token(x_deadline_ms)) as token:
+        return await _process_voice(audio, home_id, adapter, token)
+
+
+async def _process_voice(audio: UploadFile, home_id: str, adapter: str, token: CancelToken) -> dict:
+    """음성 명령 처리 본문 (token: 연결 끊김/기한 취소 신호)"""
+    # 음성 -> 텍스트 (Whisper는 중간에 멈출 수 없어 시작 전에만 취소 확인)
+    model_size, degradations = _stt_model_size(token)
+    metrics.record_degradations(degradations)
+    stt = get_stt(model_size)
     audio_bytes = await audio.read()
-    transcription = stt.transcribe_bytes(audio_bytes)
+
+    def transcribe() -> dict:
+        started = time.perf_counter()
+        transcription = stt.transcribe_bytes(audio_bytes)
+        degradation.observe_stt(model_size, time.perf_counter() - started)
+        return transcription
+
+    with metrics.stage_timer("stt"):
+        transcription = await execution.run("whisper", transcribe, priority=Priority.VOICE, token=token)
 
     if not transcription["success"]:
         raise HTTPException(
@@ -173,68 +713,70 @@ async def process_voice_command(audio: UploadFile = File(...)):
     if not recognized_text:
         return {
             "success": False,
+            "home_id": home_id,
             "transcription": "",
-            "message": "음성을 인식하지 못했습니다."
+            "message": "음성을 인식하지 못했습니다.",
+            "degradations": degradations
         }
 
     # 텍스트 명령 처리
-    model = get_model()
-    generation_result = model.generate_function_call(
-        recognized_text,
-        context=home_controller.state.to_dict()
+    generation_result, function_calls, results, coalesced = await _generate_and_execute(
+        home_id, recognized_text, adapter, token, Priority.VOICE
     )
+    degradations = degradations + generation_result["degradations"]
 
     if not generation_result["success"]:
         return {
             "success": False,
+            "home_id": home_id,
             "transcription": recognized_text,
             "function_call": None,
             "result": {"message": "함수 호출을 생성하지 못했습니다."},
-            "raw_output": generation_result["raw_output"]
+            "raw_output": generation_result["raw_output"],
+            "adapter": adapter,
+            "coalesced": coalesced,
+            "degradations": degradations
         }
 
-    function_calls = generation_result.get("function_calls") or []
-    if not function_calls and generation_result.get("function_call"):
-        function_calls = [generation_result["function_call"]]
-
-    # 함수 실행 (멀티턴: 여러 함수 순차 실행)
-    results = []
-    for function_call in function_calls:
-        results.append(
-            home_controller.execute_function(
-                function_call["function_name"],
-                function_call["parameters"]
-            )
-        )
-
     function_call = function_calls[0] if function_calls else None
     result = results[0] if results else None
 
     return {
         "success": True,
+        "home_id": home_id,
         "transcription": recognized_text,
         "detected_language": transcription.get("language", "unknown"),
         "function_call": function_call,
         "function_calls": function_calls,
         "result": result,
         "results": results,
-        "raw_output": generation_result["raw_output"]
+        "raw_output": generation_result["raw_output"],
+        "adapter": adapter,
+        "coalesced": coalesced,
+        "degradations": degradations
     }
 
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket 연결 - 실시간 상태 업데이트"""
-    await websocket.accept()
-    connected_clients.add(websocket)
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, home_id: str = DEFAULT_HOME_ID):
+    """WebSocket 연결 - 해당 홈의 실시간 상태 업데이트"""
+    try:
+        state = await home_registry.state_async(home_id)
+    except InvalidHomeId:
+        await websocket.close(code=1008)
+        return
 
-    # 초기 상태 전송
-    await websocket.send_text(json.dumps({
-        "type": "state_update",
-        "state": home_controller.state.to_dict()
-    }))
+    await websocket.accept()
+    clients = rooms.setdefault(home_id, set())
+    clients.add(websocket)
 
     try:
+        # 초기 상태 전송
+        await websocket.send_text(json.dumps({
+            "type": "state_update",
+            "state": state
+        }))
+
         while True:
             # 클라이언트로부터 메시지 수신 (keepalive)
             data = await websocket.receive_text()
@@ -243,199 +785,215 @@ async def websocket_endpoint(websocket: WebSocket):
             if data == "ping":
                 await websocket.send_text("pong")
     except WebSocketDisconnect:
-        connected_clients.discard(websocket)
+        pass
+    finally:
+        clients.discard(websocket)
+        if not clients and rooms.get(home_id) is clients:
+            del rooms[home_id]
 
 
 # === 에어컨 직접 제어 API ===
 
-@app.post("/device/ac/power/{action}")
-async def ac_power_control(action: str):
+@router.post("/device/ac/power/{action}")
+async def ac_power_control(action: str, home_id: str = DEFAULT_HOME_ID):
     """에어컨 전원 제어"""
     if action == "on":
-        return home_controller.ac_power_on()
+        return await home_registry.apply_async(home_id, HomeController.ac_power_on)
     elif action == "off":
-        return home_controller.ac_power_off()
+        return await home_registry.apply_async(home_id, HomeController.ac_power_off)
     else:
         raise HTTPException(status_code=400, detail="action must be 'on' or 'off'")
 
 
-@app.post("/device/ac/temperature/{temperature}")
-async def ac_set_temp(temperature: int):
+@router.post("/device/ac/temperature/{temperature}")
+async def ac_set_temp(temperature: int, home_id: str = DEFAULT_HOME_ID):
     """에어컨 온도 설정"""
-    return home_controller.ac_set_temperature(temperature)
+    return await home_registry.apply_async(home_id, HomeController.ac_set_temperature, temperature)
 
 
-@app.post("/device/ac/mode/{mode}")
-async def ac_set_mode(mode: str):
+@router.post("/device/ac/mode/{mode}")
+async def ac_set_mode(mode: str, home_id: str = DEFAULT_HOME_ID):
     """에어컨 모드 설정"""
-    return home_controller.ac_set_mode(mode)
+    return await home_registry.apply_async(home_id, HomeController.ac_set_mode, mode)
 
 
-@app.post("/device/ac/fan/{speed}")
-async def ac_set_fan(speed: str):
+@router.post("/device/ac/fan/{speed}")
+async def ac_set_fan(speed: str, home_id: str = DEFAULT_HOME_ID):
     """에어컨 팬 속도 설정"""
-    return home_controller.ac_set_fan_speed(speed)
+    return await home_registry.apply_async(home_id, HomeController.ac_set_fan_speed, speed)
 
 
 # === TV 직접 제어 API ===
 
-@app.post("/device/tv/power/{action}")
-async def tv_power_control(action: str):
+@router.post("/device/tv/power/{action}")
+async def tv_power_control(action: str, home_id: str = DEFAULT_HOME_ID):
     """TV 전원 제어"""
     if action == "on":
-        return home_controller.tv_power_on()
+        return await home_registry.apply_async(home_id, HomeController.tv_power_on)
     elif action == "off":
-        return home_controller.tv_power_off()
+        return await home_registry.apply_async(home_id, HomeController.tv_power_off)
     else:
         raise HTTPException(status_code=400, detail="action must be 'on' or 'off'")
 
 
-@app.post("/device/tv/channel/{channel}")
-async def tv_set_channel(channel: int):
+@router.post("/device/tv/channel/{channel}")
+async def tv_set_channel(channel: int, home_id: str = DEFAULT_HOME_ID):
     """TV 채널 설정"""
-    return home_controller.tv_set_channel(channel)
+    return await home_registry.apply_async(home_id, HomeController.tv_set_channel, channel)
 
 
-@app.post("/device/tv/volume/{volume}")
-async def tv_set_volume(volume: int):
+@router.post("/device/tv/volume/{volume}")
+async def tv_set_volume(volume: int, home_id: str = DEFAULT_HOME_ID):
     """TV 볼륨 설정"""
-    return home_controller.tv_set_volume(volume)
+    return await home_registry.apply_async(home_id, HomeController.tv_set_volume, volume)
 
 
-@app.post("/device/tv/app/{app_name}")
-async def tv_launch_app(app_name: str):
+@router.post("/device/tv/app/{app_name}")
+async def tv_launch_app(app_name: str, home_id: str = DEFAULT_HOME_ID):
     """TV 앱 실행"""
-    return home_controller.tv_launch_app(app_name)
+    return await home_registry.apply_async(home_id, HomeController.tv_launch_app, app_name)
 
 
 # === 거실등 직접 제어 API ===
 
-@app.post("/device/light/power/{action}")
-async def light_power_control(action: str):
+@router.post("/device/light/power/{action}")
+async def light_power_control(action: str, home_id: str = DEFAULT_HOME_ID):
     """거실등 전원 제어"""
     if action == "on":
-        return home_controller.light_power_on()
+        return await home_registry.apply_async(home_id, HomeController.light_power_on)
     elif action == "off":
-        return home_controller.light_power_off()
+        return await home_registry.apply_async(home_id, HomeController.light_power_off)
     else:
         raise HTTPException(status_code=400, detail="action must be 'on' or 'off'")
 
 
-@app.post("/device/light/brightness/{brightness}")
-async def light_set_brightness(brightness: int):
+@router.post("/device/light/brightness/{brightness}")
+async def light_set_brightness(brightness: int, home_id: str = DEFAULT_HOME_ID):
     """거실등 밝기 설정"""
-    return home_controller.light_set_brightness(brightness)
+    return await home_registry.apply_async(home_id, HomeController.light_set_brightness, brightness)
 
 
-@app.post("/device/light/color_temp/{temp}")
-async def light_set_color_temp(temp: int):
+@router.post("/device/light/color_temp/{temp}")
+async def light_set_color_temp(temp: int, home_id: str = DEFAULT_HOME_ID):
     """거실등 색온도 설정"""
-    return home_controller.light_set_color_temp(temp)
+    return await home_registry.apply_async(home_id, HomeController.light_set_color_temp, temp)
 
 
 # === 로봇청소기 직접 제어 API ===
 
-@app.post("/device/vacuum/command/{command}")
-async def vacuum_command(command: str):
+@router.post("/device/vacuum/command/{command}")
+async def vacuum_command(command: str, home_id: str = DEFAULT_HOME_ID):
     """로봇청소기 명령"""
     commands = {
-        "start": home_controller.vacuum_start,
-        "pause": home_controller.vacuum_pause,
-        "stop": home_controller.vacuum_stop,
-        "dock": home_controller.vacuum_return_dock,
+        "start": HomeController.vacuum_start,
+        "pause": HomeController.vacuum_pause,
+        "stop": HomeController.vacuum_stop,
+        "dock": HomeController.vacuum_return_dock,
     }
     if command in commands:
-        return commands[command]()
+        return await home_registry.apply_async(home_id, commands[command])
     else:
         raise HTTPException(status_code=400, detail="command must be 'start', 'pause', 'stop', or 'dock'")
 
 
-@app.post("/device/vacuum/zone/{zone}")
-async def vacuum_clean_zone(zone: str):
+@router.post("/device/vacuum/zone/{zone}")
+async def vacuum_clean_zone(zone: str, home_id: str = DEFAULT_HOME_ID):
     """로봇청소기 구역 청소"""
-    return home_controller.vacuum_clean_zone(zone)
+    return await home_registry.apply_async(home_id, HomeController.vacuum_clean_zone, zone)
 
 
 # === 오디오 직접 제어 API ===
 
-@app.post("/device/audio/power/{action}")
-async def audio_power_control(action: str):
+@router.post("/device/audio/power/{action}")
+async def audio_power_control(action: str, home_id: str = DEFAULT_HOME_ID):
     """오디오 전원 제어"""
     if action == "on":
-        return home_controller.audio_power_on()
+        return await home_registry.apply_async(home_id, HomeController.audio_power_on)
     elif action == "off":
-        return home_controller.audio_power_off()
+        return await home_registry.apply_async(home_id, HomeController.audio_power_off)
     else:
         raise HTTPException(status_code=400, detail="action must be 'on' or 'off'")
 
 
-@app.post("/device/audio/volume/{volume}")
-async def audio_set_volume(volume: int):
+@router.post("/device/audio/volume/{volume}")
+async def audio_set_volume(volume: int, home_id: str = DEFAULT_HOME_ID):
     """오디오 볼륨 설정"""
-    return home_controller.audio_set_volume(volume)
+    return await home_registry.apply_async(home_id, HomeController.audio_set_volume, volume)
 
 
-@app.post("/device/audio/playback/{command}")
-async def audio_playback(command: str):
+@router.post("/device/audio/playback/{command}")
+async def audio_playback(command: str, home_id: str = DEFAULT_HOME_ID):
     """오디오 재생 제어"""
     commands = {
-        "play": home_controller.audio_play,
-        "pause": home_controller.audio_pause,
-        "stop": home_controller.audio_stop,
+        "play": HomeController.audio_play,
+        "pause": HomeController.audio_pause,
+        "stop": HomeController.audio_stop,
     }
     if command in commands:
-        return commands[command]()
+        return await home_registry.apply_async(home_id, commands[command])
     else:
         raise HTTPException(status_code=400, detail="command must be 'play', 'pause', or 'stop'")
 
 
-@app.post("/device/audio/playlist/{playlist}")
-async def audio_play_playlist(playlist: str):
+@router.post("/device/audio/playlist/{playlist}")
+async def audio_play_playlist(playlist: str, home_id: str = DEFAULT_HOME_ID):
     """오디오 플레이리스트 재생"""
-    return home_controller.audio_play_playlist(playlist)
+    return await home_registry.apply_async(home_id, HomeController.audio_play_playlist, playlist)
 
 
 # === 전동커튼 직접 제어 API ===
 
-@app.post("/device/curtain/command/{command}")
-async def curtain_command(command: str):
+@router.post("/device/curtain/command/{command}")
+async def curtain_command(command: str, home_id: str = DEFAULT_HOME_ID):
     """전동커튼 명령"""
     commands = {
-        "open": home_controller.curtain_open,
-        "close": home_controller.curtain_close,
-        "stop": home_controller.curtain_stop,
+        "open": HomeController.curtain_open,
+        "close": HomeController.curtain_close,
+        "stop": HomeController.curtain_stop,
     }
     if command in commands:
-        return commands[command]()
+        return await home_registry.apply_async(home_id, commands[command])
     else:
         raise HTTPException(status_code=400, detail="command must be 'open', 'close', or 'stop'")
 
 
-@app.post("/device/curtain/position/{position}")
-async def curtain_set_position(position: int):
+@router.post("/device/curtain/position/{position}")
+async def curtain_set_position(position: int, home_id: str = DEFAULT_HOME_ID):
     """전동커튼 위치 설정"""
-    return home_controller.curtain_set_position(position)
+    return await home_registry.apply_async(home_id, HomeController.curtain_set_position, position)
 
 
 # === 환풍기 직접 제어 API ===
 
-@app.post("/device/ventilation/power/{action}")
-async def ventilation_power_control(action: str):
+@router.post("/device/ventilation/power/{action}")
+async def ventilation_power_control(action: str, home_id: str = DEFAULT_HOME_ID):
     """환풍기 전원 제어"""
     if action == "on":
-        return home_controller.ventilation_power_on()
+        return await home_registry.apply_async(home_id, HomeController.ventilation_power_on)
     elif action == "off":
-        return home_controller.ventilation_power_off()
+        return await home_registry.apply_async(home_id, HomeController.ventilation_power_off)
     else:
         raise HTTPException(status_code=400, detail="action must be 'on' or 'off'")
 
 
-@app.post("/device/ventilation/speed/{speed}")
-async def ventilation_set_speed(speed: str):
+@router.post("/device/ventilation/speed/{speed}")
+async def ventilation_set_speed(speed: str, home_id: str = DEFAULT_HOME_ID):
     """환풍기 속도 설정"""
-    return home_controller.ventilation_set_speed(speed)
+    return await home_registry.apply_async(home_id, HomeController.ventilation_set_speed, speed)
+
+
+# 기존 경로(기본 홈, ?home_id= 로 지정 가능)와 홈 단위 경로 등록
+app.include_router(router)
+app.include_router(router, prefix="/homes/{home_id}")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=18080)
+    workers = int(os.getenv("FG_WORKERS", "1"))
+    if workers > 1:
+        # 멀티 워커는 공유 상태 저장소 필요 (FG_STATE_STORE=unix:/tmp/fg-state.sock)
+        if not os.getenv("FG_STATE_STORE"):
+            print("Warning: FG_WORKERS > 1 without FG_STATE_STORE; each worker keeps its own home state.")
+        uvicorn.run("main:app", host="0.0.0.0", port=18080, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=18080)
@@ -0,0 +1,264 @@
+"""
+명령 파이프라인 메트릭 (Prometheus 텍스트 포맷)
+외부 의존성 없이 카운터/게이지/히스토그램만 구현. 기록은 bisect + 덧셈 몇 번이라 상시 활성화해도 된다.
+
+    GET /metrics  ->  render()
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# 파이프라인 단계 (process_text_command / process_voice_command)
+PIPELINE_STAGES = ("stt", "template", "prefill", "decode", "parse", "execute_function", "broadcast")
+
+# 초 단위 지연 버킷 (1ms ~ 30s)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# 명령 취소 사유 (execution.CancelToken.cancel)
+CANCEL_REASONS = ("disconnected", "deadline")
+
+# 기한 때문에 낮춘 전략 (degradation 모듈)
+DEGRADATION_KINDS = ("pruned_prompt", "stt_model", "max_new_tokens")
+
+# 디코드 tokens/s 버킷
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    # 라벨 값은 코드에서 정한 상수(단계 이름 등)만 사용하므로 이스케이프하지 않음
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """단조 증가 카운터"""
+
+    def __init__(self, name: str, help_text: str, labels: Optional[dict] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"
+
+
+class Gauge:
+    """현재 값 게이지 (source를 주면 수집 시점에 값을 읽음)"""
+
+    def __init__(self, name: str, help_text: str, source: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.source = source
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> Iterator[str]:
+        value = self.source() if self.source is not None else self.value
+        yield f"{self.name} {_format_value(value)}"
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (버킷별 카운트는 비누적으로 저장, 출력 시 누적)"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS, labels: Optional[dict] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = {**self.labels, "le": _format_value(bound)}
+            yield f"{self.name}_bucket{_format_labels(labels)} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labels)} {_format_value(total_sum)}"
+        yield f"{self.name}_count{_format_labels(self.labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """메트릭 모음 (이름 단위로 HELP/TYPE을 한 번만 출력)"""
+
+    def __init__(self):
+        self._families: dict[str, tuple[str, str, list]] = {}
+
+    def _register(self, kind: str, metric):
+        family = self._families.get(metric.name)
+        if family is None:
+            family = self._families[metric.name] = (kind, metric.help_text, [])
+        elif family[0] != kind:
+            raise ValueError(f"메트릭 타입 충돌: {metric.name}")
+        family[2].append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[dict] = None) -> Counter:
+        return self._register("counter", Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, source: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register("gauge", Gauge(name, help_text, source))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS,
+                  labels: Optional[dict] = None) -> Histogram:
+        return self._register("histogram", Histogram(name, help_text, buckets, labels))
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, metrics) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# === 백엔드 메트릭 ===
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = {
+    stage: REGISTRY.histogram(
+        "fg_stage_duration_seconds",
+        "Command pipeline stage latency in seconds",
+        labels={"stage": stage},
+    )
+    for stage in PIPELINE_STAGES
+}
+
+PROMPT_TOKENS = REGISTRY.counter("fg_prompt_tokens_total", "Prompt tokens fed to FunctionGemma")
+GENERATED_TOKENS = REGISTRY.counter("fg_generated_tokens_total", "Tokens generated by FunctionGemma")
+DECODE_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "fg_decode_tokens_per_second",
+    "Per-request decode throughput (generated tokens after the first / decode time)",
+    buckets=THROUGHPUT_BUCKETS,
+)
+ADAPTER_SWITCH = REGISTRY.histogram(
+    "fg_adapter_switch_seconds",
+    "LoRA adapter switch latency in seconds (only requests that changed the active adapter)",
+)
+QUEUE_DEPTH = REGISTRY.gauge("fg_command_queue_depth", "Commands waiting for or running in the pipeline")
+COALESCED_COMMANDS = REGISTRY.counter(
+    "fg_coalesced_commands_total",
+    "Commands that shared an identical in-flight command's generation and execution",
+)
+CANCELLED_COMMANDS = {
+    reason: REGISTRY.counter(
+        "fg_cancelled_commands_total",
+        "Commands stopped before completion (client disconnected or deadline passed)",
+        labels={"reason": reason},
+    )
+    for reason in CANCEL_REASONS
+}
+DEGRADED_COMMANDS = {
+    kind: REGISTRY.counter(
+        "fg_degraded_commands_total",
+        "Commands processed with a cheaper strategy to meet their deadline",
+        labels={"degradation": kind},
+    )
+    for kind in DEGRADATION_KINDS
+}
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_DURATION[stage].observe(seconds)
+
+
+def stage_timer(stage: str):
+    """with stage_timer("stt"): ..."""
+    return STAGE_DURATION[stage].time()
+
+
+def track_queue_depth(handler):
+    """비동기 엔드포인트 실행 동안 QUEUE_DEPTH를 올려 둠 (FastAPI 시그니처는 wraps로 유지)"""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        QUEUE_DEPTH.inc()
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            QUEUE_DEPTH.dec()
+    return wrapper
+
+
+def record_generation(result: dict):
+    """FunctionGemma 생성 결과의 timings/토큰 수 기록 (없는 항목은 건너뜀)"""
+    timings = result.get("timings") or {}
+    for stage in ("template", "prefill", "decode", "parse"):
+        seconds = timings.get(stage)
+        if seconds is not None:
+            STAGE_DURATION[stage].observe(seconds)
+    if timings.get("adapter_switch"):
+        ADAPTER_SWITCH.observe(timings["adapter_switch"])
+
+    prompt_tokens = result.get("prompt_tokens")
+    if prompt_tokens:
+        PROMPT_TOKENS.inc(prompt_tokens)
+    generated_tokens = result.get("generated_tokens")
+    if generated_tokens:
+        GENERATED_TOKENS.inc(generated_tokens)
+        decode_seconds = timings.get("decode")
+        if decode_seconds and generated_tokens > 1:
+            DECODE_TOKENS_PER_SECOND.observe((generated_tokens - 1) / decode_seconds)
+
+
+def record_degradations(degradations: list[str]):
+    """적용한 degradation 항목 ("max_new_tokens:64" -> max_new_tokens) 카운트"""
+    for degradation in degradations:
+        counter = DEGRADED_COMMANDS.get(degradation.partition(":")[0])
+        if counter is not None:
+            counter.inc()
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,308 @@
+"""
+요청 단위 온디맨드 프로파일링
+/command/text, /command/voice 한 건을 torch 프로파일러 + 파이썬 샘플링 프로파일러로 감싸서
+디스크 링 버퍼(최근 N개)에 저장한다.
+
+- 파이썬 샘플링: 요청 동안 이벤트 루프 스레드, 그리고 이 요청의 모델 작업이 실행되는 동안만 그 워커 스레드
+- torch 프로파일러: 모델 연산은 워커 스레드에서 돌므로 이 요청의 작업마다 워커 안에서 켜고 끈다
+  (세션은 execution.JOB_PROFILE로 작업에 전달. 같은 워커의 다른 요청 작업은 포함되지 않음)
+
+- 트리거: 요청 헤더 X-Profile: 1, 또는 POST /admin/profile/arm 으로 다음 N건 예약
+- FG_PROFILE_DIR 미설정 시 미들웨어 자체를 등록하지 않으므로 오버헤드 없음
+- FG_ADMIN_TOKEN 설정 시 헤더 트리거와 관리 API 모두 X-Admin-Token 일치 필요
+
+저장 구성 (<FG_PROFILE_DIR>/<profile_id>/):
+    meta.json         {"id", "path", "trigger", "started_at", "duration_s", "status", "files"}
+    python.collapsed  샘플링 스택 (flamegraph.pl / speedscope 호환 "a;b;c count")
+    torch.json        작업별 torch 프로파일러 Chrome trace를 합친 것 (chrome://tracing, Perfetto)
+    torch_ops.txt     작업별 연산자 self CPU 시간 상위 표
+"""
+import asyncio
+import json
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from execution import JOB_PROFILE
+
+PROFILED_PATHS = ("/command/text", "/command/voice")
+
+_PROFILE_ID_PATTERN = re.compile(r"[0-9]{8}-[0-9]{6}-[0-9a-f]{6}")
+
+
+class StackSampler:
+    """
+    대상 스레드의 파이썬 스택을 주기적으로 샘플링 (sys._current_frames 기반)
+
+    add_thread/remove_thread로 그 사이에만 함께 샘플링할 스레드를 지정한다 (모델 작업 중인 워커 스레드).
+    이 스레드들의 스택 앞에는 [스레드 이름]을 붙인다.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._threads: dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_thread(self, thread_id: int, name: str):
+        self._threads[thread_id] = name
+
+    def remove_thread(self, thread_id: int):
+        self._threads.pop(thread_id, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self._sample(frames.get(self.thread_id), None)
+            for thread_id, name in list(self._threads.items()):
+                self._sample(frames.get(thread_id), name)
+
+    def _sample(self, frame, thread_name: Optional[str]):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+            frame = frame.f_back
+        if not stack:
+            return
+        if thread_name is not None:
+            stack.append(f"[{thread_name}]")
+        self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileSession:
+    """요청 한 건의 프로파일링 (이벤트 루프 스레드에서 start/stop)"""
+
+    def __init__(self, store: "ProfileStore", path: str, trigger: str):
+        self.store = store
+        self.path = path
+        self.trigger = trigger
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status: Optional[int] = None
+        self._sampler = StackSampler(threading.get_ident(), store.sample_interval)
+        self._torch_jobs: list[tuple[str, object]] = []  # (패밀리, 작업 하나의 torch 프로파일)
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._started = 0.0
+
+    def start(self):
+        self._sampler.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        with self._lock:
+            self._stopped = True  # 응답 후에 끝난 작업은 저장하지 않음
+        self._sampler.stop()
+
+    @contextmanager
+    def job(self, family: str):
+        """이 요청의 모델 작업 하나를 감쌈 (워커 스레드에서): 그동안만 이 스레드를 샘플링하고 torch 프로파일러를 켬"""
+        thread = threading.current_thread()
+        torch_profile = _torch_profile()
+        self._sampler.add_thread(thread.ident, thread.name)
+        if torch_profile is not None:
+            torch_profile.__enter__()
+        try:
+            yield
+        finally:
+            if torch_profile is not None:
+                torch_profile.__exit__(None, None, None)
+            self._sampler.remove_thread(thread.ident)
+            with self._lock:
+                if torch_profile is not None and not self._stopped:
+                    self._torch_jobs.append((family, torch_profile))
+
+    def save(self) -> dict:
+        """프로파일 파일 기록 후 링 버퍼 정리 (스레드에서 실행)"""
+        directory = self.store.directory / self.id
+        directory.mkdir(parents=True)
+        files = ["python.collapsed"]
+        (directory / "python.collapsed").write_text(self._sampler.collapsed(), encoding="utf-8")
+        if self._torch_jobs:
+            _write_torch_profiles(directory, self._torch_jobs)
+            files += ["torch.json", "torch_ops.txt"]
+
+        meta = {
+            "id": self.id,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration, 6),
+            "status": self.status,
+            "samples": sum(self._sampler.samples.values()),
+            "jobs": [family for family, _ in self._torch_jobs],
+            "files": files,
+        }
+        (directory / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        self.store.evict()
+        return meta
+
+
+class ProfileStore:
+    """디스크 링 버퍼 + 트리거 상태"""
+
+    def __init__(self, directory: str, max_profiles: int = 20, sample_interval: float = 0.005,
+                 admin_token: Optional[str] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_profiles = max_profiles
+        self.sample_interval = sample_interval
+        self.admin_token = admin_token
+        self.armed = 0
+        self.active = False
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return self.admin_token is None or (
+            token is not None and secrets.compare_digest(token, self.admin_token)
+        )
+
+    def arm(self, count: int = 1) -> int:
+        """다음 count건의 명령을 프로파일링하도록 예약"""
+        self.armed = max(0, count)
+        return self.armed
+
+    def begin(self, path: str, header_requested: bool) -> Optional[ProfileSession]:
+        """이번 요청을 프로파일링할지 결정 (동시에 하나만)"""
+        if self.active:
+            return None
+        if header_requested:
+            trigger = "header"
+        elif self.armed > 0:
+            self.armed -= 1
+            trigger = "armed"
+        else:
+            return None
+        self.active = True
+        session = ProfileSession(self, path, trigger)
+        session.start()
+        return session
+
+    def end(self, session: ProfileSession):
+        session.stop()
+        self.active = False
+
+    def list(self) -> list[dict]:
+        profiles = []
+        for meta_path in self.directory.glob("*/meta.json"):
+            try:
+                profiles.append(json.loads(meta_path.read_text(encoding="utf-8")))
+            except (OSError, json.JSONDecodeError):
+                continue
+        profiles.sort(key=lambda meta: meta["started_at"], reverse=True)
+        return profiles
+
+    def file_path(self, profile_id: str, filename: str) -> Optional[Path]:
+        """다운로드할 파일 경로 (meta.json에 기록된 파일만 허용)"""
+        if not _PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        directory = self.directory / profile_id
+        try:
+            meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if filename != "meta.json" and filename not in meta["files"]:
+            return None
+        return directory / filename
+
+    def evict(self):
+        """최근 max_profiles개만 남기고 삭제"""
+        directories = sorted(
+            (path for path in self.directory.iterdir() if _PROFILE_ID_PATTERN.fullmatch(path.name)),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for old in directories[self.max_profiles:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class ProfilingMiddleware:
+    """프로파일 대상 경로의 요청을 세션으로 감싸는 ASGI 미들웨어"""
+
+    def __init__(self, app, store: ProfileStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith(PROFILED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        header_requested = (
+            headers.get(b"x-profile") in (b"1", b"true")
+            and self.store.authorized(_decode(headers.get(b"x-admin-token")))
+        )
+        session = self.store.begin(scope["path"], header_requested)
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                session.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.id.encode("ascii"))
+                ]
+            await send(message)
+
+        # 이 요청이 실행 큐에 넣는 작업에 세션을 붙임 (요청 안에서 만든 태스크에도 전달됨)
+        context_token = JOB_PROFILE.set(session)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            JOB_PROFILE.reset(context_token)
+            self.store.end(session)
+            await asyncio.to_thread(session.save)
+
+
+def _torch_profile():
+    """작업 하나용 torch CPU 프로파일러 (torch가 없으면 None)"""
+    try:
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        return None
+    return profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+
+
+def _write_torch_profiles(directory: Path, jobs: list[tuple[str, object]]):
+    """작업별 Chrome trace를 torch.json 하나로 합치고, 연산자 표를 작업 순서대로 torch_ops.txt에 기록"""
+    events = []
+    tables = []
+    for index, (family, torch_profile) in enumerate(jobs):
+        part = directory / f"torch-{index}.json"
+        torch_profile.export_chrome_trace(str(part))
+        events.extend(json.loads(part.read_text(encoding="utf-8")).get("traceEvents", []))
+        part.unlink()
+        table = torch_profile.key_averages().table(sort_by="self_cpu_time_total", row_limit=50)
+        tables.append(f"== job {index}: {family} ==\n{table}")
+    (directory / "torch.json").write_text(json.dumps({"traceEvents": events}), encoding="utf-8")
+    (directory / "torch_ops.txt").write_text("\n\n".join(tables), encoding="utf-8")
+
+
+def _decode(value: Optional[bytes]) -> Optional[str]:
+    return value.decode("latin-1") if value is not None else None
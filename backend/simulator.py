@@ -0,0 +1,352 @@
+"""
+기기 동작 시뮬레이터 (틱 단위, NumPy 벡터화)
+명령은 목표만 정하고, 시간이 지나며 바뀌는 값은 틱마다 모든 홈을 한 번에 계산한다.
+
+- 에어컨: 실내 온도가 실외로 새어나가며, 켜져 있으면 모드/팬 속도에 따라 목표 온도 쪽으로 이동
+  (냉방은 내리기만, 난방은 올리기만, 자동은 양쪽, 송풍은 실외 공기와 섞음). 실외 온도는 하루 주기로 변화
+- 커튼: 목표 위치까지 일정 속도로 이동 (OPENING/CLOSING -> 도착하면 STOPPED)
+- 로봇청소기: 청소 중 진행률 증가/배터리 소모, 다 끝나거나 배터리가 부족하면 복귀 후 IDLE에서 충전
+
+홈마다 한 행인 배열(struct-of-arrays)에 상태를 두고, 표시 단위(0.1도, 1%)로 바뀐 홈만
+registry.apply(HomeController.apply_simulation)으로 반영한다. 명령과 같은 알림 경로
+(이력 기록, WebSocket 브로드캐스트)를 그대로 탄다. 저널에는 커튼/청소기 상태가 바뀐 갱신만 남기고
+온도, 커튼 위치, 진행률, 배터리처럼 틱마다 바뀌는 값만 있는 갱신은 남기지 않는다 (복구 후 다시 계산).
+명령으로 바뀐 입력(전원, 모드, 목표 온도/위치, 청소 상태)은 observe()로 받아 배열에 반영한다.
+커튼 명령이 바로 이동하지 않고 목표만 정하는 것은 시뮬레이터가 맡은 홈의 컨트롤러뿐이다 (simulated_motion).
+
+run()은 틱(NumPy, 홈 1만 개에 1ms 미만)만 이벤트 루프에서 한 번에 계산하고, 반영은 publish_slice개 홈마다
+이벤트 루프에 양보하며 나눠 한다. 틱을 스레드로 보내지 않는 것은 observe()가 같은 배열을 루프에서 고치기 때문이다.
+
+메모리 레지스트리 전용 (FG_STATE_STORE 멀티 워커 모드에서는 워커마다 따로 돌게 되므로 사용하지 않음)
+"""
+import asyncio
+import math
+import time
+from typing import Optional
+
+import numpy as np
+
+from home_controller import ACMode, CurtainStatus, FanSpeed, HomeController, VacuumStatus
+
+AC_MODES = list(ACMode)
+CURTAIN_STATUSES = list(CurtainStatus)
+VACUUM_STATUSES = list(VacuumStatus)
+
+COOLING = AC_MODES.index(ACMode.COOLING)
+HEATING = AC_MODES.index(ACMode.HEATING)
+VENTILATION = AC_MODES.index(ACMode.VENTILATION)
+OPENING = CURTAIN_STATUSES.index(CurtainStatus.OPENING)
+CLOSING = CURTAIN_STATUSES.index(CurtainStatus.CLOSING)
+STOPPED = CURTAIN_STATUSES.index(CurtainStatus.STOPPED)
+IDLE = VACUUM_STATUSES.index(VacuumStatus.IDLE)
+CLEANING = VACUUM_STATUSES.index(VacuumStatus.CLEANING)
+RETURNING = VACUUM_STATUSES.index(VacuumStatus.RETURNING)
+
+# 팬 속도별 냉난방 세기 배율
+FAN_FACTOR = {FanSpeed.LOW: 0.6, FanSpeed.MEDIUM: 1.0, FanSpeed.HIGH: 1.4, FanSpeed.AUTO: 1.2}
+
+# 열 모델 (1/초, °C/초)
+LEAK_RATE = 1 / 5400  # 실내외 열 교환 (시정수 1.5시간)
+AC_GAIN = 1 / 600  # 목표 온도와의 차이에 비례하는 냉난방 속도
+AC_MAX_RATE = 0.005  # 최대 냉난방 속도 (10분에 3도)
+VENTILATION_GAIN = 1 / 900  # 송풍 모드: 실외 공기와 섞는 속도
+DAILY_SWING = 4.0  # 실외 온도 일교차의 절반 (°C, 15시 최고)
+MAX_STEP = 10.0  # 한 번에 적분하는 최대 시간 (초), 더 긴 dt는 나눠서 계산
+
+# 커튼/청소기
+CURTAIN_SPEED = 5.0  # %/초 (완전 개폐 20초)
+HOME_CLEAN_SECONDS = 1800.0  # 전체 청소 시간
+ZONE_CLEAN_SECONDS = 600.0  # 구역 청소 시간
+BATTERY_DRAIN = 100 / 5400  # %/초 (90분 사용)
+BATTERY_CHARGE = 100 / 3600  # %/초 (1시간 충전)
+LOW_BATTERY = 15.0
+RETURN_SECONDS = 60.0  # 충전 독 복귀 시간
+
+_ARRAYS = {
+    # 에어컨 입력
+    "ac_power": np.bool_, "ac_mode": np.int8, "ac_fan": np.float64, "ac_target": np.float64,
+    # 온도
+    "indoor": np.float64, "outdoor_base": np.float64,
+    # 커튼
+    "curtain_position": np.float64, "curtain_target": np.float64,
+    # 청소기
+    "vacuum_status": np.int8, "vacuum_zone": np.bool_, "vacuum_progress": np.float64,
+    "vacuum_battery": np.float64, "vacuum_return_left": np.float64,
+    # 마지막으로 반영한 표시 값 (바뀐 홈만 알림)
+    "shown_indoor": np.float64, "shown_outdoor": np.float64, "shown_position": np.int16,
+    "shown_curtain_status": np.int8, "shown_vacuum_status": np.int8, "shown_progress": np.int16,
+    "shown_battery": np.int16,
+}
+
+
+def outdoor_offset(clock: float) -> float:
+    """시각(epoch 초)의 실외 온도 일교차 성분 (현지 15시 최고, 3시 최저)"""
+    local = time.localtime(clock)
+    hour = local.tm_hour + local.tm_min / 60 + local.tm_sec / 3600
+    return DAILY_SWING * math.cos(2 * math.pi * (hour - 15) / 24)
+
+
+class DeviceSimulator:
+    """홈 N개의 기기 동작을 배열로 시뮬레이션"""
+
+    def __init__(self, registry, clock: Optional[float] = None, capacity: int = 64, publish_slice: int = 256):
+        self.registry = registry
+        self.clock = time.time() if clock is None else clock
+        self.size = 0
+        self.home_ids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.ticks = 0
+        self.updates = 0
+        self.last_step_seconds = 0.0
+        self.publish_slice = publish_slice
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        for name, dtype in _ARRAYS.items():
+            array = np.zeros(capacity, dtype=dtype)
+            if self.size:
+                array[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    # === 홈 등록 / 명령 반영 ===
+
+    def add_home(self, home_id: str) -> int:
+        """홈 추가 (현재 상태로 초기화)"""
+        row = self.rows.get(home_id)
+        if row is not None:
+            return row
+        if self.size == self.capacity:
+            self._allocate(self.capacity * 2)
+        row = self.size
+        self.size += 1
+        self.rows[home_id] = row
+        self.home_ids.append(home_id)
+
+        # 이 홈의 커튼 명령은 위치를 바로 바꾸지 않고 목표만 정함
+        controller = self.registry.get(home_id)
+        controller.simulated_motion = True
+        state = controller.state.to_dict()
+        self.outdoor_base[row] = state["ac"]["outdoor_temperature"] - outdoor_offset(self.clock)
+        self.shown_indoor[row] = np.nan  # 아래 observe에서 모두 외부 변경으로 받아들이도록
+        self.shown_outdoor[row] = state["ac"]["outdoor_temperature"]
+        self.shown_position[row] = -1
+        self.shown_vacuum_status[row] = -1
+        self.shown_progress[row] = -1
+        self.shown_battery[row] = -1
+        self.observe(home_id, state)
+        return row
+
+    def populate(self, count: int, prefix: str = "sim-", seed: int = 0) -> list[str]:
+        """부하 테스트용 홈 count개 생성 (온도/에어컨 사용을 홈마다 다르게)"""
+        rng = np.random.default_rng(seed)
+        home_ids = []
+        for index in range(count):
+            home_id = f"{prefix}{index:05d}"
+            self.registry.apply(home_id, HomeController.apply_simulation, {"ac": {
+                "indoor_temperature": round(float(rng.uniform(22, 30)), 1),
+                "outdoor_temperature": round(float(rng.uniform(24, 34)), 1),
+            }})
+            if rng.random() < 0.5:
+                self.registry.apply(home_id, HomeController.ac_set_temperature, int(rng.integers(20, 27)))
+            self.add_home(home_id)
+            home_ids.append(home_id)
+        return home_ids
+
+    def observe(self, home_id: str, state: dict):
+        """상태 변경 알림 수신: 명령으로 바뀐 입력을 배열에 반영 (자신이 반영한 값은 그대로)"""
+        row = self.rows.get(home_id)
+        if row is None:
+            self.add_home(home_id)
+            return
+        ac, curtain, vacuum = state["ac"], state["curtain"], state["vacuum"]
+
+        self.ac_power[row] = ac["power"]
+        self.ac_mode[row] = AC_MODES.index(ACMode(ac["mode"]))
+        self.ac_fan[row] = FAN_FACTOR[FanSpeed(ac["fan_speed"])]
+        self.ac_target[row] = ac["temperature"]
+        if ac["indoor_temperature"] != self.shown_indoor[row]:
+            self.indoor[row] = self.shown_indoor[row] = ac["indoor_temperature"]
+        if ac["outdoor_temperature"] != self.shown_outdoor[row]:
+            self.outdoor_base[row] += ac["outdoor_temperature"] - self.shown_outdoor[row]
+            self.shown_outdoor[row] = ac["outdoor_temperature"]
+
+        self.curtain_target[row] = curtain["target_position"]
+        if curtain["position"] != self.shown_position[row]:
+            self.curtain_position[row] = self.shown_position[row] = curtain["position"]
+        self.shown_curtain_status[row] = CURTAIN_STATUSES.index(CurtainStatus(curtain["status"]))
+
+        status = VACUUM_STATUSES.index(VacuumStatus(vacuum["status"]))
+        if status != self.shown_vacuum_status[row]:
+            self.vacuum_status[row] = self.shown_vacuum_status[row] = status
+            self.vacuum_return_left[row] = RETURN_SECONDS
+        self.vacuum_zone[row] = vacuum["current_zone"] is not None
+        if vacuum["progress"] != self.shown_progress[row]:
+            self.vacuum_progress[row] = self.shown_progress[row] = vacuum["progress"]
+        if vacuum["battery"] != self.shown_battery[row]:
+            self.vacuum_battery[row] = self.shown_battery[row] = vacuum["battery"]
+
+    # === 틱 ===
+
+    def tick(self, dt: float) -> np.ndarray:
+        """dt초 진행. 표시 값이 바뀐 홈의 행 번호 반환 (반영은 publish)"""
+        n = self.size
+        steps = max(1, math.ceil(dt / MAX_STEP))
+        step = dt / steps
+        for _ in range(steps):
+            self.clock += step
+            self._advance_temperature(n, step)
+        self._advance_curtain(n, dt)
+        self._advance_vacuum(n, dt)
+        self.ticks += 1
+        return np.flatnonzero(self._changed(n))
+
+    def _advance_temperature(self, n: int, dt: float):
+        indoor = self.indoor[:n]
+        outdoor = self.outdoor_base[:n] + outdoor_offset(self.clock)
+        mode = self.ac_mode[:n]
+        rate = np.clip(AC_GAIN * self.ac_fan[:n] * (self.ac_target[:n] - indoor), -AC_MAX_RATE, AC_MAX_RATE)
+        rate = np.where(mode == COOLING, np.minimum(rate, 0), rate)
+        rate = np.where(mode == HEATING, np.maximum(rate, 0), rate)
+        rate = np.where(mode == VENTILATION, VENTILATION_GAIN * self.ac_fan[:n] * (outdoor - indoor), rate)
+        rate *= self.ac_power[:n]
+        indoor += dt * (LEAK_RATE * (outdoor - indoor) + rate)
+
+    def _advance_curtain(self, n: int, dt: float):
+        position = self.curtain_position[:n]
+        position += np.clip(self.curtain_target[:n] - position, -CURTAIN_SPEED * dt, CURTAIN_SPEED * dt)
+
+    def _advance_vacuum(self, n: int, dt: float):
+        status = self.vacuum_status[:n]
+        progress = self.vacuum_progress[:n]
+        battery = self.vacuum_battery[:n]
+        return_left = self.vacuum_return_left[:n]
+
+        cleaning = status == CLEANING
+        duration = np.where(self.vacuum_zone[:n], ZONE_CLEAN_SECONDS, HOME_CLEAN_SECONDS)
+        progress += cleaning * (100 * dt / duration)
+        np.minimum(progress, 100, out=progress)
+        battery -= (cleaning | (status == RETURNING)) * (BATTERY_DRAIN * dt)
+
+        # 다 끝났거나 배터리가 부족하면 복귀
+        finished = cleaning & ((progress >= 100) | (battery <= LOW_BATTERY))
+        status[finished] = RETURNING
+        return_left[finished] = RETURN_SECONDS
+        self.vacuum_zone[:n][finished] = False
+
+        returning = status == RETURNING
+        return_left -= returning * dt
+        status[returning & (return_left <= 0)] = IDLE
+
+        battery += (status == IDLE) * (BATTERY_CHARGE * dt)
+        np.clip(battery, 0, 100, out=battery)
+
+    def _curtain_status(self, n: int) -> np.ndarray:
+        delta = self.curtain_target[:n] - self.curtain_position[:n]
+        return np.where(delta > 0.5, OPENING, np.where(delta < -0.5, CLOSING, STOPPED)).astype(np.int8)
+
+    def _changed(self, n: int) -> np.ndarray:
+        outdoor = self.outdoor_base[:n] + outdoor_offset(self.clock)
+        return (
+            (np.round(self.indoor[:n], 1) != self.shown_indoor[:n])
+            | (np.round(outdoor, 1) != self.shown_outdoor[:n])
+            | (np.rint(self.curtain_position[:n]) != self.shown_position[:n])
+            | (self._curtain_status(n) != self.shown_curtain_status[:n])
+            | (self.vacuum_status[:n] != self.shown_vacuum_status[:n])
+            | (np.floor(self.vacuum_progress[:n]) != self.shown_progress[:n])
+            | (np.floor(self.vacuum_battery[:n]) != self.shown_battery[:n])
+        )
+
+    # === 반영 ===
+
+    def publish(self, rows: np.ndarray) -> int:
+        """
+        바뀐 홈의 표시 값을 HomeController에 반영 (일반 명령과 같은 알림 경로)
+
+        값은 호출 시점의 배열에서 읽는다. 그 사이 명령으로 같은 값이 된 홈은 건너뛴다.
+        """
+        if not len(rows):
+            return 0
+        n = self.size
+        indoor = np.round(self.indoor[:n][rows], 1).tolist()
+        outdoor = np.round(self.outdoor_base[:n][rows] + outdoor_offset(self.clock), 1).tolist()
+        position = np.rint(self.curtain_position[:n][rows]).astype(int).tolist()
+        curtain_status = self._curtain_status(n)[rows].tolist()
+        vacuum_status = self.vacuum_status[:n][rows].tolist()
+        progress = np.floor(self.vacuum_progress[:n][rows]).astype(int).tolist()
+        battery = np.floor(self.vacuum_battery[:n][rows]).astype(int).tolist()
+
+        published = 0
+        for index, row in enumerate(rows.tolist()):
+            updates: dict[str, dict] = {}
+            # 저널에 남길 상태 전환 (연속 값만 바뀐 갱신은 저널 생략)
+            transition = (
+                curtain_status[index] != self.shown_curtain_status[row]
+                or vacuum_status[index] != self.shown_vacuum_status[row]
+            )
+            if indoor[index] != self.shown_indoor[row] or outdoor[index] != self.shown_outdoor[row]:
+                updates["ac"] = {"indoor_temperature": indoor[index], "outdoor_temperature": outdoor[index]}
+            if position[index] != self.shown_position[row] or curtain_status[index] != self.shown_curtain_status[row]:
+                updates["curtain"] = {
+                    "position": position[index],
+                    "status": CURTAIN_STATUSES[curtain_status[index]].value,
+                }
+            vacuum = {}
+            if vacuum_status[index] != self.shown_vacuum_status[row]:
+                vacuum["status"] = VACUUM_STATUSES[vacuum_status[index]].value
+                if vacuum_status[index] == RETURNING:
+                    vacuum["current_zone"] = None
+            if progress[index] != self.shown_progress[row]:
+                vacuum["progress"] = progress[index]
+            if battery[index] != self.shown_battery[row]:
+                vacuum["battery"] = battery[index]
+            if vacuum:
+                updates["vacuum"] = vacuum
+            if not updates:
+                continue
+
+            # 반영 값을 먼저 기록해 두어야 observe()가 자기 변경을 명령으로 오인하지 않음
+            self.shown_indoor[row], self.shown_outdoor[row] = indoor[index], outdoor[index]
+            self.shown_position[row] = position[index]
+            self.shown_curtain_status[row] = curtain_status[index]
+            self.shown_vacuum_status[row] = vacuum_status[index]
+            self.shown_progress[row], self.shown_battery[row] = progress[index], battery[index]
+            self.registry.apply(
+                self.home_ids[row], HomeController.apply_simulation, updates, journal=transition
+            )
+            published += 1
+        self.updates += published
+        return published
+
+    def step(self, dt: float) -> int:
+        """tick + publish, 반영한 홈 수 반환"""
+        return self.publish(self.tick(dt))
+
+    async def step_async(self, dt: float) -> int:
+        """tick + publish_slice개씩 나눠 publish (사이마다 이벤트 루프에 양보)"""
+        rows = self.tick(dt)
+        published = 0
+        for start in range(0, len(rows), self.publish_slice):
+            if start:
+                await asyncio.sleep(0)
+            published += self.publish(rows[start:start + self.publish_slice])
+        return published
+
+    async def run(self, interval: float = 1.0, speed: float = 1.0):
+        """interval초마다 틱 (speed: 실제 1초당 시뮬레이션 초)"""
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            await self.step_async((now - last) * speed)
+            last = now
+            self.last_step_seconds = time.perf_counter() - now
+
+    def stats(self) -> dict:
+        return {
+            "homes": self.size,
+            "ticks": self.ticks,
+            "updates": self.updates,
+            "clock": self.clock,
+            "last_step_seconds": round(self.last_step_seconds, 6),
+        }
@@ -0,0 +1,125 @@
+"""
+동시에 들어온 같은 명령 합치기 (single-flight)
+벽 패널과 휴대폰이 동시에 "거실등 꺼줘"를 보내거나, 타임아웃 후 클라이언트가 재시도하면
+같은 생성이 두 번 돈다. 같은 키의 요청이 처리 중이면 새 요청은 그 결과를 기다렸다가 공유한다.
+
+- 키: home_id + 어댑터 + 정규화한 텍스트 + 관련 기기 상태 지문
+  (라우터가 고른 기기의 프롬프트 상태 줄만 사용. 시뮬레이터가 바꾸는 실내 온도 등 프롬프트에 없는 값은 무시)
+- 함수 호출 실행도 첫 요청(leader)에서 한 번만 하고, 나머지는 같은 결과를 받는다 (coalesced)
+- 처리 중인 요청끼리만 합친다 (결과 캐시 아님). 프로세스 단위 (멀티 워커에서는 워커별)
+- 처리 기한(deadline, time.monotonic() 기준)이 leader와 같거나 늦은 요청만 합친다
+  (기한이 없는 leader에는 기한이 없는 요청만). 기한이 더 이른 요청은 따로 처리한다
+- share(result)가 False면(예: leader가 기한 때문에 낮춘 전략으로 처리) 결과를 받지 않고 따로 처리한다
+- leader가 취소되면 기다리던 요청 중 하나가 새 leader가 되어 다시 처리
+  (retry_on 예외도 같음: leader 클라이언트가 끊겨 생성이 멈춰도 남은 요청은 자기 기한으로 다시 처리)
+
+    key = command_key(home_id, adapter, text, state)
+    result, coalesced = await flights.run(key, coroutine_function, deadline=token.deadline, share=undegraded)
+"""
+import asyncio
+import hashlib
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from device_router import prune_context, route_devices
+from function_gemma import describe_devices
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s.!?~。！？]+$")
+
+
+def normalize_text(text: str) -> str:
+    """ "  거실등   꺼줘!! " -> "거실등 꺼줘" (NFKC, 소문자, 공백 정리, 끝 문장부호 제거)"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _TRAILING.sub("", _SPACES.sub(" ", text).strip())
+
+
+def state_fingerprint(text: str, state: dict) -> str:
+    """발화와 관련된 기기들의 프롬프트 상태 줄 해시"""
+    route = route_devices(text)
+    context = prune_context(state, route.groups) if route.pruned else state
+    lines = "\n".join(describe_devices(context or {}))
+    return hashlib.blake2b(lines.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def command_key(home_id: str, adapter: str, text: str, state: dict) -> tuple[str, str, str, str]:
+    return home_id, adapter, normalize_text(text), state_fingerprint(text, state)
+
+
+class SingleFlight:
+    """키별 진행 중인 작업 하나에 같은 키의 동시 요청을 합침 (이벤트 루프 전용)"""
+
+    def __init__(self, enabled: bool = True, retry_on: tuple[type[BaseException], ...] = ()):
+        self.enabled = enabled
+        self.retry_on = retry_on
+        self.leaders = 0
+        self.coalesced = 0
+        self.declined = 0  # 같은 키가 진행 중이었지만 기한/share 조건으로 따로 처리한 요청
+        self._inflight: dict[Hashable, tuple[asyncio.Future, Optional[float]]] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        deadline: Optional[float] = None,
+        share: Optional[Callable[[Any], bool]] = None
+    ) -> tuple[Any, bool]:
+        """fn() 결과와 합쳐졌는지 여부 반환 (같은 키가 진행 중이고 합칠 수 있으면 그 결과를 기다림)"""
+        if not self.enabled:
+            return await fn(), False
+        while True:
+            entry = self._inflight.get(key)
+            if entry is None:
+                break
+            future, leader_deadline = entry
+            if not _can_join(leader_deadline, deadline):
+                self.declined += 1
+                return await fn(), False
+            try:
+                # 기다리던 요청이 취소되어도 공유 결과는 취소하지 않음
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue  # leader가 취소됨: 다시 확인해 새 leader가 됨
+                raise
+            except self.retry_on:
+                continue
+            if share is not None and not share(result):
+                self.declined += 1
+                return await fn(), False
+            self.coalesced += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future, deadline
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # 기다리는 요청이 없어도 "never retrieved" 경고가 나지 않도록
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "declined": self.declined,
+        }
+
+
+def _can_join(leader_deadline: Optional[float], deadline: Optional[float]) -> bool:
+    """leader가 끝나기를 기다려도 자기 기한을 넘기지 않는지 (None은 기한 없음 = 가장 늦음)"""
+    if leader_deadline is None:
+        return deadline is None
+    return deadline is None or deadline >= leader_deadline
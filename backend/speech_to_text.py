@@ -2,7 +2,6 @@
 Whisper 음성 인식 모듈
 음성을 텍스트로 변환
 """
-import whisper
 import tempfile
 import os
 from typing import Optional
@@ -29,6 +28,8 @@ class SpeechToText:
             return
 
         print(f"Loading Whisper model: {self.model_size}")
+        import whisper  # 첫 음성 명령 때 임포트 (API 기동 시간 단축)
+
         self.model = whisper.load_model(self.model_size)
         self.loaded = True
         print("Whisper model loaded successfully!")
@@ -105,13 +106,13 @@ class SpeechToText:
                 os.remove(tmp_path)
 
 
-# 전역 인스턴스
-_stt_instance: Optional[SpeechToText] = None
+# 전역 인스턴스 (모델 크기별)
+_stt_instances: dict[str, SpeechToText] = {}
 
 
 def get_stt(model_size: str = "base") -> SpeechToText:
-    """STT 인스턴스 가져오기 (싱글톤)"""
-    global _stt_instance
-    if _stt_instance is None:
-        _stt_instance = SpeechToText(model_size)
-    return _stt_instance
+    """STT 인스턴스 가져오기 (모델 크기별 싱글톤, 기한이 급할 때 작은 모델을 함께 씀)"""
+    stt = _stt_instances.get(model_size)
+    if stt is None:
+        stt = _stt_instances[model_size] = SpeechToText(model_size)
+    return stt
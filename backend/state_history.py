@@ -0,0 +1,283 @@
+"""
+기기 상태 변경 이력 (필드별 시간 버킷 링 버퍼)
+홈 상태가 바뀔 때마다 숫자/불리언 필드("ac.temperature", "light.brightness" ...)의 새 값을 기록한다.
+
+- resolution초(기본 60) 버킷마다 마지막 값/최소/최대/시간 적분(평균용)과 마지막 변경 시각만 남긴다.
+  한 버킷 안에서 값이 여러 번 바뀌어도 슬롯은 하나이므로 변경 빈도와 상관없이
+  retention초(기본 24시간)를 retention / resolution개(기본 1440) 슬롯으로 덮는다 (가장 오래된 버킷부터 덮어씀)
+- 값이 바뀐 필드만 기록 (상태는 계단 함수: 시각 t의 값 = t 이전 마지막 기록)
+- 홈 수는 max_homes(기본 1024, 0이면 제한 없음)로 제한 (가장 오래 갱신되지 않은 홈부터 제거)
+  메모리 상한 = max_homes x 필드 수(18) x 슬롯 수(1440) x 40바이트 (홈당 약 1MB,
+  링 버퍼는 값이 바뀐 버킷만큼만 늘어나므로 실제로는 바뀐 필드와 시간 범위에 비례)
+- 이벤트 루프 스레드에서만 기록/조회 (잠금 없음)
+
+    GET /history?fields=ac.temperature,light.brightness&start=...&end=...&step=60
+"""
+import math
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+DEFAULT_RANGE_SECONDS = 24 * 3600
+MAX_BUCKETS = 10_000
+
+
+def flatten_state(state: dict) -> Iterator[tuple[str, float]]:
+    """{"ac": {"temperature": 24, ...}} -> ("ac.temperature", 24.0) ... (숫자/불리언 필드만)"""
+    for device, fields in state.items():
+        if not isinstance(fields, dict):
+            continue
+        for name, value in fields.items():
+            if isinstance(value, (bool, int, float)):
+                yield f"{device}.{name}", float(value)
+
+
+class FieldRing:
+    """
+    필드 하나의 시간 버킷 링 버퍼 (값이 바뀐 버킷만, 시각 순)
+
+    슬롯마다 버킷 안 마지막 변경 시각(times), 마지막 값(last), 최소/최대(버킷 시작 시점 값 포함),
+    버킷 시작(첫 기록이면 그 시각)부터 마지막 변경까지의 값 x 시간 적분(area)을 둔다.
+    """
+
+    __slots__ = ("resolution", "capacity", "times", "last", "low", "high", "area", "start", "size",
+                 "before", "since")
+
+    def __init__(self, resolution: float, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        # 처음에는 빈 배열로 시작해 capacity까지만 늘어남
+        self.times = array("d")
+        self.last = array("d")
+        self.low = array("d")
+        self.high = array("d")
+        self.area = array("d")
+        self.start = 0
+        self.size = 0
+        self.before: Optional[float] = None  # 가장 오래된 슬롯 직전 값 (덮어쓴 슬롯의 마지막 값)
+        self.since: Optional[float] = None  # 첫 기록 시각 (그 전 값은 모름)
+
+    def _slot(self, index: int) -> int:
+        return (self.start + index) % self.capacity
+
+    def _bucket(self, timestamp: float) -> int:
+        return math.floor(timestamp / self.resolution)
+
+    def record(self, timestamp: float, value: float):
+        """값 변경 기록 (timestamp는 마지막 기록 이후여야 함)"""
+        if self.size:
+            newest = self._slot(self.size - 1)
+            if self._bucket(self.times[newest]) == self._bucket(timestamp):
+                self.area[newest] += self.last[newest] * (timestamp - self.times[newest])
+                self.times[newest] = timestamp
+                self.last[newest] = value
+                self.low[newest] = min(self.low[newest], value)
+                self.high[newest] = max(self.high[newest], value)
+                return
+
+        previous = self.value_before(self.size)
+        if previous is None:
+            self.since = timestamp
+            low = high = value
+            area = 0.0
+        else:
+            low, high = min(previous, value), max(previous, value)
+            area = previous * (timestamp - self._bucket(timestamp) * self.resolution)
+        if self.size < self.capacity:
+            for column, item in ((self.times, timestamp), (self.last, value), (self.low, low),
+                                 (self.high, high), (self.area, area)):
+                column.append(item)
+            self.size += 1
+            return
+        slot = self.start
+        self.before = self.last[slot]
+        self.times[slot], self.last[slot], self.low[slot], self.high[slot], self.area[slot] = (
+            timestamp, value, low, high, area
+        )
+        self.start = (self.start + 1) % self.capacity
+
+    def value_before(self, index: int) -> Optional[float]:
+        """index번째 슬롯 직전 값"""
+        return self.last[self._slot(index - 1)] if index > 0 else self.before
+
+    def time_at(self, index: int) -> float:
+        return self.times[self._slot(index)]
+
+    def latest(self) -> Optional[tuple[float, float]]:
+        if not self.size:
+            return None
+        slot = self._slot(self.size - 1)
+        return self.times[slot], self.last[slot]
+
+    def index_after(self, timestamp: float) -> int:
+        """timestamp보다 뒤에 변경된 첫 슬롯 위치"""
+        return bisect_right(range(self.size), timestamp, key=self.time_at)
+
+    def nbytes(self) -> int:
+        return sum(len(column) for column in (self.times, self.last, self.low, self.high, self.area)) * 8
+
+    def points(self, start: float, end: float) -> dict:
+        """[start, end] 구간 버킷별 마지막 변경 (start 시점 값이 있으면 첫 점으로 포함)"""
+        index = self.index_after(start)
+        times, values = [], []
+        current = self.value_before(index)
+        if current is not None:
+            times.append(start)
+            values.append(current)
+        while index < self.size and self.time_at(index) <= end:
+            slot = self._slot(index)
+            times.append(self.times[slot])
+            values.append(self.last[slot])
+            index += 1
+        return {"t": times, "v": values}
+
+    def downsample(self, start: float, end: float, step: float) -> dict:
+        """
+        step초 구간별 마지막/최소/최대/시간 가중 평균 (기록 이전 구간은 None)
+
+        start와 step은 resolution의 배수여야 한다 (구간이 버킷 경계에 맞음).
+        """
+        buckets = math.ceil((end - start) / step)
+        index = bisect_left(range(self.size), start, key=self.time_at)
+        current = self.value_before(index)
+        result = {"t": [], "last": [], "min": [], "max": [], "mean": []}
+        for bucket in range(buckets):
+            bucket_start = start + bucket * step
+            bucket_end = min(end, bucket_start + step)
+            low = high = current
+            area = covered = 0.0
+            cursor = bucket_start
+            while index < self.size and self.time_at(index) < bucket_end:
+                slot = self._slot(index)
+                slot_start = self._bucket(self.times[slot]) * self.resolution
+                # 슬롯 버킷 전까지는 직전 값 유지
+                if current is not None:
+                    area += current * (slot_start - cursor)
+                    covered += slot_start - cursor
+                    slot_covered = self.times[slot] - slot_start
+                else:
+                    slot_covered = self.times[slot] - self.since
+                area += self.area[slot]
+                covered += slot_covered
+                current = self.last[slot]
+                low = self.low[slot] if low is None else min(low, self.low[slot])
+                high = self.high[slot] if high is None else max(high, self.high[slot])
+                cursor = self.times[slot]
+                index += 1
+            if current is not None:
+                area += current * (bucket_end - cursor)
+                covered += bucket_end - cursor
+            result["t"].append(bucket_start)
+            result["last"].append(current)
+            result["min"].append(low)
+            result["max"].append(high)
+            result["mean"].append(area / covered if covered > 0 else current)
+        return result
+
+
+class StateHistory:
+    """home_id -> 필드 -> FieldRing"""
+
+    def __init__(self, resolution: float = 60.0, retention: float = 24 * 3600, max_homes: int = 1024):
+        if resolution <= 0 or retention < resolution:
+            raise ValueError("resolution은 0보다 크고 retention 이하여야 합니다.")
+        self.resolution = resolution
+        self.retention = retention
+        self.capacity = math.ceil(retention / resolution)  # 필드당 슬롯 수
+        self.max_homes = max_homes
+        self._homes: "OrderedDict[str, dict[str, FieldRing]]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "StateHistory":
+        return cls(
+            resolution=float(os.getenv("FG_HISTORY_RESOLUTION", "60")),
+            retention=float(os.getenv("FG_HISTORY_RETENTION", str(24 * 3600))),
+            max_homes=int(os.getenv("FG_HISTORY_MAX_HOMES", "1024"))
+        )
+
+    def record(self, home_id: str, state: dict, timestamp: Optional[float] = None):
+        """상태 변경 기록 (값이 바뀐 필드만)"""
+        fields = self._homes.get(home_id)
+        if fields is None:
+            fields = self._homes[home_id] = {}
+            if self.max_homes and len(self._homes) > self.max_homes:
+                self._homes.popitem(last=False)
+        else:
+            self._homes.move_to_end(home_id)
+
+        now = time.time() if timestamp is None else timestamp
+        for name, value in flatten_state(state):
+            ring = fields.get(name)
+            if ring is None:
+                ring = fields[name] = FieldRing(self.resolution, self.capacity)
+            latest = ring.latest()
+            if latest is not None:
+                if latest[1] == value:
+                    continue
+                now = max(now, latest[0])  # 시계가 뒤로 가도 시각 순서 유지
+            ring.record(now, value)
+
+    def fields(self, home_id: str) -> list[str]:
+        return sorted(self._homes.get(home_id, {}))
+
+    def query(
+        self,
+        home_id: str,
+        fields: Optional[list[str]] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        step: Optional[float] = None,
+        current: Optional[dict] = None
+    ) -> dict:
+        """
+        구간 조회 (step이 있으면 step초 단위로 다운샘플, 없으면 버킷별 마지막 변경)
+
+        step은 resolution의 배수로 올리고 start는 버킷 경계로 내린다 (버킷 안의 변경 순서는 남아 있지 않음).
+        current: 현재 홈 상태. 한 번도 바뀌지 않은 필드는 이 값을 구간 전체 값으로 사용한다.
+        """
+        end = time.time() if end is None else end
+        start = end - DEFAULT_RANGE_SECONDS if start is None else start
+        if start >= end:
+            raise ValueError("start는 end보다 앞이어야 합니다.")
+        if step is not None:
+            if step <= 0:
+                raise ValueError(f"step은 0보다 크고 구간당 {MAX_BUCKETS}개 이하가 되어야 합니다.")
+            step = math.ceil(step / self.resolution - 1e-9) * self.resolution
+            start = math.floor(start / self.resolution) * self.resolution
+            if (end - start) / step > MAX_BUCKETS:
+                raise ValueError(f"step은 0보다 크고 구간당 {MAX_BUCKETS}개 이하가 되어야 합니다.")
+
+        rings = self._homes.get(home_id, {})
+        fallback = dict(flatten_state(current)) if current else {}
+        names = fields or sorted(set(rings) | set(fallback))
+        unknown = [name for name in names if name not in rings and name not in fallback]
+        if unknown:
+            raise KeyError(f"기록할 수 없는 필드입니다: {', '.join(unknown)}")
+
+        series = {}
+        for name in names:
+            ring = rings.get(name)
+            if ring is None or not ring.size:
+                # 변경 이력이 없으면 현재 값이 구간 내내 유지된 것으로 본다
+                ring = FieldRing(self.resolution, 1)
+                ring.record(start, fallback[name])
+            series[name] = ring.downsample(start, end, step) if step else ring.points(start, end)
+
+        return {"home_id": home_id, "start": start, "end": end, "step": step, "fields": series}
+
+    def nbytes(self) -> int:
+        return sum(ring.nbytes() for fields in self._homes.values() for ring in fields.values())
+
+    def stats(self) -> dict:
+        return {
+            "homes": len(self._homes),
+            "fields": sum(len(fields) for fields in self._homes.values()),
+            "resolution": self.resolution,
+            "retention": self.retention,
+            "slots": self.capacity,
+            "max_homes": self.max_homes,
+            "bytes": self.nbytes(),
+        }
@@ -0,0 +1,211 @@
+"""
+HomeState 영속화: write-behind 저널 + 주기적 스냅샷
+
+- 명령 경로에서는 적용된 연산을 큐에 넣기만 한다 (디스크 I/O 없음)
+- 백그라운드 writer가 큐를 모아 한 번에 쓰고 fsync (group commit)
+- writer는 섀도 상태에 같은 연산을 적용해 두었다가 N건마다 압축 스냅샷을 남기고 이전 세그먼트를 지운다
+- 복구: 최신 스냅샷 로드 후 그 이후 저널만 재생
+
+디렉터리 구성:
+    snapshot-<seq>.json   {"seq": N, "homes": {home_id: state_dict}}
+    journal-<seq>.log     한 줄에 하나: {"s": seq, "h": home_id, "op": 메서드 이름, "a": [인자...], "m": 1}
+                          ("m": 시뮬레이터가 커튼을 움직이는 홈의 연산. 재생도 simulated_motion으로 해서 같은 상태가 됨)
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from home_controller import HomeController, HomeState
+
+_STOP = object()
+
+
+def _segment_name(seq: int) -> str:
+    return f"journal-{seq:016d}.log"
+
+
+def _snapshot_name(seq: int) -> str:
+    return f"snapshot-{seq:016d}.json"
+
+
+def _seq_of(path: Path) -> int:
+    return int(path.stem.split("-", 1)[1])
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replay(controllers: dict[str, HomeController], home_id: str, op: str, args: list, simulated: bool = False):
+    controller = controllers.get(home_id)
+    if controller is None:
+        controller = controllers[home_id] = HomeController()
+    controller.simulated_motion = simulated
+    getattr(HomeController, op)(controller, *args)
+
+
+class StateJournal:
+    """HomeController 연산 저널"""
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_every: int = 100_000,
+        commit_interval: float = 0.005,
+        fsync: bool = True,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._shadow: dict[str, HomeController] = {}
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._segment = None
+        self._thread: Optional[threading.Thread] = None
+        self._final_snapshot = True
+        self.committed_seq = 0
+
+    # === 복구 ===
+
+    def recover(self) -> dict[str, dict]:
+        """최신 스냅샷 + 저널 꼬리 재생으로 홈 상태 복구 ({home_id: state_dict})"""
+        controllers: dict[str, HomeController] = {}
+        snapshot_seq = 0
+
+        snapshots = sorted(self.directory.glob("snapshot-*.json"), key=_seq_of)
+        if snapshots:
+            payload = json.loads(snapshots[-1].read_text(encoding="utf-8"))
+            snapshot_seq = payload["seq"]
+            for home_id, state in payload["homes"].items():
+                controller = HomeController()
+                controller.state = HomeState.from_dict(state)
+                controllers[home_id] = controller
+
+        last_seq = snapshot_seq
+        for segment in sorted(self.directory.glob("journal-*.log"), key=_seq_of):
+            with segment.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # 마지막 쓰기 도중 중단된 줄
+                    if record["s"] <= last_seq:
+                        continue
+                    _replay(controllers, record["h"], record["op"], record["a"], bool(record.get("m")))
+                    last_seq = record["s"]
+
+        self._shadow = controllers
+        self._seq = last_seq
+        self._snapshot_seq = snapshot_seq
+        self.committed_seq = last_seq
+        return {home_id: controller.state.to_dict() for home_id, controller in controllers.items()}
+
+    # === 기록 ===
+
+    def start(self):
+        """writer 스레드 시작 (recover() 이후 호출)"""
+        if self._thread is not None:
+            return
+        self._open_segment(self._seq + 1)
+        self._thread = threading.Thread(target=self._run, name="state-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, home_id: str, op: str, args: tuple, simulated: bool = False):
+        """적용된 연산 기록 (큐에 넣기만 함, simulated: 연산한 컨트롤러의 simulated_motion)"""
+        self._queue.put((home_id, op, args, simulated))
+
+    def close(self, snapshot: bool = True):
+        """남은 기록을 모두 쓰고 (snapshot=True면 스냅샷 후) 종료"""
+        if self._thread is None:
+            return
+        self._final_snapshot = snapshot
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _open_segment(self, first_seq: int):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = (self.directory / _segment_name(first_seq)).open("w", encoding="utf-8")
+        _fsync_dir(self.directory)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            if self.commit_interval > 0 and batch[0] is not _STOP:
+                time.sleep(self.commit_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                    continue
+                home_id, op, args, simulated = item
+                self._seq += 1
+                record = {"s": self._seq, "h": home_id, "op": op, "a": list(args)}
+                if simulated:
+                    record["m"] = 1
+                lines.append(json.dumps(record, ensure_ascii=False))
+                _replay(self._shadow, home_id, op, args, simulated)
+
+            if lines:
+                self._segment.write("\n".join(lines) + "\n")
+                self._segment.flush()
+                if self.fsync:
+                    os.fsync(self._segment.fileno())
+                self.committed_seq = self._seq
+
+            if (stopping and self._final_snapshot) or self._seq - self._snapshot_seq >= self.snapshot_every:
+                self._write_snapshot()
+
+        self._segment.close()
+        self._segment = None
+
+    def _write_snapshot(self):
+        if self._seq == self._snapshot_seq:
+            return
+        seq = self._seq
+        payload = {
+            "seq": seq,
+            "homes": {home_id: c.state.to_dict() for home_id, c in self._shadow.items()},
+        }
+        path = self.directory / _snapshot_name(seq)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+        self._snapshot_seq = seq
+
+        # 스냅샷에 포함된 세그먼트/이전 스냅샷 정리 후 새 세그먼트 시작
+        self._open_segment(seq + 1)
+        for old in self.directory.glob("journal-*.log"):
+            if _seq_of(old) <= seq:
+                old.unlink()
+        for old in self.directory.glob("snapshot-*.json"):
+            if _seq_of(old) < seq:
+                old.unlink()
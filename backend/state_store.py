@@ -0,0 +1,241 @@
+"""
+공유 홈 상태 저장소 (멀티 워커용)
+Unix 소켓 상태 서버와 클라이언트. 줄 단위 JSON 프로토콜을 사용한다.
+
+    {"op": "load", "home_id": ...}                           -> {"state": {...} | null, "version": n}
+    {"op": "cas", "home_id": ..., "version": n, "state": {...}} -> {"ok": bool, "version": n}
+    {"op": "watch_all"}                                       (응답 없음, 변경 시 {"home_id", "state", "version"} 푸시)
+
+구독자가 푸시를 읽지 못해 서버 쪽 출력 버퍼가 max_buffer를 넘으면 서버가 그 연결을 끊는다
+(느린 구독자 때문에 서버 메모리가 늘지 않도록). 클라이언트 listen()은 재연결 후 다시 구독한다.
+
+클라이언트의 load/compare_and_set은 블로킹 호출이다. 이벤트 루프에서는 store.executor 스레드에서 실행한다
+(스레드마다 연결이 따로 있어 느린 요청 하나가 다른 요청을 막지 않는다).
+
+서버 실행:
+    python state_store.py --socket /tmp/fg-state.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class StateStoreError(RuntimeError):
+    """상태 서버 통신 실패"""
+
+
+class SocketStateStore:
+    """Unix 소켓 상태 서버 클라이언트"""
+
+    def __init__(self, path: str, timeout: float = 5.0, connections: int = 8):
+        self.path = path
+        self.timeout = timeout
+        # 이벤트 루프에서 요청을 보낼 스레드 (스레드당 연결 1개)
+        self.executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix="fg-state-store")
+        self._local = threading.local()
+        self._connections: set[socket.socket] = set()  # close()에서 정리
+        self._lock = threading.Lock()
+        self._watch_all = False
+        self._watch_writer: Optional[asyncio.StreamWriter] = None
+
+    # === 요청/응답 (동기, 스레드별 연결) ===
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        with self._lock:
+            self._connections.add(sock)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            with self._lock:
+                self._connections.discard(sock)
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+        self._local.reader = None
+
+    def _request(self, payload: dict) -> dict:
+        try:
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            self._local.sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            line = self._local.reader.readline()
+        except OSError as exc:
+            self._reset()
+            raise StateStoreError(f"상태 서버 요청 실패: {exc}") from exc
+        if not line:
+            self._reset()
+            raise StateStoreError("상태 서버 연결이 끊어졌습니다.")
+        return json.loads(line)
+
+    def load(self, home_id: str) -> tuple[Optional[dict], int]:
+        """홈 상태와 버전 조회 (없으면 (None, 0))"""
+        response = self._request({"op": "load", "home_id": home_id})
+        return response.get("state"), response.get("version", 0)
+
+    def compare_and_set(self, home_id: str, version: int, state: dict) -> Optional[int]:
+        """버전이 일치할 때만 저장. 성공 시 새 버전, 충돌 시 None"""
+        response = self._request({"op": "cas", "home_id": home_id, "version": version, "state": state})
+        return response["version"] if response.get("ok") else None
+
+    # === 변경 알림 (asyncio) ===
+
+    def watch_all(self):
+        """모든 홈의 변경 알림 구독"""
+        if not self._watch_all:
+            self._watch_all = True
+            self._send_watch("watch_all")
+
+    def _send_watch(self, op: str):
+        if self._watch_writer is not None and not self._watch_writer.is_closing():
+            self._watch_writer.write(json.dumps({"op": op}).encode("utf-8") + b"\n")
+
+    async def listen(self, callback: Callable[[str, dict], Any], retry_delay: float = 1.0):
+        """변경 알림 수신 루프 (연결이 끊기면 재연결 후 구독 복구)"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as exc:
+                print(f"State server unavailable ({exc}), retrying...")
+                await asyncio.sleep(retry_delay)
+                continue
+
+            self._watch_writer = writer
+            if self._watch_all:
+                self._send_watch("watch_all")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    message = json.loads(line)
+                    callback(message["home_id"], message["state"])
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                self._watch_writer = None
+                writer.close()
+            await asyncio.sleep(retry_delay)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for sock in connections:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        if self._watch_writer is not None:
+            self._watch_writer.close()
+            self._watch_writer = None
+
+
+def create_state_store(url: Optional[str]) -> Optional[SocketStateStore]:
+    """FG_STATE_STORE 값으로 저장소 생성 ("memory" 또는 미설정이면 None)"""
+    if not url or url == "memory":
+        return None
+    if url.startswith("unix:"):
+        return SocketStateStore(
+            url[len("unix:"):],
+            connections=int(os.getenv("FG_STATE_STORE_CONNECTIONS", "8"))
+        )
+    raise ValueError(f"지원하지 않는 상태 저장소: {url}")
+
+
+# === 상태 서버 ===
+
+class StateServer:
+    """홈 상태를 보관하고 변경을 구독자에게 푸시하는 서버"""
+
+    def __init__(self, max_buffer: int = 4 * 1024 * 1024):
+        self._states: dict[str, tuple[int, dict]] = {}
+        self._watchers: set[asyncio.StreamWriter] = set()
+        self.max_buffer = max_buffer  # 구독자별 미전송 출력 상한 (바이트)
+        self.dropped_watchers = 0
+
+    def _publish(self, home_id: str, version: int, state: dict):
+        if not self._watchers:
+            return
+        message = json.dumps(
+            {"home_id": home_id, "version": version, "state": state},
+            ensure_ascii=False
+        ).encode("utf-8") + b"\n"
+        for writer in list(self._watchers):
+            if writer.is_closing():
+                self._watchers.discard(writer)
+            elif writer.transport.get_write_buffer_size() + len(message) > self.max_buffer:
+                # 읽지 않는 구독자: 버퍼를 더 쌓지 않고 연결을 끊는다 (재연결 시 다시 구독)
+                self._watchers.discard(writer)
+                self.dropped_watchers += 1
+                writer.close()
+            else:
+                writer.write(message)
+
+    def _handle(self, request: dict, writer: asyncio.StreamWriter) -> Optional[dict]:
+        op = request.get("op")
+        home_id = request.get("home_id")
+        if op == "load":
+            version, state = self._states.get(home_id, (0, None))
+            return {"state": state, "version": version}
+        if op == "cas":
+            version, _ = self._states.get(home_id, (0, None))
+            if request.get("version") != version:
+                return {"ok": False, "version": version}
+            version += 1
+            self._states[home_id] = (version, request["state"])
+            self._publish(home_id, version, request["state"])
+            return {"ok": True, "version": version}
+        if op == "watch_all":
+            self._watchers.add(writer)
+            return None
+        return {"error": f"unknown op: {op}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = self._handle(json.loads(line), writer)
+                if response is not None:
+                    writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self._watchers.discard(writer)
+            writer.close()
+
+
+async def serve(path: str, max_buffer: int = 4 * 1024 * 1024):
+    """상태 서버 실행"""
+    if os.path.exists(path):
+        os.remove(path)
+    server = StateServer(max_buffer=max_buffer)
+    unix_server = await asyncio.start_unix_server(server.handle_connection, path=path)
+    print(f"State server listening on unix:{path}")
+    async with unix_server:
+        await unix_server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared home state server")
+    parser.add_argument("--socket", default="/tmp/fg-state.sock")
+    parser.add_argument("--max-buffer", type=int, default=4 * 1024 * 1024,
+                        help="구독자별 미전송 출력 상한 (바이트, 넘으면 연결을 끊음)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket, args.max_buffer))
@@ -0,0 +1,5 @@
+"""백엔드 모듈을 스크립트와 같은 방식(backend/ 기준 import)으로 불러오도록 경로 추가"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
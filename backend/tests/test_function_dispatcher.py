@@ -0,0 +1,88 @@
+"""FunctionDispatcher: 스키마-핸들러 매핑과 파라미터 변환/거부"""
+import pytest
+
+from function_dispatcher import HOME_PARAMETER_RANGES, FunctionDispatcher, InvalidArgument
+from home_controller import FUNCTION_DISPATCHER, HOME_FUNCTION_SCHEMAS, HomeController
+
+SCHEMA_NAMES = [schema["function"]["name"] for schema in HOME_FUNCTION_SCHEMAS]
+
+
+@pytest.mark.parametrize("name", SCHEMA_NAMES)
+def test_every_schema_maps_to_handler(name):
+    compiled = FUNCTION_DISPATCHER.get(name)
+    assert compiled is not None
+    assert compiled.handler is getattr(HomeController, name)
+
+
+def test_dispatcher_covers_exactly_the_schemas():
+    assert sorted(FUNCTION_DISPATCHER.function_names) == sorted(SCHEMA_NAMES)
+
+
+def test_schema_without_handler_fails_to_compile():
+    schema = {"type": "function", "function": {"name": "no_such_handler", "parameters": {"properties": {}}}}
+    with pytest.raises(ValueError):
+        FunctionDispatcher(HOME_FUNCTION_SCHEMAS + [schema], HomeController)
+
+
+def test_range_for_unknown_parameter_fails_to_compile():
+    ranges = {**HOME_PARAMETER_RANGES, ("ac_set_temperature", "celsius"): (16, 30)}
+    with pytest.raises(ValueError):
+        FunctionDispatcher(HOME_FUNCTION_SCHEMAS, HomeController, ranges)
+
+
+def test_ranges_stay_out_of_the_tool_prompt():
+    for schema in HOME_FUNCTION_SCHEMAS:
+        for spec in schema["function"]["parameters"].get("properties", {}).values():
+            assert "minimum" not in spec and "maximum" not in spec
+
+
+@pytest.mark.parametrize("name, parameters, expected", [
+    ("ac_set_temperature", {"temperature": 24}, {"temperature": 24}),
+    ("ac_set_temperature", {"temperature": "24"}, {"temperature": 24}),
+    ("ac_set_temperature", {"temperature": 24.0}, {"temperature": 24}),
+    ("ac_set_temperature", {"temperature": 16}, {"temperature": 16}),
+    ("ac_set_temperature", {"temperature": 30}, {"temperature": 30}),
+    ("tv_set_volume", {"volume": "15"}, {"volume": 15}),
+    ("light_set_color_temp", {"temp": 6500}, {"temp": 6500}),
+    ("curtain_set_position", {"position": "100"}, {"position": 100}),
+    ("light_adjust_brightness", {"delta": -10}, {"delta": -10}),
+    ("ac_set_mode", {"mode": "Cooling"}, {"mode": "cooling"}),
+    ("tv_launch_app", {"app_name": "YouTube", "unknown": 1}, {"app_name": "YouTube"}),
+])
+def test_bind_coerces(name, parameters, expected):
+    assert FUNCTION_DISPATCHER.get(name).bind(parameters) == expected
+
+
+@pytest.mark.parametrize("name, parameters, message", [
+    # 범위
+    ("ac_set_temperature", {"temperature": 35}, "16-30"),
+    ("ac_set_temperature", {"temperature": 15}, "16-30"),
+    ("tv_set_channel", {"channel": 0}, "1-100"),
+    ("tv_set_volume", {"volume": 101}, "0-100"),
+    ("light_set_color_temp", {"temp": 2000}, "2700-6500"),
+    ("curtain_set_position", {"position": -1}, "0-100"),
+    # 타입
+    ("ac_set_temperature", {"temperature": 24.5}, "temperature"),
+    ("ac_set_temperature", {"temperature": True}, "temperature"),
+    ("ac_set_temperature", {"temperature": "hot"}, "temperature"),
+    # enum
+    ("ac_set_mode", {"mode": "turbo"}, "mode"),
+    # 필수 파라미터
+    ("ac_set_temperature", {}, "필수 파라미터 temperature"),
+])
+def test_bind_rejects(name, parameters, message):
+    with pytest.raises(InvalidArgument, match=message):
+        FUNCTION_DISPATCHER.get(name).bind(parameters)
+
+
+def test_rejected_call_leaves_state_unchanged():
+    controller = HomeController()
+    before = controller.state.to_dict()
+    result = controller.execute_function("ac_set_temperature", {"temperature": 35})
+    assert result["success"] is False
+    assert controller.state.to_dict() == before
+
+
+def test_unknown_function_is_rejected():
+    result = HomeController().execute_function("ac_explode", {})
+    assert result["success"] is False
@@ -0,0 +1,70 @@
+"""SingleFlight 합치기 조건 테스트: 기한 비교, share로 결과 거절, leader 취소 후 재시도"""
+import asyncio
+
+import pytest
+
+from execution import JobCancelled
+from single_flight import SingleFlight
+
+
+def _burst(flights: SingleFlight, deadlines: list, results: list, share=None):
+    """같은 키로 요청을 순서대로 시작해 (결과, coalesced) 목록 반환 (n번째 요청의 fn은 results[n] 반환)"""
+    async def scenario():
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            result = results[calls]
+            calls += 1
+            await asyncio.sleep(0.05)
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        async def request(deadline):
+            return await flights.run("key", fn, deadline=deadline, share=share)
+
+        tasks = []
+        for deadline in deadlines:
+            tasks.append(asyncio.create_task(request(deadline)))
+            await asyncio.sleep(0)  # 앞 요청이 leader로 등록된 뒤 시작
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("leader, joiner, coalesced", [
+    (None, None, True),
+    (10.0, 10.0, True),
+    (10.0, 12.0, True),
+    (10.0, None, True),
+    (10.0, 8.0, False),   # 기한이 더 이르면 기다리지 않음
+    (None, 10.0, False),  # 기한 없는 leader는 언제 끝날지 모름
+])
+def test_join_by_deadline(leader, joiner, coalesced):
+    flights = SingleFlight()
+    outcomes = _burst(flights, [leader, joiner], ["leader", "own"])
+    assert outcomes[0] == ("leader", False)
+    assert outcomes[1] == (("leader", True) if coalesced else ("own", False))
+    assert flights.declined == (0 if coalesced else 1)
+
+
+def test_rejected_result_is_processed_again():
+    flights = SingleFlight()
+    outcomes = _burst(flights, [10.0, 12.0], [{"degraded": True}, {"degraded": False}],
+                      share=lambda result: not result["degraded"])
+    assert outcomes == [({"degraded": True}, False), ({"degraded": False}, False)]
+    assert (flights.coalesced, flights.declined) == (0, 1)
+
+
+def test_cancelled_leader_hands_over():
+    flights = SingleFlight(retry_on=(JobCancelled,))
+    outcomes = _burst(flights, [10.0, 12.0], [JobCancelled("deadline"), "retried"])
+    assert isinstance(outcomes[0], JobCancelled)
+    assert outcomes[1] == ("retried", False)
+    assert flights.leaders == 2
+
+
+def test_disabled_never_joins():
+    flights = SingleFlight(enabled=False)
+    assert _burst(flights, [None, None], ["a", "b"]) == [("a", False), ("b", False)]
@@ -0,0 +1,129 @@
+"""상태 이력 테스트: 버킷 집계를 원본 변경으로 계산한 값과 비교, 메모리 상한, 홈 수 제한"""
+import math
+import random
+
+import pytest
+
+from home_controller import HomeState
+from state_history import StateHistory
+
+DAY = 24 * 3600
+CLOCK = 1_700_000_040.0  # 1분 경계
+
+
+def _record_changes(history: StateHistory, changes: list[tuple[float, int]], home_id: str = "h"):
+    state = HomeState().to_dict()
+    for timestamp, volume in changes:
+        state["tv"]["volume"] = volume
+        history.record(home_id, state, timestamp=timestamp)
+
+
+def _random_changes(seed: int, seconds: float, rate: float) -> list[tuple[float, int]]:
+    rng = random.Random(seed)
+    changes, clock, volume = [], CLOCK, None
+    while clock < CLOCK + seconds:
+        clock += rng.expovariate(rate)
+        value = rng.randint(0, 30)
+        if value != volume:
+            changes.append((clock, value))
+            volume = value
+    return changes
+
+
+def _reference(changes: list[tuple[float, int]], start: float, end: float, step: float) -> dict:
+    """원본 변경(계단 함수)으로 구간별 last/min/max/mean 계산 (첫 기록 이전은 None)"""
+    result = {"last": [], "min": [], "max": [], "mean": []}
+    index, current = 0, None
+    while index < len(changes) and changes[index][0] <= start:
+        current = changes[index][1]
+        index += 1
+    for bucket in range(math.ceil((end - start) / step)):
+        bucket_start = start + bucket * step
+        bucket_end = min(end, bucket_start + step)
+        values = [current] if current is not None else []
+        area = covered = 0.0
+        cursor = bucket_start
+        while index < len(changes) and changes[index][0] < bucket_end:
+            timestamp, value = changes[index]
+            if current is not None:
+                area += current * (timestamp - cursor)
+                covered += timestamp - cursor
+            current, cursor = value, timestamp
+            values.append(value)
+            index += 1
+        if current is not None:
+            area += current * (bucket_end - cursor)
+            covered += bucket_end - cursor
+        result["last"].append(current)
+        result["min"].append(min(values) if values else None)
+        result["max"].append(max(values) if values else None)
+        result["mean"].append(area / covered if covered > 0 else current)
+    return result
+
+
+@pytest.mark.parametrize("step", [60, 300, 3600])
+def test_downsample_matches_raw_changes(step):
+    history = StateHistory()
+    changes = _random_changes(seed=step, seconds=6 * 3600, rate=0.2)
+    _record_changes(history, changes)
+    start, end = CLOCK, CLOCK + 6 * 3600 + 30
+    series = history.query("h", ["tv.volume"], start=start, end=end, step=step)["fields"]["tv.volume"]
+    expected = _reference(changes, start, end, step)
+    for name in ("last", "min", "max"):
+        assert series[name] == expected[name]
+    assert series["mean"] == pytest.approx(expected["mean"])
+
+
+def test_day_is_covered_whatever_the_change_rate():
+    history = StateHistory()
+    # 이틀 동안 분당 수십 번 바뀌어도 슬롯은 분당 하나
+    changes = _random_changes(seed=1, seconds=2 * DAY, rate=0.3)
+    _record_changes(history, changes)
+    ring = history._homes["h"]["tv.volume"]
+    assert ring.size == history.capacity == 1440
+    assert ring.nbytes() == 1440 * 40
+
+    end = changes[-1][0]
+    start = math.floor((end - DAY) / 60) * 60 + 60  # 보관 중인 가장 오래된 분부터
+    series = history.query("h", ["tv.volume"], start=start, end=end, step=60)["fields"]["tv.volume"]
+    expected = _reference(changes, start, end, 60)
+    assert series["max"] == expected["max"]
+    assert series["min"] == expected["min"]
+    assert series["last"] == expected["last"]
+
+
+def test_points_are_last_change_per_bucket():
+    history = StateHistory()
+    _record_changes(history, [(CLOCK + 1, 5), (CLOCK + 20, 7), (CLOCK + 70, 9)])
+    # 같은 분의 변경은 마지막 것만 남음
+    points = history.query("h", ["tv.volume"], start=CLOCK, end=CLOCK + 120)["fields"]["tv.volume"]
+    assert points == {"t": [CLOCK + 20, CLOCK + 70], "v": [7.0, 9.0]}
+    points = history.query("h", ["tv.volume"], start=CLOCK + 65, end=CLOCK + 120)["fields"]["tv.volume"]
+    assert points == {"t": [CLOCK + 65, CLOCK + 70], "v": [7.0, 9.0]}
+
+
+def test_unchanged_field_uses_current_value():
+    history = StateHistory()
+    current = HomeState().to_dict()
+    series = history.query("h", ["ac.temperature"], start=CLOCK, end=CLOCK + 120, step=60,
+                           current=current)["fields"]["ac.temperature"]
+    assert series["last"] == [24.0, 24.0]
+
+
+def test_homes_are_capped_least_recently_changed_first():
+    history = StateHistory(max_homes=2)
+    for index, home_id in enumerate(["a", "b", "a", "c"]):
+        _record_changes(history, [(CLOCK + index, index + 1)], home_id)
+    assert history.stats()["homes"] == 2
+    assert history.fields("b") == []
+    assert history.fields("a") and history.fields("c")
+
+
+def test_invalid_ranges():
+    history = StateHistory()
+    with pytest.raises(ValueError):
+        history.query("h", start=CLOCK, end=CLOCK)
+    with pytest.raises(ValueError):
+        history.query("h", start=CLOCK, end=CLOCK + DAY, step=-1)
+    with pytest.raises(ValueError):
+        StateHistory(resolution=60, retention=30)
@@ -0,0 +1,78 @@
+"""저널 복구 테스트: 명령 재생, 시뮬레이터가 움직이던 커튼/청소기"""
+from home_controller import HomeController
+from home_registry import HomeRegistry
+from simulator import DeviceSimulator
+from state_journal import StateJournal
+
+
+def _journal(directory) -> StateJournal:
+    return StateJournal(str(directory), commit_interval=0, fsync=False)
+
+
+def _simulated_registry(directory, home_id: str = "sim-1"):
+    registry = HomeRegistry(journal=_journal(directory))
+    simulator = DeviceSimulator(registry, clock=1_700_000_000.0)
+    registry.on_state_change = simulator.observe
+    simulator.add_home(home_id)
+    return registry, simulator
+
+
+def _recovered(directory) -> dict:
+    return _journal(directory).recover()
+
+
+def test_commands_replay(tmp_path):
+    registry = HomeRegistry(journal=_journal(tmp_path))
+    registry.apply("a", HomeController.ac_power_on)
+    registry.apply("a", HomeController.ac_set_temperature, 21)
+    registry.apply("b", HomeController.curtain_set_position, 40)
+    live = {home_id: registry.state(home_id) for home_id in ("a", "b")}
+    registry.journal.close(snapshot=False)
+    assert _recovered(tmp_path) == live
+
+
+def test_curtain_stopped_mid_travel(tmp_path):
+    registry, simulator = _simulated_registry(tmp_path)
+    registry.apply("sim-1", HomeController.curtain_close)
+    for _ in range(4):
+        simulator.step(1.0)
+    registry.apply("sim-1", HomeController.curtain_stop)
+    live = registry.state("sim-1")
+    assert live["curtain"]["status"] == "stopped"
+    assert 0 < live["curtain"]["position"] < 100
+    registry.journal.close(snapshot=False)
+
+    recovered = _recovered(tmp_path)["sim-1"]
+    assert recovered["curtain"] == live["curtain"]
+
+
+def test_command_during_travel_replays_from_travel_position(tmp_path):
+    registry, simulator = _simulated_registry(tmp_path)
+    registry.apply("sim-1", HomeController.curtain_close)
+    for _ in range(2):
+        simulator.step(1.0)
+    # 이동 중에 방향을 바꾸면 그 위치에서 다시 출발
+    registry.apply("sim-1", HomeController.curtain_open)
+    simulator.step(1.0)
+    registry.apply("sim-1", HomeController.curtain_stop)
+    registry.apply("sim-1", HomeController.vacuum_start)
+    simulator.step(1.0)
+    registry.apply("sim-1", HomeController.vacuum_pause)
+    live = registry.state("sim-1")
+    registry.journal.close(snapshot=False)
+
+    recovered = _recovered(tmp_path)["sim-1"]
+    assert recovered["curtain"] == live["curtain"]
+    assert recovered["vacuum"] == live["vacuum"]
+
+
+def test_snapshot_matches_journal_replay(tmp_path):
+    registry, simulator = _simulated_registry(tmp_path)
+    registry.apply("sim-1", HomeController.curtain_close)
+    for _ in range(3):
+        simulator.step(1.0)
+    registry.apply("sim-1", HomeController.curtain_stop)
+    live = registry.state("sim-1")
+    registry.journal.close(snapshot=True)  # 섀도 상태로 스냅샷
+
+    assert _recovered(tmp_path)["sim-1"] == live
@@ -0,0 +1,74 @@
+"""상태 서버 푸시 테스트: 구독자 전달, 느린 구독자 연결 끊기"""
+import asyncio
+import json
+
+from state_store import StateServer
+
+
+async def _serve(tmp_path, **kwargs):
+    server = StateServer(**kwargs)
+    path = str(tmp_path / "state.sock")
+    unix_server = await asyncio.start_unix_server(server.handle_connection, path=path)
+    return server, unix_server, path
+
+
+async def _request(path, payload):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    return response
+
+
+async def _watch_all(path):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(b'{"op": "watch_all"}\n')
+    await writer.drain()
+    await asyncio.sleep(0.05)
+    return reader, writer
+
+
+def test_watch_all_receives_every_home(tmp_path):
+    async def scenario():
+        server, unix_server, path = await _serve(tmp_path)
+        async with unix_server:
+            reader, writer = await _watch_all(path)
+            for home_id in ("a", "b"):
+                assert (await _request(path, {"op": "cas", "home_id": home_id, "version": 0,
+                                              "state": {"n": home_id}}))["ok"]
+            pushed = [json.loads(await reader.readline()) for _ in range(2)]
+            writer.close()
+        return pushed
+
+    pushed = asyncio.run(scenario())
+    assert [(m["home_id"], m["version"], m["state"]) for m in pushed] == [
+        ("a", 1, {"n": "a"}), ("b", 1, {"n": "b"})
+    ]
+
+
+def test_slow_watcher_is_disconnected(tmp_path):
+    async def scenario():
+        server, unix_server, path = await _serve(tmp_path, max_buffer=64 * 1024)
+        async with unix_server:
+            # 푸시를 읽지 않는 구독자
+            reader, writer = await _watch_all(path)
+            payload = {"blob": "x" * 4096}
+            version = 0
+            for _ in range(500):
+                response = await _request(path, {"op": "cas", "home_id": "h", "version": version,
+                                                 "state": payload})
+                version = response["version"]
+            dropped = server.dropped_watchers
+            remaining = len(server._watchers)
+            # 끊긴 뒤에는 읽다 보면 EOF가 온다
+            received = 0
+            while await reader.readline():
+                received += 1
+            writer.close()
+        return dropped, remaining, received, version
+
+    dropped, remaining, received, version = asyncio.run(scenario())
+    assert dropped == 1
+    assert remaining == 0
+    assert received < version
@@ -5,11 +5,12 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import langid
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-import torch
+if TYPE_CHECKING:
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+# langid / transformers / torch는 첫 번역 요청 때 임포트 (API 기동 시간 단축)
 
 
 class TranslationService:
@@ -75,6 +76,8 @@ class TranslationService:
         if cached:
             return cached
 
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
         tokenizer = AutoTokenizer.from_pretrained(model_name)
         model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
         model.to(self.device)
@@ -85,10 +88,14 @@ class TranslationService:
         if not text.strip():
             return "unknown"
 
+        import langid
+
         language, _score = langid.classify(text)
         return language or "unknown"
 
     def _translate_with_hf(self, text: str, language: str) -> Tuple[str, dict]:
+        import torch
+
         model_name = self._get_model_name(language)
         try:
             tokenizer, model = self._load_model(model_name)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Multiple LoRA adapters on one FunctionGemma base model.
+
+Reports:
+  - per-adapter memory: LoRA parameter bytes (and ratio to the base weights), RSS growth while loading
+  - adapter switch latency (alternating set_adapter between registered adapters)
+  - batch throughput for the same prompts with one adapter, with adapters mixed inside
+    every batch (peft adapter_names), and split into one batch run per adapter
+
+Adapters come from --adapters (same format as FG_LORA_ADAPTERS: name=path,name=path).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+GOLD_FILE = PROJECT_ROOT / "docs" / "expected_calls.jsonl"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Multi-adapter LoRA benchmark")
+    parser.add_argument("--model_id", default="google/functiongemma-270m-it")
+    parser.add_argument("--adapters", required=True, help="name=path,name=path (FG_LORA_ADAPTERS format)")
+    parser.add_argument("--prompts", type=int, default=32, help="Gold prompts per throughput run")
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--switches", type=int, default=200, help="set_adapter calls for the switch latency")
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def load_prompts(limit: int) -> list[str]:
+    lines = GOLD_FILE.read_text(encoding="utf-8").splitlines()
+    return [json.loads(line)["prompt"] for line in lines if line.strip()][:limit]
+
+
+def switch_latency(model, names: list[str], count: int) -> dict:
+    samples = []
+    for step in range(count):
+        # _activate only switches when the adapter changes, so alternate
+        samples.append(model._activate(names[step % len(names)]))
+    samples = sorted(sample for sample in samples if sample > 0)
+    if not samples:
+        return {"switches": 0}
+    return {
+        "switches": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+    }
+
+
+def timed_batch(model, requests: list[tuple[str, dict]], adapters: list[str], batch_size: int) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = model.generate_function_calls_batch(requests, batch_size=batch_size, prune=False, adapters=adapters)
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    args = parse_args()
+    os.environ["FG_LORA_ADAPTERS"] = args.adapters
+
+    from function_gemma import FunctionGemmaModel
+    from home_controller import HomeState
+
+    model = FunctionGemmaModel(model_name=args.model_id)
+    model.load()
+    names = list(model.adapter_paths)
+
+    context = HomeState().to_dict()
+    prompts = load_prompts(args.prompts)
+    requests = [(prompt, context) for prompt in prompts]
+    mixed = [names[i % len(names)] for i in range(len(prompts))]
+
+    # Warm-up (first generate call pays one-time allocation costs)
+    timed_batch(model, requests[:args.batch_size], mixed[:args.batch_size], args.batch_size)
+
+    throughput = {}
+    single_seconds, _ = timed_batch(model, requests, [names[0]] * len(requests), args.batch_size)
+    throughput["single_adapter"] = single_seconds
+    mixed_seconds, mixed_results = timed_batch(model, requests, mixed, args.batch_size)
+    throughput["mixed_batches"] = mixed_seconds
+
+    split_seconds = 0.0
+    split_results = [None] * len(requests)
+    for name in names:
+        members = [i for i, adapter in enumerate(mixed) if adapter == name]
+        seconds, results = timed_batch(model, [requests[i] for i in members], [name] * len(members), args.batch_size)
+        split_seconds += seconds
+        for index, result in zip(members, results):
+            split_results[index] = result
+    throughput["split_per_adapter"] = split_seconds
+
+    stats = model.adapter_stats()
+    report = {
+        "model_id": args.model_id,
+        "prompts": len(prompts),
+        "batch_size": args.batch_size,
+        "base_parameter_mb": round(stats["base_parameter_bytes"] / 1e6, 2),
+        "adapters": [
+            {
+                "name": adapter["name"],
+                "parameters": adapter["parameters"],
+                "parameter_mb": round(adapter["parameter_bytes"] / 1e6, 3),
+                "overhead_ratio": round(adapter["overhead_ratio"], 4) if adapter["overhead_ratio"] else None,
+                "rss_delta_mb": round(adapter["rss_delta_bytes"] / 1e6, 2) if adapter["rss_delta_bytes"] is not None else None,
+                "load_ms": round(adapter["load_seconds"] * 1000, 1),
+            }
+            for adapter in stats["adapters"]
+        ],
+        "switch": switch_latency(model, names, args.switches),
+        "throughput_prompts_per_s": {label: round(len(prompts) / seconds, 2) for label, seconds in throughput.items()},
+        "mixed_matches_split": sum(
+            mixed_result["raw_output"] == split_result["raw_output"]
+            for mixed_result, split_result in zip(mixed_results, split_results)
+        ),
+    }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
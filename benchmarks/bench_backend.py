@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""End-to-end backend latency benchmark with a deterministic stub model.
+
+Starts benchmarks/stub_server.py (or targets --url), drives /command/text,
+/command/voice, /device/* and N concurrent /ws clients, and reports
+p50/p95/p99 latency and throughput per endpoint as JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+TEXTS = [
+    "거실등 켜줘",
+    "에어컨 24도로 맞춰줘",
+    "TV 볼륨 15로",
+    "커튼 30퍼센트로",
+    "주방 청소해줘",
+    "환풍기 강으로",
+]
+
+DEVICE_PATHS = [
+    "/device/light/power/on",
+    "/device/light/brightness/40",
+    "/device/ac/temperature/23",
+    "/device/tv/volume/20",
+    "/device/curtain/position/50",
+    "/device/ventilation/speed/low",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backend latency benchmark (stub model)")
+    parser.add_argument("--url", default=None, help="Existing backend URL (default: start stub server)")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--model_latency_ms", type=float, default=0.0)
+    parser.add_argument("--stt_latency_ms", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per HTTP endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--ws_clients", type=int, default=100)
+    parser.add_argument("--ws_updates", type=int, default=200)
+    parser.add_argument("--home_id", default="bench")
+    parser.add_argument("--output_json", default=None)
+    parser.add_argument("--compare", default=None, help="Previous --output_json to diff against")
+    return parser.parse_args()
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    count = len(values) + errors
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round((values[-1] if values else 0.0) * 1000, 3),
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def drive_http(client: httpx.AsyncClient, make_request, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def drive_ws(base_url: str, client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    """Fan-out latency: device POST -> state_update received by every WS client."""
+    ws_url = base_url.replace("http://", "ws://") + f"/homes/{args.home_id}/ws"
+    sockets = [await websockets.connect(ws_url, max_queue=None) for _ in range(args.ws_clients)]
+    try:
+        initial = await asyncio.gather(*(ws.recv() for ws in sockets))
+        brightness = json.loads(initial[0])["state"]["light"]["brightness"]
+        latencies: list[float] = []
+        errors = 0
+        start_all = time.perf_counter()
+        for _ in range(args.ws_updates):
+            brightness = brightness % 100 + 1  # 항상 이전 값과 달라 브로드캐스트가 발생
+            start = time.perf_counter()
+            await client.post(f"/homes/{args.home_id}/device/light/brightness/{brightness}")
+
+            async def wait_update(ws, expected=brightness) -> None:
+                while True:
+                    message = json.loads(await ws.recv())
+                    if message.get("state", {}).get("light", {}).get("brightness") == expected:
+                        return
+
+            try:
+                await asyncio.wait_for(asyncio.gather(*(wait_update(ws) for ws in sockets)), timeout=10)
+                latencies.append(time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                errors += 1
+        result = summarize(latencies, errors, time.perf_counter() - start_all)
+        result["clients"] = args.ws_clients
+        result["messages_per_s"] = round(result["throughput_rps"] * args.ws_clients, 1)
+        return result
+    finally:
+        await asyncio.gather(*(ws.close() for ws in sockets))
+
+
+async def run(base_url: str, args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        prefix = f"/homes/{args.home_id}"
+        endpoints = {}
+        endpoints["state"] = await drive_http(
+            client, lambda c, i: c.get(f"{prefix}/state"), args.requests, args.concurrency
+        )
+        endpoints["device"] = await drive_http(
+            client,
+            lambda c, i: c.post(prefix + DEVICE_PATHS[i % len(DEVICE_PATHS)]),
+            args.requests,
+            args.concurrency,
+        )
+        endpoints["command_text"] = await drive_http(
+            client,
+            lambda c, i: c.post(f"{prefix}/command/text", json={"text": TEXTS[i % len(TEXTS)]}),
+            args.requests,
+            args.concurrency,
+        )
+        endpoints["command_voice"] = await drive_http(
+            client,
+            lambda c, i: c.post(
+                f"{prefix}/command/voice",
+                files={"audio": ("audio.webm", TEXTS[i % len(TEXTS)].encode("utf-8"), "audio/webm")},
+            ),
+            args.requests,
+            args.concurrency,
+        )
+        if args.ws_clients > 0:
+            endpoints["ws_fanout"] = await drive_ws(base_url, client, args)
+        return endpoints
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit(f"backend at {base_url} did not become ready")
+
+
+def print_comparison(current: dict, previous: dict) -> None:
+    for name, stats in current["endpoints"].items():
+        old = previous.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if old.get(key):
+                delta = (stats[key] - old[key]) / old[key] * 100
+                print(f"{name:<14} {key:<15} {old[key]:>10} -> {stats[key]:>10} ({delta:+.1f}%)")
+
+
+def main() -> None:
+    args = parse_args()
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = args.port or free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                str(BENCH_DIR / "stub_server.py"),
+                "--port", str(port),
+                "--model_latency_ms", str(args.model_latency_ms),
+                "--stt_latency_ms", str(args.stt_latency_ms),
+            ],
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+    try:
+        wait_ready(base_url)
+        endpoints = asyncio.run(run(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "config": {
+            "url": args.url or "stub",
+            "model_latency_ms": args.model_latency_ms,
+            "stt_latency_ms": args.stt_latency_ms,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws_clients,
+        },
+        "endpoints": endpoints,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Deadline-aware degradation: voice commands against a latency budget.
+
+Runs the backend app in-process with the stub model and STT. The stubs model the
+cheaper strategies: a pruned prompt costs less prefill, a smaller max_new_tokens
+truncates the output, and Whisper "tiny" is faster than "base" (benchmarks/stubs.py).
+After --warmup commands without a deadline (so the latency estimates exist), sends
+--requests voice commands one at a time for each X-Deadline-Ms in --deadlines, with
+degradation off (FG_DEGRADE=0: deadline cancellation only) and on. Reports per deadline:
+  - SLO hit rate: answered successfully within the deadline
+  - 504s (deadline cancellations), failed commands, latency percentiles
+  - how often each degradation was applied
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "backend"))
+sys.path.append(str(BENCH_DIR))
+
+UTTERANCES = ["거실등 꺼줘", "에어컨 24도로 맞춰줘", "TV 볼륨 15로", "커튼 30퍼센트로", "주방 청소해줘", "환풍기 강으로"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deadline-aware degradation benchmark")
+    parser.add_argument("--model_latency_ms", type=float, default=600.0)
+    parser.add_argument("--stt_latency_ms", type=float, default=400.0, help="Whisper base latency")
+    parser.add_argument("--deadlines", default="1500,1100,900,700", help="Comma-separated X-Deadline-Ms values")
+    parser.add_argument("--requests", type=int, default=20, help="Voice commands per deadline and mode")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def send(client, text: str, deadline_ms: float | None):
+    headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms is not None else None
+    started = time.perf_counter()
+    response = await client.post(
+        "/homes/degrade/command/voice",
+        files={"audio": ("audio.webm", text.encode("utf-8"), "audio/webm")},
+        headers=headers,
+    )
+    return response, time.perf_counter() - started
+
+
+async def run_deadline(client, deadline_ms: float, args: argparse.Namespace) -> dict:
+    latencies = []
+    hits = timed_out = failed = 0
+    applied: Counter = Counter()
+    for index in range(args.requests):
+        text = f"{UTTERANCES[index % len(UTTERANCES)]} {deadline_ms:g}-{index}"  # distinct, never coalesced
+        response, elapsed = await send(client, text, deadline_ms)
+        latencies.append(elapsed)
+        if response.status_code == 504:
+            timed_out += 1
+            continue
+        body = response.json()
+        applied.update(degradation.partition(":")[0] for degradation in body.get("degradations", []))
+        if not body.get("success"):
+            failed += 1
+        elif elapsed * 1000 <= deadline_ms:
+            hits += 1
+    return {
+        "deadline_ms": deadline_ms,
+        "slo_hit_rate": round(hits / args.requests, 3),
+        "deadline_504": timed_out,
+        "failed": failed,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "degradations": dict(applied),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    from stubs import install_stubs
+
+    install_stubs(args.model_latency_ms / 1000, args.stt_latency_ms / 1000)
+    import httpx
+
+    import main as backend_main
+
+    async def run_all() -> dict:
+        transport = httpx.ASGITransport(app=backend_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for index in range(args.warmup):
+                await send(client, f"warmup {index}", None)
+            report = {}
+            for enabled in (False, True):
+                backend_main.degradation.enabled = enabled
+                report["on" if enabled else "off"] = [
+                    await run_deadline(client, float(deadline), args) for deadline in args.deadlines.split(",")
+                ]
+            report["estimates"] = backend_main.degradation.stats()
+        return report
+
+    report = {"config": vars(args), **asyncio.run(run_all())}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
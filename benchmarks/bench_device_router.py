@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Keyword device router: recall, pruning ratio and (optionally) model impact.
+
+Router-only (default, no model needed):
+  - group recall against docs/expected_calls.jsonl (every gold call's device group must be routed)
+  - fallback rate (prompts that keep the full schema list)
+  - router latency
+  - schema count / serialized tools+state size, full vs pruned (a proxy for prompt tokens)
+
+--with_model: run FunctionGemma on every gold prompt with the full prompt and the
+pruned prompt, and compare prompt tokens, latency and call accuracy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from device_router import prune_context, route_devices, schema_group, schemas_for  # noqa: E402
+from home_controller import HOME_FUNCTION_SCHEMAS, HomeState  # noqa: E402
+
+GOLD_FILE = PROJECT_ROOT / "docs" / "expected_calls.jsonl"
+EXTRA_PROMPTS = PROJECT_ROOT / "docs" / "functiongemma-test-prompts.txt"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Keyword device router benchmark")
+    parser.add_argument("--gold", default=str(GOLD_FILE))
+    parser.add_argument("--repeat", type=int, default=200, help="Router latency passes over all prompts")
+    parser.add_argument("--with_model", action="store_true", help="Also compare full vs pruned generation")
+    parser.add_argument("--limit", type=int, default=None, help="Gold prompts to run with --with_model")
+    parser.add_argument("--show", type=int, default=10, help="Recall misses to print")
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def load_gold(path: str) -> list[dict]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def load_extra_prompts() -> list[str]:
+    if not EXTRA_PROMPTS.exists():
+        return []
+    return [line.strip() for line in EXTRA_PROMPTS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def gold_groups(record: dict) -> set[str]:
+    groups = set()
+    for call in record["expected_calls"]:
+        groups.add(call["function_name"].split("_", 1)[0])
+    return groups
+
+
+def prompt_size(groups: tuple[str, ...] | None, context: dict) -> int:
+    """Serialized tools + device state characters that go into the prompt."""
+    if groups is None:
+        tools, state = HOME_FUNCTION_SCHEMAS, context
+    else:
+        tools, state = schemas_for(groups), prune_context(context, groups)
+    return len(json.dumps(tools, ensure_ascii=False)) + len(json.dumps(state, ensure_ascii=False))
+
+
+def router_report(gold: list[dict], extra: list[str], repeat: int, show: int) -> dict:
+    context = HomeState().to_dict()
+    full_size = prompt_size(None, context)
+
+    misses = []
+    exact = 0
+    routed_groups = []
+    size_ratios = []
+    schema_counts = []
+    fallbacks = 0
+    for record in gold:
+        route = route_devices(record["prompt"])
+        expected = gold_groups(record)
+        selected = set(route.groups)
+        if not expected <= selected:
+            misses.append({"prompt": record["prompt"], "expected": sorted(expected), "routed": list(route.groups)})
+        exact += expected == selected
+        routed_groups.append(len(route.groups))
+        if not route.pruned:
+            fallbacks += 1
+            size_ratios.append(1.0)
+            schema_counts.append(len(HOME_FUNCTION_SCHEMAS))
+            continue
+        size_ratios.append(prompt_size(route.groups, context) / full_size)
+        schema_counts.append(len(schemas_for(route.groups)))
+
+    extra_fallbacks = sum(1 for prompt in extra if not route_devices(prompt).pruned)
+
+    prompts = [record["prompt"] for record in gold] + extra
+    elapsed = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for prompt in prompts:
+                route_devices(prompt)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    known = sum(1 for schema in HOME_FUNCTION_SCHEMAS if schema_group(schema) is not None)
+    return {
+        "gold_prompts": len(gold),
+        "group_recall": round(1 - len(misses) / len(gold), 4),
+        "group_exact": round(exact / len(gold), 4),
+        "mean_groups": round(statistics.mean(routed_groups), 2),
+        "fallback_rate": round(fallbacks / len(gold), 4),
+        "extra_prompts": len(extra),
+        "extra_fallback_rate": round(extra_fallbacks / len(extra), 4) if extra else None,
+        "router_us": round(elapsed / (repeat * len(prompts)) * 1e6, 2),
+        "schemas": {
+            "full": len(HOME_FUNCTION_SCHEMAS),
+            "grouped": known,
+            "mean_pruned": round(statistics.mean(schema_counts), 2),
+        },
+        "prompt_chars": {
+            "full": full_size,
+            "mean_ratio": round(statistics.mean(size_ratios), 3),
+        },
+        "misses": misses[:show],
+    }
+
+
+def call_matches(result: dict, record: dict) -> tuple[bool, bool]:
+    """(function names match, names and parameters match)"""
+    calls = result.get("function_calls") or []
+    names = [call["function_name"] for call in calls]
+    expected_names = [call["function_name"] for call in record["expected_calls"]]
+    return names == expected_names, calls == record["expected_calls"]
+
+
+def model_report(gold: list[dict]) -> dict:
+    from function_gemma import get_model
+
+    model = get_model()
+    model.load()
+    context = HomeState().to_dict()
+    report = {}
+    for label, prune in (("full", False), ("pruned", True)):
+        latencies, prompt_tokens = [], []
+        name_hits = exact_hits = retries = 0
+        for record in gold:
+            start = time.perf_counter()
+            result = model.generate_function_call(record["prompt"], context=context, prune=prune)
+            latencies.append(time.perf_counter() - start)
+            prompt_tokens.append(result.get("prompt_tokens", 0))
+            retries += result.get("route", {}).get("retried", False)
+            name_ok, exact_ok = call_matches(result, record)
+            name_hits += name_ok
+            exact_hits += exact_ok
+        latencies.sort()
+        report[label] = {
+            "mean_prompt_tokens": round(statistics.mean(prompt_tokens), 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "name_accuracy": round(name_hits / len(gold), 4),
+            "exact_accuracy": round(exact_hits / len(gold), 4),
+            "full_retries": retries,
+        }
+    report["prompt_token_ratio"] = round(
+        report["pruned"]["mean_prompt_tokens"] / max(report["full"]["mean_prompt_tokens"], 1), 3
+    )
+    report["latency_ratio"] = round(report["pruned"]["mean_ms"] / max(report["full"]["mean_ms"], 1e-9), 3)
+    return report
+
+
+def main() -> None:
+    args = parse_args()
+    gold = load_gold(args.gold)
+    results = {"router": router_report(gold, load_extra_prompts(), args.repeat, args.show)}
+    if args.with_model:
+        results["model"] = model_report(gold[:args.limit] if args.limit else gold)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
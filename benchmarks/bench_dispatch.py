@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""HomeController.execute_function dispatch overhead micro-benchmark."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from home_controller import FUNCTION_DISPATCHER, HOME_FUNCTION_SCHEMAS, HomeController  # noqa: E402
+
+# (function_name, parameters, direct call)
+CALLS = [
+    ("ac_power_on", {}, lambda c: c.ac_power_on()),
+    ("ac_set_temperature", {"temperature": 24}, lambda c: c.ac_set_temperature(24)),
+    ("ac_set_mode", {"mode": "cooling"}, lambda c: c.ac_set_mode("cooling")),
+    ("tv_set_volume", {"volume": "15"}, lambda c: c.tv_set_volume(15)),
+    ("tv_launch_app", {"app_name": "YouTube"}, lambda c: c.tv_launch_app("YouTube")),
+    ("light_adjust_brightness", {"delta": -10}, lambda c: c.light_adjust_brightness(-10)),
+    ("vacuum_clean_zone", {"zone": "kitchen"}, lambda c: c.vacuum_clean_zone("kitchen")),
+    ("curtain_set_position", {"position": 30}, lambda c: c.curtain_set_position(30)),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Dispatch overhead micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def check_coverage() -> None:
+    names = [schema["function"]["name"] for schema in HOME_FUNCTION_SCHEMAS]
+    missing = [name for name in names if FUNCTION_DISPATCHER.get(name) is None]
+    if missing:
+        raise SystemExit(f"schemas without handler: {missing}")
+
+
+def bench(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main() -> None:
+    args = parse_args()
+    check_coverage()
+
+    controller = HomeController()
+    results = []
+    for name, params, direct in CALLS:
+        direct_ns = bench(lambda: direct(controller), args.iterations)
+        dispatch_ns = bench(lambda: controller.execute_function(name, params), args.iterations)
+        results.append({
+            "function": name,
+            "direct_ns": round(direct_ns, 1),
+            "dispatch_ns": round(dispatch_ns, 1),
+            "overhead_ns": round(dispatch_ns - direct_ns, 1),
+        })
+
+    rejected_ns = bench(
+        lambda: controller.execute_function("ac_set_temperature", {"temperature": "hot"}),
+        args.iterations,
+    )
+
+    for row in results:
+        print(f"{row['function']:<26} direct={row['direct_ns']:>8.1f}ns "
+              f"dispatch={row['dispatch_ns']:>8.1f}ns overhead={row['overhead_ns']:>7.1f}ns")
+    print(f"{'rejected call':<26} {rejected_ns:.1f}ns")
+
+    if args.output_json:
+        Path(args.output_json).write_text(
+            json.dumps({"calls": results, "rejected_ns": round(rejected_ns, 1)}, indent=2),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
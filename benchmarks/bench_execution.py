@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Mixed voice + text load: per-family core partitioning vs shared torch thread pools.
+
+Voice requests run a Whisper-shaped encoder pass followed by a FunctionGemma-shaped
+prefill + decode; text requests run only the FunctionGemma-shaped part. Both are
+synthetic torch workloads (random weights), so no model downloads are needed.
+
+Modes (each in its own process so torch thread settings do not leak between them):
+  inline       every job runs on the event loop thread (backend before the execution manager)
+  shared       every job runs in its own thread with torch's default full-machine pool
+  partitioned  backend/execution.py: one worker thread per family with its own thread
+               count and (optionally) CPU affinity
+
+Reports completed requests/s and latency percentiles per request kind.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+MODES = ("inline", "shared", "partitioned")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Execution manager mixed-load benchmark")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--voice_clients", type=int, default=2, help="Closed-loop voice clients")
+    parser.add_argument("--text_clients", type=int, default=4, help="Closed-loop text clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per mode")
+    parser.add_argument("--audio_frames", type=int, default=750, help="Encoder frames per voice request")
+    parser.add_argument("--prompt_tokens", type=int, default=512)
+    parser.add_argument("--new_tokens", type=int, default=24)
+    parser.add_argument("--gemma_threads", type=int, default=None, help="partitioned: FunctionGemma threads")
+    parser.add_argument("--whisper_threads", type=int, default=None, help="partitioned: Whisper threads")
+    parser.add_argument("--gemma_cpus", default=None, help='partitioned: e.g. "0-5"')
+    parser.add_argument("--whisper_cpus", default=None, help='partitioned: e.g. "6-7"')
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+class Workloads:
+    """Random-weight stand-ins with the shapes of whisper-base's encoder and a 270M decoder."""
+
+    def __init__(self, args: argparse.Namespace):
+        import torch
+
+        torch.manual_seed(0)
+        self.torch = torch
+        layer = torch.nn.TransformerEncoderLayer(d_model=512, nhead=8, dim_feedforward=2048, batch_first=True)
+        self.encoder = torch.nn.TransformerEncoder(layer, num_layers=6, enable_nested_tensor=False).eval()
+        layer = torch.nn.TransformerEncoderLayer(d_model=640, nhead=4, dim_feedforward=2048, batch_first=True)
+        self.decoder = torch.nn.TransformerEncoder(layer, num_layers=6, enable_nested_tensor=False).eval()
+        self.head = torch.nn.Linear(640, 8192).eval()
+        self.audio = torch.randn(1, args.audio_frames, 512)
+        self.prompt = torch.randn(1, args.prompt_tokens, 640)
+        self.new_tokens = args.new_tokens
+
+    def transcribe(self) -> None:
+        with self.torch.inference_mode():
+            self.encoder(self.audio)
+
+    def generate(self) -> None:
+        with self.torch.inference_mode():
+            self.head(self.decoder(self.prompt)[:, -1])
+            step = self.prompt[:, -1:]
+            for _ in range(self.new_tokens):
+                self.head(self.decoder(step))
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    workloads = Workloads(args)
+    manager = None
+    if mode == "partitioned":
+        from execution import ModelExecutor, available_cpus, default_threads, parse_cpu_list
+
+        cpus = available_cpus()
+        gemma_cpus = parse_cpu_list(args.gemma_cpus) if args.gemma_cpus else None
+        whisper_cpus = parse_cpu_list(args.whisper_cpus) if args.whisper_cpus else None
+        manager = {
+            "gemma": ModelExecutor(
+                "gemma", args.gemma_threads or (len(gemma_cpus) if gemma_cpus else default_threads("gemma", cpus)),
+                gemma_cpus,
+            ),
+            "whisper": ModelExecutor(
+                "whisper",
+                args.whisper_threads or (len(whisper_cpus) if whisper_cpus else default_threads("whisper", cpus)),
+                whisper_cpus,
+            ),
+        }
+
+    async def execute(family: str, fn) -> None:
+        if mode == "inline":
+            fn()
+        elif mode == "shared":
+            await asyncio.to_thread(fn)
+        else:
+            await manager[family].run(fn)
+
+    # Warm-up (allocator, thread pools) outside the measured window
+    await execute("whisper", workloads.transcribe)
+    await execute("gemma", workloads.generate)
+
+    latencies: dict[str, list[float]] = {"voice": [], "text": []}
+    deadline = time.perf_counter() + args.duration
+
+    async def client(kind: str) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if kind == "voice":
+                await execute("whisper", workloads.transcribe)
+            await execute("gemma", workloads.generate)
+            finished = time.perf_counter()
+            if finished <= deadline:
+                latencies[kind].append(finished - started)
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client("voice") for _ in range(args.voice_clients)),
+        *(client("text") for _ in range(args.text_clients)),
+    )
+    elapsed = min(time.perf_counter(), deadline) - started
+
+    report = {"mode": mode}
+    if manager:
+        report["partition"] = {family: {"threads": ex.threads, "cpus": ex.cpus} for family, ex in manager.items()}
+        for executor in manager.values():
+            executor.shutdown()
+    for kind, values in latencies.items():
+        values.sort()
+        report[kind] = {
+            "completed": len(values),
+            "per_s": round(len(values) / elapsed, 3),
+            "p50_ms": round(values[len(values) // 2] * 1000, 1) if values else None,
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1) if values else None,
+            "mean_ms": round(statistics.mean(values) * 1000, 1) if values else None,
+        }
+    report["total_per_s"] = round((len(latencies["voice"]) + len(latencies["text"])) / elapsed, 3)
+    return report
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(run_mode(args.child, args))))
+        return
+
+    child_args = [arg for arg in sys.argv[1:]]
+    results = {"cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()}
+    for mode in args.modes.split(","):
+        completed = subprocess.run(
+            [sys.executable, __file__, *child_args, "--child", mode],
+            check=True, capture_output=True, text=True,
+        )
+        results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(json.dumps(results[mode]), file=sys.stderr)
+
+    baseline = results.get("shared") or results.get("inline")
+    if baseline and "partitioned" in results and baseline["total_per_s"]:
+        results["partitioned_speedup"] = round(results["partitioned"]["total_per_s"] / baseline["total_per_s"], 3)
+
+    print(json.dumps(results, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Function-call parser throughput: state machine vs legacy regex cascade.
+
+One-shot: parse each complete output once.
+Streaming: the output arrives in small chunks (≈ one token each); the legacy
+parser has to re-parse the whole buffer per chunk, the state machine is fed
+incrementally.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import legacy_function_call_parser as legacy  # noqa: E402
+from function_call_parser import FunctionCallParser, parse_function_calls  # noqa: E402
+from fuzz_function_call_parser import format_variants, load_seed_outputs  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Function-call parser throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the corpus")
+    parser.add_argument("--chunk_chars", type=int, default=4, help="Streaming chunk size (≈ one token)")
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def measure(fn, corpus: list[str], repeat: int, rounds: int = 5) -> dict:
+    """Best of `rounds` timings of `repeat` passes over the corpus."""
+    total_bytes = sum(len(text.encode("utf-8")) for text in corpus)
+    elapsed = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in corpus:
+                fn(text)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    count = len(corpus) * repeat
+    return {
+        "outputs_per_s": round(count / elapsed),
+        "mb_per_s": round(total_bytes * repeat / elapsed / 1e6, 2),
+        "us_per_output": round(elapsed / count * 1e6, 2),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    seeds = load_seed_outputs()
+    corpus = list(seeds)
+    for text in seeds:
+        corpus.extend(format_variants(text))
+
+    mismatches = sum(1 for text in corpus if legacy.parse_function_calls(text) != parse_function_calls(text))
+
+    chunk = args.chunk_chars
+
+    def legacy_streaming(text: str) -> None:
+        for end in range(chunk, len(text) + chunk, chunk):
+            legacy.parse_function_calls(text[:end])
+
+    def state_machine_streaming(text: str) -> None:
+        parser = FunctionCallParser()
+        for start in range(0, len(text), chunk):
+            parser.feed(text[start:start + chunk])
+        parser.finish()
+
+    results = {
+        "corpus": {"outputs": len(corpus), "eval_seeds": len(seeds), "legacy_mismatches": mismatches},
+        "one_shot": {
+            "legacy": measure(legacy.parse_function_calls, corpus, args.repeat),
+            "state_machine": measure(parse_function_calls, corpus, args.repeat),
+        },
+        "streaming": {
+            "chunk_chars": chunk,
+            "legacy_reparse": measure(legacy_streaming, corpus, max(1, args.repeat // 10)),
+            "state_machine": measure(state_machine_streaming, corpus, max(1, args.repeat // 10)),
+        },
+    }
+    for mode in ("one_shot", "streaming"):
+        section = results[mode]
+        baseline = section.get("legacy") or section.get("legacy_reparse")
+        section["speedup"] = round(section["state_machine"]["outputs_per_s"] / baseline["outputs_per_s"], 2)
+
+    print(json.dumps(results, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
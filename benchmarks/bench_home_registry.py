@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Memory-per-home and command throughput benchmark for HomeRegistry."""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from home_registry import HomeRegistry  # noqa: E402
+
+CALLS = [
+    ("ac_set_temperature", {"temperature": 22}),
+    ("tv_set_volume", {"volume": 15}),
+    ("light_power_off", {}),
+    ("curtain_set_position", {"position": 30}),
+    ("vacuum_clean_zone", {"zone": "kitchen"}),
+    ("ventilation_set_speed", {"speed": "high"}),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HomeRegistry memory/throughput benchmark")
+    parser.add_argument("--homes", type=int, default=10_000)
+    parser.add_argument("--commands", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    home_ids = [f"home-{i:06d}" for i in range(args.homes)]
+
+    # 홈 생성 메모리
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    notifications = 0
+
+    def on_state_change(home_id: str, state: dict) -> None:
+        nonlocal notifications
+        notifications += 1
+
+    registry = HomeRegistry(on_state_change=on_state_change)
+    start = time.perf_counter()
+    for home_id in home_ids:
+        registry.get(home_id)
+    create_s = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bytes_per_home = (after - before) / args.homes
+
+    # 무작위 홈에 명령 실행
+    rng = random.Random(args.seed)
+    workload = [(rng.choice(home_ids), *rng.choice(CALLS)) for _ in range(args.commands)]
+    start = time.perf_counter()
+    for home_id, name, params in workload:
+        registry.execute(home_id, name, params)
+    exec_s = time.perf_counter() - start
+
+    # 없는 홈 조회는 홈을 만들지 않음 (GET /state, /history, /ws)
+    for index in range(args.homes):
+        registry.state(f"unknown-{index:06d}")
+    if len(registry) != args.homes:
+        raise SystemExit(f"state() created homes: {len(registry)} != {args.homes}")
+
+    report = {
+        "homes": args.homes,
+        "bytes_per_home": round(bytes_per_home, 1),
+        "create_homes_per_s": round(args.homes / create_s),
+        "commands": args.commands,
+        "commands_per_s": round(args.commands / exec_s),
+        "notifications": notifications,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Write throughput and recovery time benchmark for the HomeState journal."""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from home_registry import HomeRegistry  # noqa: E402
+from state_journal import StateJournal  # noqa: E402
+
+CALLS = [
+    ("ac_adjust_temperature", {"delta": 1}),
+    ("tv_adjust_volume", {"delta": -1}),
+    ("light_set_brightness", {"brightness": 40}),
+    ("curtain_set_position", {"position": 30}),
+    ("audio_play", {}),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HomeState journal benchmark")
+    parser.add_argument("--records", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--homes", type=int, default=1_000)
+    parser.add_argument("--snapshot_every", type=int, default=100_000)
+    parser.add_argument("--no_fsync", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def run(records: int, args: argparse.Namespace, snapshot_every: int) -> dict:
+    directory = Path(tempfile.mkdtemp(prefix="fg-journal-"))
+    rng = random.Random(args.seed)
+    workload = [(f"home-{rng.randrange(args.homes)}", *rng.choice(CALLS)) for _ in range(records)]
+    try:
+        journal = StateJournal(str(directory), snapshot_every=snapshot_every, fsync=not args.no_fsync)
+        registry = HomeRegistry(journal=journal)
+
+        start = time.perf_counter()
+        for home_id, name, params in workload:
+            registry.execute(home_id, name, params)
+        submit_s = time.perf_counter() - start
+        while journal.committed_seq < records:
+            time.sleep(0.001)
+        durable_s = time.perf_counter() - start
+        journal.close(snapshot=False)  # 비정상 종료처럼 종료 스냅샷 없이
+
+        start = time.perf_counter()
+        recovered = StateJournal(str(directory), snapshot_every=snapshot_every).recover()
+        recover_s = time.perf_counter() - start
+        assert recovered.keys() == set(registry.home_ids())
+
+        return {
+            "records": records,
+            "snapshot_every": snapshot_every,
+            "submit_ops_per_s": round(records / submit_s),
+            "durable_records_per_s": round(records / durable_s),
+            "recovery_s": round(recover_s, 3),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    args = parse_args()
+    rows = []
+    for records in args.records:
+        # 스냅샷 없이 전체 재생 vs 주기적 스냅샷 + 꼬리 재생
+        rows.append(run(records, args, snapshot_every=records + 1))
+        rows.append(run(records, args, snapshot_every=args.snapshot_every))
+    for row in rows:
+        print(json.dumps(row))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
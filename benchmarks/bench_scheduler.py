@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Execution scheduler: priority queueing and deadline cancellation under load.
+
+Runs the backend app in-process with the stub model and STT (fixed latencies; the
+stub model checks the cancel token once per "token" like the real one).
+
+priority: background load keeps the model busy: --batch_clients clients send
+  /command/batch (--batch_items per request) and --replay_clients clients send text
+  commands with "X-Priority: batch", all back to back, while voice and interactive
+  text commands arrive (Poisson, --rate).
+  Compares arrival-order scheduling (FG_SCHEDULER_MAX_WAIT_MS=0) with the priority
+  queue and reports voice/text latency percentiles and batch items completed.
+
+deadline: interactive text commands arrive faster than the model can serve them
+  (--overload x capacity). Clients count an answer as useful only if it arrives
+  within --deadline_ms. Compares no server deadline with FG_DEADLINE_MS=--deadline_ms
+  and reports on-time answers per second, 504s and model busy time spent on late answers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "backend"))
+sys.path.append(str(BENCH_DIR))
+
+UTTERANCES = ["거실등 꺼줘", "에어컨 24도로 맞춰줘", "TV 볼륨 15로", "커튼 30퍼센트로", "주방 청소해줘", "환풍기 강으로"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Execution scheduler benchmark")
+    parser.add_argument("--model_latency_ms", type=float, default=100.0)
+    parser.add_argument("--stt_latency_ms", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    parser.add_argument("--rate", type=float, default=2.0, help="Voice + text arrivals/s (priority phase)")
+    parser.add_argument("--voice_share", type=float, default=0.5)
+    parser.add_argument("--batch_items", type=int, default=64)
+    parser.add_argument("--batch_clients", type=int, default=2)
+    parser.add_argument("--replay_clients", type=int, default=8)
+    parser.add_argument("--overload", type=float, default=2.0, help="Arrival rate / model capacity (deadline phase)")
+    parser.add_argument("--deadline_ms", type=float, default=1000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+        "max_ms": round(max(values, default=0.0) * 1000, 1),
+    }
+
+
+def arrivals(rng: random.Random, rate: float, duration: float) -> list[float]:
+    offsets, clock = [], 0.0
+    while True:
+        clock += rng.expovariate(rate)
+        if clock >= duration:
+            return offsets
+        offsets.append(clock)
+
+
+async def run_priority(main, client, max_wait: float, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    main.execution.executors["gemma"].max_wait = max_wait
+    main.execution.executors["whisper"].max_wait = max_wait
+    latencies: dict[str, list[float]] = {"voice": [], "text": []}
+    background = 0
+    stop = asyncio.Event()
+
+    async def batch_load(worker: int):
+        nonlocal background
+        round_index = 0
+        while not stop.is_set():
+            items = [
+                {"home_id": f"batch-{index % 16}", "text": f"{UTTERANCES[index % len(UTTERANCES)]} {worker}-{round_index}"}
+                for index in range(args.batch_items)
+            ]
+            response = await client.post("/command/batch", json={"items": items})
+            background += response.json()["succeeded"]
+            round_index += 1
+
+    async def replay_load(worker: int):
+        nonlocal background
+        round_index = 0
+        while not stop.is_set():
+            response = await client.post(
+                f"/homes/replay-{worker}/command/text",
+                json={"text": f"{UTTERANCES[round_index % len(UTTERANCES)]} r{round_index}"},
+                headers={"X-Priority": "batch"},
+            )
+            background += response.status_code == 200
+            round_index += 1
+
+    async def command(kind: str, index: int, delay: float):
+        await asyncio.sleep(delay)
+        text = f"{UTTERANCES[index % len(UTTERANCES)]} {index}"  # distinct, so nothing is coalesced
+        started = time.perf_counter()
+        if kind == "voice":
+            response = await client.post(
+                "/homes/prio-voice/command/voice",
+                files={"audio": ("audio.webm", text.encode("utf-8"), "audio/webm")},
+            )
+        else:
+            response = await client.post("/homes/prio-text/command/text", json={"text": text})
+        if response.status_code == 200:
+            latencies[kind].append(time.perf_counter() - started)
+
+    loaders = [asyncio.create_task(batch_load(worker)) for worker in range(args.batch_clients)]
+    loaders += [asyncio.create_task(replay_load(worker)) for worker in range(args.replay_clients)]
+    await asyncio.sleep(0.5)  # let the background backlog build up first
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        command("voice" if rng.random() < args.voice_share else "text", index, offset)
+        for index, offset in enumerate(arrivals(rng, args.rate, args.duration))
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*loaders)
+    return {
+        "scheduler": "priority" if max_wait else "fifo",
+        "voice": summary(latencies["voice"]),
+        "text": summary(latencies["text"]),
+        "background_commands_per_s": round(background / elapsed, 1),
+    }
+
+
+async def run_deadline(main, client, deadline_ms: float, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    main.COMMAND_DEADLINE_MS = deadline_ms
+    gemma = main.execution.executors["gemma"]
+    busy_before = gemma.busy_seconds
+    rate = args.overload * 1000 / args.model_latency_ms
+    on_time = late = timed_out = 0
+    late_busy = 0.0
+
+    async def command(index: int, delay: float):
+        nonlocal on_time, late, timed_out, late_busy
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        response = await client.post(
+            f"/homes/deadline-{index % 8}/command/text",
+            json={"text": f"{UTTERANCES[index % len(UTTERANCES)]} {index}"},
+        )
+        elapsed = time.perf_counter() - started
+        if response.status_code == 504:
+            timed_out += 1
+        elif elapsed * 1000 <= args.deadline_ms:
+            on_time += 1
+        else:
+            late += 1
+            late_busy += args.model_latency_ms / 1000
+
+    started = time.perf_counter()
+    await asyncio.gather(*(command(index, offset) for index, offset in enumerate(arrivals(rng, rate, args.duration))))
+    elapsed = time.perf_counter() - started
+    main.COMMAND_DEADLINE_MS = 0
+    return {
+        "server_deadline_ms": deadline_ms or None,
+        "offered_rps": round(rate, 1),
+        "on_time_per_s": round(on_time / elapsed, 2),
+        "late": late,
+        "deadline_504": timed_out,
+        "model_busy_s": round(gemma.busy_seconds - busy_before, 2),
+        "model_busy_on_late_answers_s": round(late_busy, 2),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    from stubs import install_stubs
+
+    install_stubs(args.model_latency_ms / 1000, args.stt_latency_ms / 1000)
+    import httpx
+
+    import main as backend_main
+
+    backend_main.command_flights.enabled = False
+    backend_main.degradation.enabled = False  # measure cancellation alone (see bench_degradation.py)
+
+    async def run_all() -> dict:
+        transport = httpx.ASGITransport(app=backend_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            default_wait = backend_main.execution.executors["gemma"].max_wait
+            priority = [
+                await run_priority(backend_main, client, max_wait, args) for max_wait in (0.0, default_wait)
+            ]
+            deadline = [
+                await run_deadline(backend_main, client, deadline_ms, args) for deadline_ms in (0.0, args.deadline_ms)
+            ]
+        return {"priority": priority, "deadline": deadline}
+
+    report = {"config": vars(args), **asyncio.run(run_all())}
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Device simulator throughput: ticks/s against the number of simulated homes.
+
+For each home count, builds an in-memory HomeRegistry whose state-change callback
+does what the backend's does (state history record + simulator.observe), populates
+the homes with DeviceSimulator.populate(), then starts a vacuum run and a curtain
+move in a fraction of them so every dynamic is active. Each mode runs --ticks ticks
+(the same simulated span for every home count) on a freshly built set of homes. Reports:
+  - tick: vectorized NumPy update only (DeviceSimulator.tick), ticks/s and ns per home
+  - step: tick + publishing changed homes through registry.apply / notifications,
+          ticks/s and homes published per tick
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from home_controller import HomeController  # noqa: E402
+from home_registry import HomeRegistry  # noqa: E402
+from simulator import DeviceSimulator  # noqa: E402
+from state_history import StateHistory  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Device simulator benchmark")
+    parser.add_argument("--homes", default="100,1000,5000,20000", help="Comma-separated home counts")
+    parser.add_argument("--dt", type=float, default=1.0, help="Simulated seconds per tick")
+    parser.add_argument("--ticks", type=int, default=300, help="Ticks per measurement")
+    parser.add_argument("--active", type=float, default=0.3, help="Fraction of homes with a vacuum run and curtain move")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def build(count: int, args: argparse.Namespace) -> DeviceSimulator:
+    history = StateHistory(max_homes=count)
+    simulator = None
+
+    def on_state_change(home_id: str, state: dict):
+        history.record(home_id, state)
+        if simulator is not None:
+            simulator.observe(home_id, state)
+
+    registry = HomeRegistry(on_state_change=on_state_change)
+    simulator = DeviceSimulator(registry, clock=1_700_000_000.0, capacity=count)
+    home_ids = simulator.populate(count, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    for home_id in home_ids:
+        if rng.random() < args.active:
+            registry.apply(home_id, HomeController.vacuum_start)
+            registry.apply(home_id, HomeController.curtain_set_position, int(rng.integers(0, 100)))
+    return simulator
+
+
+def measure(fn, ticks: int) -> float:
+    started = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    for count in (int(value) for value in args.homes.split(",")):
+        started = time.perf_counter()
+        simulator = build(count, args)
+        setup_s = time.perf_counter() - started
+
+        elapsed = measure(lambda: simulator.tick(args.dt), args.ticks)
+        tick_report = {
+            "ticks_per_s": round(args.ticks / elapsed, 1),
+            "ns_per_home": round(elapsed / args.ticks / count * 1e9, 1),
+        }
+
+        simulator = build(count, args)
+        updates_before = simulator.updates
+        elapsed = measure(lambda: simulator.step(args.dt), args.ticks)
+        published = simulator.updates - updates_before
+        step_report = {
+            "ticks_per_s": round(args.ticks / elapsed, 1),
+            "homes_published_per_tick": round(published / args.ticks, 1),
+            "us_per_published_home": round(elapsed / max(published, 1) * 1e6, 2),
+        }
+        result = {"homes": count, "setup_s": round(setup_s, 2), "tick": tick_report, "step": step_report}
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+
+    report = {"config": vars(args), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
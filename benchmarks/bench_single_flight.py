@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Single-flight command deduplication: identical concurrent commands with and without it.
+
+Runs the backend app in-process with the stub model (fixed --model_latency_ms) and
+sends bursts of commands: in each burst, every home receives the same utterance from
+--duplicates clients (text, or voice for --voice_share of them; spelling varies by
+whitespace/punctuation) within --spread_ms. Bursts are repeated --bursts times with
+different utterances. Reports, with FG_SINGLE_FLIGHT off and on:
+  - generations run by the model and function calls applied per home
+  - coalesced responses, burst wall time and per-request latency percentiles
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "backend"))
+sys.path.append(str(BENCH_DIR))
+
+UTTERANCES = ["거실등 꺼줘", "에어컨 24도로 맞춰줘", "TV 볼륨 15로", "커튼 30퍼센트로", "주방 청소해줘", "환풍기 강으로"]
+VARIANTS = ("{}", "{} ", " {}!", "{}.", "{}  ")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Single-flight deduplication benchmark")
+    parser.add_argument("--homes", type=int, default=4)
+    parser.add_argument("--duplicates", type=int, default=3, help="Identical commands per home per burst")
+    parser.add_argument("--voice_share", type=float, default=0.3)
+    parser.add_argument("--spread_ms", type=float, default=20.0, help="Arrival spread of duplicates")
+    parser.add_argument("--bursts", type=int, default=6)
+    parser.add_argument("--model_latency_ms", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def run_mode(main, enabled: bool, args: argparse.Namespace) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    main.command_flights.enabled = enabled
+    main.command_flights.leaders = main.command_flights.coalesced = 0
+    model = main.get_model()
+    generations = 0
+    generate = model.generate_function_call
+
+    def counted(*call_args, **kwargs):
+        nonlocal generations
+        generations += 1
+        return generate(*call_args, **kwargs)
+
+    model.generate_function_call = counted
+    executed = 0
+    execute = main.home_registry.execute
+
+    def counted_execute(*call_args, **kwargs):
+        nonlocal executed
+        executed += 1
+        return execute(*call_args, **kwargs)
+
+    main.home_registry.execute = counted_execute
+    latencies: list[float] = []
+    coalesced = 0
+    burst_times = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            async def send(home_id: str, text: str, voice: bool, delay: float):
+                nonlocal coalesced
+                await asyncio.sleep(delay)
+                started = time.perf_counter()
+                if voice:
+                    response = await client.post(
+                        f"/homes/{home_id}/command/voice",
+                        files={"audio": ("audio.webm", text.encode("utf-8"), "audio/webm")},
+                    )
+                else:
+                    response = await client.post(f"/homes/{home_id}/command/text", json={"text": text})
+                latencies.append(time.perf_counter() - started)
+                coalesced += bool(response.json().get("coalesced"))
+
+            for burst in range(args.bursts):
+                utterance = UTTERANCES[burst % len(UTTERANCES)]
+                jobs = [
+                    send(
+                        f"sf-{home}",
+                        rng.choice(VARIANTS).format(utterance),
+                        rng.random() < args.voice_share,
+                        rng.uniform(0, args.spread_ms / 1000),
+                    )
+                    for home in range(args.homes)
+                    for _ in range(args.duplicates)
+                ]
+                started = time.perf_counter()
+                await asyncio.gather(*jobs)
+                burst_times.append(time.perf_counter() - started)
+    finally:
+        model.generate_function_call = generate
+        main.home_registry.execute = execute
+
+    requests = args.homes * args.duplicates * args.bursts
+    return {
+        "single_flight": enabled,
+        "requests": requests,
+        "generations": generations,
+        "function_calls_applied": executed,
+        "coalesced": coalesced,
+        "burst_wall_ms": round(sum(burst_times) / len(burst_times) * 1000, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    from stubs import install_stubs
+
+    install_stubs(args.model_latency_ms / 1000)
+    import main as backend_main
+
+    async def run_all() -> list[dict]:
+        return [await run_mode(backend_main, enabled, args) for enabled in (False, True)]
+
+    off, on = asyncio.run(run_all())
+    report = {"config": vars(args), "off": off, "on": on}
+    if on["burst_wall_ms"]:
+        report["burst_speedup"] = round(off["burst_wall_ms"] / on["burst_wall_ms"], 2)
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""API startup time: launch to first answered /state and /device/* request.
+
+Starts the real backend (uvicorn main:app, no model loaded) and polls until
+GET /state and a manual device control answer. Each run also reports how long
+`import main` takes and which heavy ML modules it pulled in.
+
+--eager imports torch / transformers / whisper / langid (those that are installed)
+before the app, reproducing the old import-time cost for comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+
+HEAVY_MODULES = ("torch", "transformers", "whisper", "langid")
+
+SERVER_CODE = """
+import importlib, sys
+for name in {eager!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+import uvicorn
+uvicorn.run("main:app", host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+IMPORT_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_s": elapsed, "heavy_loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backend startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="Import the heavy ML modules up front (old behavior)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, method: str, path: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if client.request(method, path).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            time.sleep(0.005)
+    raise SystemExit(f"{method} {path} did not answer before the timeout")
+
+
+def measure_launch(eager: tuple[str, ...], timeout: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_CODE.format(eager=eager, port=port)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            deadline = started + timeout
+            state_at = wait_for(client, "GET", "/state", deadline)
+            device_at = wait_for(client, "POST", "/device/light/power/on", deadline)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"state_s": state_at - started, "device_s": device_at - started}
+
+
+def measure_import() -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", IMPORT_CODE.format(heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    args = parse_args()
+    eager = HEAVY_MODULES if args.eager else ()
+
+    launches = [measure_launch(eager, args.timeout) for _ in range(args.runs)]
+    imports = [measure_import() for _ in range(args.runs)]
+
+    report = {
+        "mode": "eager" if args.eager else "lazy",
+        "runs": args.runs,
+        "import_main_s": round(statistics.median(run["import_s"] for run in imports), 3),
+        "heavy_modules_after_import": imports[0]["heavy_loaded"],
+        "launch_to_state_s": {
+            "median": round(statistics.median(run["state_s"] for run in launches), 3),
+            "max": round(max(run["state_s"] for run in launches), 3),
+        },
+        "launch_to_device_s": {
+            "median": round(statistics.median(run["device_s"] for run in launches), 3),
+            "max": round(max(run["device_s"] for run in launches), 3),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
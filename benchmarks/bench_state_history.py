@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""State history bucket rings: record cost, bounded memory and query latency.
+
+Simulates a day of device changes per home (one change every --interval seconds),
+feeds them to StateHistory.record() the way the backend's state-change callback
+does, and reports:
+  - record throughput (changes/s) and bytes held, per phase (never above limit_bytes;
+    it plateaus once every field's ring holds --retention seconds of buckets)
+  - per-bucket range query and 1-minute downsample latency over the last 24 hours
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from home_controller import HomeState  # noqa: E402
+from state_history import StateHistory  # noqa: E402
+
+MUTATIONS = [
+    ("ac", "temperature", lambda rng: rng.randint(18, 28)),
+    ("light", "brightness", lambda rng: rng.randint(0, 100)),
+    ("tv", "volume", lambda rng: rng.randint(0, 60)),
+    ("audio", "volume", lambda rng: rng.randint(0, 60)),
+    ("curtain", "position", lambda rng: rng.randint(0, 100)),
+    ("ac", "power", lambda rng: rng.random() < 0.5),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="State history benchmark")
+    parser.add_argument("--homes", type=int, default=16)
+    parser.add_argument("--resolution", type=float, default=60.0, help="Bucket seconds (server default)")
+    parser.add_argument("--retention", type=float, default=24 * 3600, help="Seconds kept (server default)")
+    parser.add_argument("--max_homes", type=int, default=1024, help="Server default")
+    parser.add_argument("--interval", type=float, default=5.0, help="Simulated seconds between changes per home")
+    parser.add_argument("--phases", type=int, default=4, help="Simulated days (memory is reported per day)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    history = StateHistory(resolution=args.resolution, retention=args.retention, max_homes=args.max_homes)
+    states = {f"home-{index}": HomeState().to_dict() for index in range(args.homes)}
+
+    day = 24 * 3600
+    clock = 1_700_000_000.0
+    phases = []
+    for _ in range(args.phases):
+        steps = int(day / args.interval)
+        started = time.perf_counter()
+        for _ in range(steps):
+            clock += args.interval
+            for home_id, state in states.items():
+                device, field, make = rng.choice(MUTATIONS)
+                state[device][field] = make(rng)
+                history.record(home_id, state, timestamp=clock)
+        elapsed = time.perf_counter() - started
+        phases.append({
+            "changes": steps * args.homes,
+            "changes_per_s": round(steps * args.homes / elapsed),
+            "us_per_change": round(elapsed / (steps * args.homes) * 1e6, 2),
+            "bytes": history.nbytes(),
+        })
+
+    home_ids = list(states)
+
+    def time_queries(step: float | None) -> dict:
+        samples = []
+        for index in range(args.queries):
+            started = time.perf_counter()
+            history.query(
+                home_ids[index % len(home_ids)],
+                ["ac.temperature", "light.brightness", "tv.volume", "curtain.position"],
+                start=clock - day,
+                end=clock,
+                step=step,
+            )
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        return {"p50_ms": round(samples[len(samples) // 2] * 1000, 3), "max_ms": round(samples[-1] * 1000, 3)}
+
+    report = {
+        "config": vars(args),
+        "phases": phases,
+        # Each ring stops growing at retention / resolution buckets of 5 doubles:
+        # bytes <= fields x slots x 40, whatever --interval is
+        "limit_bytes": history.stats()["fields"] * history.capacity * 40,
+        "stats": history.stats(),
+        "query_buckets_24h": time_queries(None),
+        "query_1min_24h": time_queries(60.0),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Fuzz the state-machine function-call parser against the legacy regex parser.
+
+Corpus: raw outputs from docs/eval_*.jsonl, the same calls re-rendered in every
+supported format, and seeded random mutations of both (truncation, span
+deletion/duplication, marker injection, concatenation).
+
+Checks per case:
+  - the parser never raises
+  - feeding random chunks (down to single characters) gives the same result as a one-shot parse
+  - seeds and format variants parse exactly like the legacy parser (mutations only report the mismatch rate)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import legacy_function_call_parser as legacy  # noqa: E402
+from function_call_parser import FunctionCallParser, parse_function_calls  # noqa: E402
+
+EVAL_FILES = sorted((PROJECT_ROOT / "docs").glob("eval_*.jsonl"))
+
+MARKERS = [
+    "<start_function_call>", "<end_function_call>", "<start_of_function_call>", "<end_of_function_call>",
+    "<escape>", "call:", "{", "}", "(", ")", ",", ":", '"', "\n", "<end_of_turn>", "<start_function_response>",
+]
+
+
+def load_seed_outputs() -> list[str]:
+    outputs = []
+    for path in EVAL_FILES:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            record = json.loads(line) if line.strip() else {}
+            if "raw_output" in record:  # skip any non-output file that matches the glob
+                outputs.append(record["raw_output"])
+    return outputs
+
+
+def _render_params(parameters: dict, style: str) -> str:
+    if style == "escape":
+        return ",".join(f"{k}:<escape>{v}<escape>" for k, v in parameters.items())
+    if style == "bare":
+        return ",".join(f"{k}:{v}" for k, v in parameters.items())
+    return json.dumps(parameters, ensure_ascii=False)[1:-1]  # "k": v
+
+
+def format_variants(output: str) -> list[str]:
+    """Same calls as output, rendered in every format the parser accepts."""
+    calls = legacy.parse_function_calls(output)
+    if not calls:
+        return []
+    variants = []
+    for style in ("escape", "bare", "json"):
+        body = "".join(
+            f"<start_of_function_call>call:{c['function_name']}{{{_render_params(c['parameters'], style)}}}"
+            "<end_of_function_call>"
+            for c in calls
+        )
+        variants.append(body + "<end_of_turn>")
+    first = calls[0]
+    variants.append(f"call:{first['function_name']}{{{_render_params(first['parameters'], 'bare')}}}")
+    variants.append(f"sure: call:{first['function_name']}({_render_params(first['parameters'], 'bare')})")
+    variants.append(json.dumps({"name": first["function_name"], "arguments": first["parameters"]}, ensure_ascii=False))
+    variants.append(json.dumps(
+        {"function_call": {"function": {"name": first["function_name"], "arguments": json.dumps(first["parameters"])}}},
+        ensure_ascii=False,
+    ))
+    variants.append("\n  ".join(output.split("<end_function_call>")))
+    return variants
+
+
+def mutate(text: str, rng: random.Random, pool: list[str]) -> str:
+    kind = rng.randrange(5)
+    if not text:
+        return rng.choice(MARKERS)
+    i = rng.randrange(len(text))
+    j = min(len(text), i + rng.randint(1, 12))
+    if kind == 0:
+        return text[:i]
+    if kind == 1:
+        return text[:i] + text[j:]
+    if kind == 2:
+        return text[:j] + text[i:j] + text[j:]
+    if kind == 3:
+        return text[:i] + rng.choice(MARKERS) + text[i:]
+    return text + rng.choice(pool)
+
+
+def build_corpus(mutations: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    seeds = load_seed_outputs()
+    corpus = [{"kind": "seed", "text": text} for text in seeds]
+    for text in seeds:
+        corpus.extend({"kind": "variant", "text": variant} for variant in format_variants(text))
+    pool = [case["text"] for case in corpus]
+    for _ in range(mutations):
+        text = rng.choice(pool)
+        for _ in range(rng.randint(1, 3)):
+            text = mutate(text, rng, pool)
+        corpus.append({"kind": "mutation", "text": text})
+    return corpus
+
+
+def chunked_parse(text: str, rng: random.Random) -> tuple[list[dict], list[dict]]:
+    parser = FunctionCallParser()
+    streamed: list[dict] = []
+    position = 0
+    while position < len(text):
+        size = rng.choice((1, 1, 2, 3, 5, 8, 20))
+        streamed.extend(parser.feed(text[position:position + size]))
+        position += size
+    return parser.finish(), streamed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Function-call parser fuzzing")
+    parser.add_argument("--mutations", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write_corpus", default=None, help="Dump the generated corpus as JSONL")
+    parser.add_argument("--show", type=int, default=5, help="Mismatch examples to print")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    corpus = build_corpus(args.mutations, args.seed)
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as handle:
+            for case in corpus:
+                handle.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+    rng = random.Random(args.seed + 1)
+    stats = {kind: {"cases": 0, "legacy_mismatch": 0} for kind in ("seed", "variant", "mutation")}
+    failures: list[str] = []
+    examples: list[dict] = []
+
+    for case in corpus:
+        text, kind = case["text"], case["kind"]
+        stats[kind]["cases"] += 1
+        try:
+            expected = parse_function_calls(text)
+            chunked, streamed = chunked_parse(text, rng)
+        except Exception as exc:  # noqa: BLE001 - fuzzing: report everything
+            failures.append(f"crash {type(exc).__name__}: {exc} on {text!r}")
+            continue
+        if chunked != expected:
+            failures.append(f"chunked != one-shot on {text!r}")
+        if streamed != expected[:len(streamed)]:
+            failures.append(f"streamed calls are not a prefix of the result on {text!r}")
+
+        try:
+            baseline = legacy.parse_function_calls(text)
+        except Exception:  # noqa: BLE001 - legacy crashes count as mismatches
+            baseline = None
+        if baseline != expected:
+            stats[kind]["legacy_mismatch"] += 1
+            if kind != "mutation":
+                failures.append(f"{kind} differs from legacy on {text!r}: {baseline} != {expected}")
+            elif len(examples) < args.show:
+                examples.append({"text": text, "legacy": baseline, "new": expected})
+
+    print(json.dumps({"cases": len(corpus), "by_kind": stats, "failures": len(failures)}, indent=2))
+    for example in examples:
+        print(json.dumps(example, ensure_ascii=False))
+    for failure in failures[:20]:
+        print("FAIL", failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Pre-state-machine FunctionGemma output parser (regex cascade), kept as a baseline.
+
+Copied verbatim from FunctionGemmaModel before backend/function_call_parser.py
+replaced it; used by bench_function_call_parser.py and fuzz_function_call_parser.py.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Optional
+
+
+class LegacyFunctionCallParser:
+    def parse_function_calls(self, output: str) -> list[dict]:
+        calls: list[dict] = []
+
+        segments = re.findall(
+            r"<start_(?:of_)?function_call>(.*?)<end_(?:of_)?function_call>",
+            output,
+            flags=re.DOTALL,
+        )
+        for segment in segments:
+            parsed = self._parse_function_segment(segment)
+            if parsed:
+                calls.append(parsed)
+
+        if calls:
+            return calls
+
+        for name, params in re.findall(r"call:([a-zA-Z_]\w*)\{([^}]*)\}", output):
+            calls.append({
+                "function_name": name,
+                "parameters": self._parse_parameters(params),
+            })
+
+        if calls:
+            return calls
+
+        for name, params in re.findall(r"call:([a-zA-Z_]\w*)\(([^)]*)\)", output):
+            calls.append({
+                "function_name": name,
+                "parameters": self._parse_parameters(params),
+            })
+
+        if calls:
+            return calls
+
+        json_candidate = self._extract_json_blob(output)
+        if json_candidate:
+            parsed_json = self._parse_json_function_call(json_candidate)
+            if parsed_json:
+                return [parsed_json]
+
+        return []
+
+    def _extract_function_call_segment(self, output: str) -> Optional[str]:
+        start_tokens = ("<start_function_call>", "<start_of_function_call>")
+        end_tokens = ("<end_function_call>", "<end_of_function_call>")
+
+        for start_token in start_tokens:
+            start_index = output.find(start_token)
+            if start_index == -1:
+                continue
+
+            search_from = start_index + len(start_token)
+            for end_token in end_tokens:
+                end_index = output.find(end_token, search_from)
+                if end_index != -1:
+                    return output[search_from:end_index].strip()
+
+        return None
+
+    def _parse_function_segment(self, segment: str) -> Optional[dict]:
+        text = segment.strip()
+        if text.startswith("call:"):
+            text = text[len("call:"):].strip()
+
+        if text.startswith("{"):
+            parsed_json = self._parse_json_function_call(text)
+            if parsed_json:
+                return parsed_json
+
+        brace_start = text.find("{")
+        brace_end = text.rfind("}")
+        if brace_start == -1 or brace_end == -1 or brace_end <= brace_start:
+            return None
+
+        function_name = text[:brace_start].strip()
+        params_str = text[brace_start + 1:brace_end].strip()
+
+        if not function_name:
+            return None
+
+        return {
+            "function_name": function_name,
+            "parameters": self._parse_parameters(params_str)
+        }
+
+    def _parse_parameters(self, params_str: str) -> dict:
+        if not params_str:
+            return {}
+
+        if "<escape>" in params_str:
+            parameters = {}
+            param_pattern = r"(\w+):<escape>([^<]*)<escape>"
+            for key, value in re.findall(param_pattern, params_str):
+                parameters[key] = self._coerce_value(value)
+            return parameters
+
+        # JSON 형태 파라미터 처리
+        json_text = params_str
+        if not (json_text.startswith("{") and json_text.endswith("}")):
+            json_text = f"{{{json_text}}}"
+
+        try:
+            parsed = json.loads(json_text)
+            if isinstance(parsed, dict):
+                return {k: self._coerce_value(v) for k, v in parsed.items()}
+        except json.JSONDecodeError:
+            pass
+
+        # key:value 형태 간단 파싱
+        parameters = {}
+        for chunk in params_str.split(","):
+            if ":" not in chunk:
+                continue
+            key, value = chunk.split(":", 1)
+            parameters[key.strip()] = self._coerce_value(value.strip())
+        return parameters
+
+    def _coerce_value(self, value):
+        if not isinstance(value, str):
+            return value
+
+        cleaned = value.strip().strip('"').strip("'")
+        lowered = cleaned.lower()
+
+        if lowered in ("true", "false"):
+            return lowered == "true"
+
+        if cleaned.lstrip("+-").isdigit():
+            return int(cleaned)
+
+        if cleaned.replace(".", "", 1).lstrip("+-").isdigit():
+            return float(cleaned)
+
+        return cleaned
+
+    def _parse_json_function_call(self, json_text: str) -> Optional[dict]:
+        try:
+            payload = json.loads(json_text)
+        except json.JSONDecodeError:
+            return None
+
+        if not isinstance(payload, dict):
+            return None
+
+        if "function_call" in payload and isinstance(payload["function_call"], dict):
+            payload = payload["function_call"]
+
+        function_block = payload.get("function")
+        if isinstance(function_block, dict):
+            name = function_block.get("name")
+            arguments = function_block.get("arguments", function_block.get("parameters", {}))
+        else:
+            name = payload.get("name") or payload.get("function_name")
+            arguments = payload.get("arguments", payload.get("parameters", {}))
+
+        if not name:
+            return None
+
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                arguments = {}
+
+        if not isinstance(arguments, dict):
+            arguments = {}
+
+        return {
+            "function_name": name,
+            "parameters": {k: self._coerce_value(v) for k, v in arguments.items()}
+        }
+
+    def _extract_json_blob(self, text: str) -> Optional[str]:
+        start = text.find("{")
+        end = text.rfind("}")
+        if start == -1 or end == -1 or end <= start:
+            return None
+        return text[start:end + 1]
+
+
+_LEGACY = LegacyFunctionCallParser()
+
+
+def parse_function_calls(output: str) -> list[dict]:
+    return _LEGACY.parse_function_calls(output)
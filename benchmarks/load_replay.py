@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Replay recorded utterances against the command API at open-loop arrival rates.
+
+Utterances come from --corpus (default: docs/demo-commands.prompts.ko.txt and
+docs/functiongemma-test-prompts.txt). For each rate in --rates, requests are issued
+for --duration seconds on a fixed arrival schedule (Poisson or uniform) regardless of
+how fast the backend answers; --max_in_flight caps outstanding requests, and requests
+waiting for a slot still count their latency from the scheduled arrival time (so a
+saturated backend shows up as growing latency, not as a lower offered rate).
+
+Each arrival picks one of --clients simulated clients; client i talks to home
+"<home_prefix><i % homes>" and sends /command/text or /command/voice according to
+--mix. --ws_per_home WebSocket listeners subscribe to every home's /ws for the whole run.
+--text_priority batch sends text commands with "X-Priority: batch" (replay traffic that
+should yield to voice and interactive commands on a shared backend).
+
+Voice payloads are files from --audio_dir (cycled) or, without it, the utterance text
+as bytes, which only the stub STT understands (benchmarks/stubs.py).
+
+Targets --url, or starts benchmarks/stub_server.py when no URL is given. Reports per
+rate: achieved throughput, latency percentiles per kind, error rates by cause and
+WebSocket messages received.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import websockets
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+DEFAULT_CORPUS = [
+    PROJECT_ROOT / "docs" / "demo-commands.prompts.ko.txt",
+    PROJECT_ROOT / "docs" / "functiongemma-test-prompts.txt",
+]
+KINDS = ("text", "voice")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Command API traffic replay")
+    parser.add_argument("--url", default=None, help="Existing backend URL (default: start stub server)")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--model_latency_ms", type=float, default=50.0, help="Stub server only")
+    parser.add_argument("--stt_latency_ms", type=float, default=100.0, help="Stub server only")
+    parser.add_argument("--corpus", nargs="+", default=[str(path) for path in DEFAULT_CORPUS])
+    parser.add_argument("--audio_dir", default=None, help="Audio files for /command/voice (real STT)")
+    parser.add_argument("--rates", default="2,5,10,20", help="Comma-separated arrival rates (requests/s)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per rate")
+    parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    parser.add_argument("--max_in_flight", type=int, default=64, help="Concurrency limit (0: unlimited)")
+    parser.add_argument("--mix", default="text=0.8,voice=0.2", help="Request kind weights")
+    parser.add_argument("--text_priority", choices=("interactive", "batch"), default="interactive")
+    parser.add_argument("--homes", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--home_prefix", default="load-")
+    parser.add_argument("--ws_per_home", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def load_corpus(paths: list[str]) -> list[str]:
+    lines = []
+    for path in paths:
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                lines.append(line)
+    if not lines:
+        raise SystemExit("corpus is empty")
+    return lines
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in KINDS:
+            raise SystemExit(f"unknown request kind in --mix: {kind!r} (expected {', '.join(KINDS)})")
+        mix[kind] = float(weight)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p90_ms": round(percentile(values, 90) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round((values[-1] if values else 0.0) * 1000, 1),
+    }
+
+
+class WebSocketListeners:
+    """Per-home /ws subscribers that count state updates for the whole run."""
+
+    def __init__(self, base_url: str, home_ids: list[str], per_home: int):
+        self.urls = [
+            base_url.replace("http://", "ws://").replace("https://", "wss://") + f"/homes/{home_id}/ws"
+            for home_id in home_ids for _ in range(per_home)
+        ]
+        self.messages = 0
+        self.errors = 0
+        self._tasks: list[asyncio.Task] = []
+
+    async def _listen(self, url: str):
+        try:
+            async with websockets.connect(url, max_queue=None) as ws:
+                async for _ in ws:
+                    self.messages += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.errors += 1
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._listen(url)) for url in self.urls]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class Replayer:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.corpus = load_corpus(args.corpus)
+        self.mix = parse_mix(args.mix)
+        self.audio = sorted(Path(args.audio_dir).iterdir()) if args.audio_dir else []
+        self.clients = [
+            f"{args.home_prefix}{index % args.homes}" for index in range(args.clients)
+        ]
+        self.position = 0
+
+    def next_request(self) -> tuple[str, str, str]:
+        """(kind, home_id, utterance) for the next arrival (corpus replayed in order)."""
+        kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        home_id = self.rng.choice(self.clients)
+        text = self.corpus[self.position % len(self.corpus)]
+        self.position += 1
+        return kind, home_id, text
+
+    async def send(self, kind: str, home_id: str, text: str) -> httpx.Response:
+        prefix = f"/homes/{home_id}"
+        if kind == "text":
+            headers = {"X-Priority": "batch"} if self.args.text_priority == "batch" else None
+            return await self.client.post(f"{prefix}/command/text", json={"text": text}, headers=headers)
+        if self.audio:
+            path = self.audio[self.position % len(self.audio)]
+            payload = (path.name, path.read_bytes(), "application/octet-stream")
+        else:
+            payload = ("audio.webm", text.encode("utf-8"), "audio/webm")
+        return await self.client.post(f"{prefix}/command/voice", files={"audio": payload})
+
+    def arrivals(self, rate: float, duration: float) -> list[float]:
+        """Scheduled send offsets (s) within one stage."""
+        offsets, clock = [], 0.0
+        while True:
+            clock += self.rng.expovariate(rate) if self.args.arrival == "poisson" else 1 / rate
+            if clock >= duration:
+                return offsets
+            offsets.append(clock)
+
+    async def run_stage(self, rate: float, listeners: WebSocketListeners) -> dict:
+        limit = asyncio.Semaphore(self.args.max_in_flight) if self.args.max_in_flight > 0 else None
+        latencies = {kind: [] for kind in self.mix}
+        waits: list[float] = []
+        errors: Counter = Counter()
+        completed = Counter()
+        ws_before = listeners.messages
+
+        async def one(kind: str, home_id: str, text: str, scheduled: float):
+            if limit is not None:
+                await limit.acquire()
+            waits.append(time.perf_counter() - scheduled)
+            try:
+                response = await asyncio.wait_for(self.send(kind, home_id, text), self.args.timeout)
+            except asyncio.TimeoutError:
+                errors["timeout"] += 1
+                return
+            except httpx.HTTPError as exc:
+                errors[type(exc).__name__] += 1
+                return
+            finally:
+                if limit is not None:
+                    limit.release()
+            if response.status_code >= 400:
+                errors[f"http_{response.status_code}"] += 1
+                return
+            latencies[kind].append(time.perf_counter() - scheduled)
+            completed[kind] += 1
+            try:
+                success = response.json().get("success", True)
+            except ValueError:
+                success = False
+            if not success:
+                errors["command_failed"] += 1  # answered, but no function call / execution failed
+
+        tasks = []
+        started = time.perf_counter()
+        for offset in self.arrivals(rate, self.args.duration):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(*self.next_request(), scheduled=started + offset)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        sent = len(tasks)
+        hard_errors = sum(count for cause, count in errors.items() if cause != "command_failed")
+        waits.sort()
+        return {
+            "offered_rps": rate,
+            "sent": sent,
+            "throughput_rps": round(sum(completed.values()) / elapsed, 2),
+            "error_rate": round(hard_errors / sent, 4) if sent else 0.0,
+            "command_failed_rate": round(errors["command_failed"] / sent, 4) if sent else 0.0,
+            "errors": dict(errors),
+            "latency": {kind: latency_summary(values) for kind, values in latencies.items()},
+            "slot_wait_p99_ms": round(percentile(waits, 99) * 1000, 1),
+            "ws_messages_per_s": round((listeners.messages - ws_before) / elapsed, 1),
+            "elapsed_s": round(elapsed, 2),
+        }
+
+
+async def run(base_url: str, args: argparse.Namespace) -> list[dict]:
+    limits = httpx.Limits(max_connections=args.max_in_flight or None, max_keepalive_connections=args.max_in_flight or None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        replayer = Replayer(client, args)
+        home_ids = sorted(set(replayer.clients))
+        listeners = WebSocketListeners(base_url, home_ids, args.ws_per_home)
+        listeners.start()
+        curve = []
+        try:
+            for rate in (float(value) for value in args.rates.split(",")):
+                stage = await replayer.run_stage(rate, listeners)
+                stage["ws_errors"] = listeners.errors
+                print(json.dumps(stage, ensure_ascii=False), file=sys.stderr)
+                curve.append(stage)
+        finally:
+            await listeners.stop()
+        return curve
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit(f"backend at {base_url} did not become ready")
+
+
+def main() -> None:
+    args = parse_args()
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = args.port or free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                str(BENCH_DIR / "stub_server.py"),
+                "--port", str(port),
+                "--model_latency_ms", str(args.model_latency_ms),
+                "--stt_latency_ms", str(args.stt_latency_ms),
+            ],
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+    try:
+        wait_ready(base_url)
+        curve = asyncio.run(run(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    config = {key: value for key, value in vars(args).items() if key != "output_json"}
+    config["url"] = args.url or "stub"
+    report = {"config": config, "curve": curve}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
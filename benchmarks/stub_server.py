@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Run the backend with stub model/STT (fixed latency) for benchmarks and load tests."""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backend with stub FunctionGemma/Whisper")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--model_latency_ms", type=float, default=0.0)
+    parser.add_argument("--stt_latency_ms", type=float, default=0.0)
+    parser.add_argument("--log_level", default="warning")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    os.chdir(BACKEND_DIR)
+
+    import uvicorn
+
+    from stubs import install_stubs
+
+    install_stubs(args.model_latency_ms / 1000, args.stt_latency_ms / 1000)
+    import main as backend_main
+
+    uvicorn.run(backend_main.app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
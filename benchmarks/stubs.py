@@ -0,0 +1,141 @@
+"""Deterministic stand-ins for FunctionGemmaModel and SpeechToText.
+
+They sleep for a fixed latency instead of running a model, so benchmarks measure
+only the backend's own overhead. Like the real model, the stub model checks a
+cancel_token once per "token" (STUB_GENERATED_TOKENS slices of its latency) and
+raises JobCancelled when it is cancelled. It also models the cheaper strategies used
+under a deadline: a pruned prompt shortens the prompt share of the latency, a smaller
+max_new_tokens truncates the output (and the call), and smaller STT sizes are faster.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Optional
+
+# Calls returned by the stub model, chosen deterministically from the input text.
+STUB_CALLS = [
+    {"function_name": "light_power_on", "parameters": {}},
+    {"function_name": "ac_set_temperature", "parameters": {"temperature": 24}},
+    {"function_name": "tv_set_volume", "parameters": {"volume": 15}},
+    {"function_name": "curtain_set_position", "parameters": {"position": 30}},
+    {"function_name": "vacuum_clean_zone", "parameters": {"zone": "kitchen"}},
+    {"function_name": "ventilation_set_speed", "parameters": {"speed": "high"}},
+]
+
+# Token count reported for every stub generation.
+STUB_GENERATED_TOKENS = 24
+
+# Share of the model latency spent on the prompt (prefill) with the full schema list,
+# and the prompt cost of a pruned prompt relative to the full one.
+STUB_PREFILL_SHARE = 0.5
+STUB_PRUNED_PROMPT = 0.3
+
+# STT latency per Whisper size, relative to "base".
+STUB_STT_SCALE = {"tiny": 0.5, "base": 1.0, "small": 2.5}
+
+
+def _decode(seconds: float, cancel_token=None) -> None:
+    """Sleep for seconds, stopping early (JobCancelled) if cancel_token is cancelled."""
+    if cancel_token is None:
+        if seconds:
+            time.sleep(seconds)
+        return
+    cancel_token.raise_if_cancelled()
+    for _ in range(STUB_GENERATED_TOKENS):
+        time.sleep(seconds / STUB_GENERATED_TOKENS)
+        if cancel_token.cancelled:
+            break
+    cancel_token.raise_if_cancelled()
+
+
+def _pick_call(text: str) -> dict:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=2).digest()
+    return STUB_CALLS[int.from_bytes(digest, "big") % len(STUB_CALLS)]
+
+
+def _format_call(call: dict) -> str:
+    params = ",".join(f"{k}:<escape>{v}<escape>" for k, v in call["parameters"].items())
+    return f"<start_function_call>call:{call['function_name']}{{{params}}}<end_function_call>"
+
+
+class StubFunctionGemmaModel:
+    """FunctionGemmaModel replacement with fixed latency."""
+
+    def __init__(self, latency_s: float = 0.0, batch_item_latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.batch_item_latency_s = batch_item_latency_s
+        self.loaded = True
+        self.route_prompts = False
+
+    def resolve_adapter(self, name: Optional[str]) -> str:
+        return name or "base"
+
+    def _result(self, user_input: str, generated_tokens: int = STUB_GENERATED_TOKENS) -> dict:
+        call = _pick_call(user_input)
+        complete = generated_tokens >= STUB_GENERATED_TOKENS
+        return {
+            "raw_output": _format_call(call) if complete else _format_call(call)[:generated_tokens],
+            "function_call": call if complete else None,
+            "function_calls": [call] if complete else [],
+            "success": complete,
+            "prompt_tokens": len(user_input),
+            "generated_tokens": generated_tokens,
+        }
+
+    def generate_function_call(
+        self,
+        user_input: str,
+        context: Optional[dict] = None,
+        prune: Optional[bool] = None,
+        cancel_token=None,
+        max_new_tokens: Optional[int] = None,
+        **kwargs
+    ) -> dict:
+        pruned = self.route_prompts if prune is None else prune
+        prefill = self.latency_s * STUB_PREFILL_SHARE * (STUB_PRUNED_PROMPT if pruned else 1.0)
+        tokens = min(STUB_GENERATED_TOKENS, max_new_tokens or STUB_GENERATED_TOKENS)
+        decode = self.latency_s * (1 - STUB_PREFILL_SHARE) * tokens / STUB_GENERATED_TOKENS
+        _decode(prefill + decode, cancel_token)
+        result = self._result(user_input, tokens)
+        result["hit_token_limit"] = tokens < STUB_GENERATED_TOKENS
+        result["timings"] = {"template": 0.0, "prefill": prefill, "decode": decode, "parse": 0.0}
+        result["route"] = {"groups": [], "pruned": pruned, "retried": False}
+        return result
+
+    def generate_function_calls_batch(
+        self, requests: list, batch_size: int = 8, cancel_token=None, **kwargs
+    ) -> list[dict]:
+        batches = (len(requests) + batch_size - 1) // batch_size
+        _decode(batches * self.latency_s + len(requests) * self.batch_item_latency_s, cancel_token)
+        return [self._result(user_input) for user_input, *_ in requests]
+
+
+class StubSpeechToText:
+    """SpeechToText replacement: the uploaded bytes are treated as UTF-8 text."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.loaded = True
+
+    def load(self):
+        pass
+
+    def transcribe_bytes(self, audio_bytes: bytes, language: Optional[str] = None) -> dict:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return {
+            "text": audio_bytes.decode("utf-8", errors="ignore").strip(),
+            "language": language or "ko",
+            "success": True,
+        }
+
+
+def install_stubs(model_latency_s: float = 0.0, stt_latency_s: float = 0.0) -> None:
+    """Point the backend at the stubs (call before serving main.app)."""
+    import main
+
+    model = StubFunctionGemmaModel(model_latency_s)
+    stt = {size: StubSpeechToText(stt_latency_s * scale) for size, scale in STUB_STT_SCALE.items()}
+    main.get_model = lambda: model
+    main.get_stt = lambda model_size="base": stt[model_size]
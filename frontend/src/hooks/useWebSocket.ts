@@ -6,6 +6,8 @@ export interface ACState {
   temperature: number;
   mode: string;
   fan_speed: string;
+  indoor_temperature: number;
+  outdoor_temperature: number;
 }
 
 export interface TVState {
@@ -25,6 +27,8 @@ export interface VacuumState {
   power: boolean;
   status: string;
   current_zone: string | null;
+  progress: number;
+  battery: number;
 }
 
 export interface AudioState {
@@ -37,6 +41,7 @@ export interface AudioState {
 export interface CurtainState {
   position: number;
   status: string;
+  target_position: number;
 }
 
 export interface VentilationState {
@@ -67,6 +72,8 @@ const initialHomeState: HomeState = {
     temperature: 24,
     mode: 'cooling',
     fan_speed: 'auto',
+    indoor_temperature: 26,
+    outdoor_temperature: 32,
   },
   tv: {
     power: false,
@@ -83,6 +90,8 @@ const initialHomeState: HomeState = {
     power: false,
     status: 'idle',
     current_zone: null,
+    progress: 0,
+    battery: 100,
   },
   audio: {
     power: false,
@@ -93,6 +102,7 @@ const initialHomeState: HomeState = {
   curtain: {
     position: 100,
     status: 'stopped',
+    target_position: 100,
   },
   ventilation: {
     power: false,
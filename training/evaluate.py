@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""Score FunctionGemma (base model and LoRA adapters) against docs/expected_calls.jsonl.
+
+The prompt set is split into small shards and run on a process pool. Each worker
+pins itself to its own slice of the CPU cores (sched_setaffinity) and sizes the
+torch intra-op pool to that slice, loads the base model once, registers every
+adapter on it and generates each shard for every variant (base + adapters).
+
+Scores per variant:
+  - exact_match: parsed calls equal the expected calls (names, order and parameters)
+  - name_match: the function names (in order) equal the expected names
+  - parameter_accuracy: expected parameters reproduced exactly, counted over calls
+    whose function name matches at the same position
+plus per-prompt latency (p50/p90/p99/mean/max) and generated-token statistics.
+
+--score scores existing quick_infer.py JSONL outputs (e.g. docs/eval_lora.jsonl)
+without loading a model.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from function_call_parser import parse_function_calls  # noqa: E402
+
+DEFAULT_EXPECTED = PROJECT_ROOT / "docs" / "expected_calls.jsonl"
+DEFAULT_ADAPTER = PROJECT_ROOT / "training" / "output_lora"
+BASE_VARIANT = "base"
+
+# Per-process state (set by the pool initializer / first task)
+_WORKER: dict = {}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process-parallel FunctionGemma evaluation")
+    parser.add_argument("--model_id", default="google/functiongemma-270m-it")
+    parser.add_argument(
+        "--adapter",
+        action="append",
+        default=[],
+        help="name=path of a LoRA adapter to evaluate (repeatable). "
+        "Default: lora=training/output_lora when it exists",
+    )
+    parser.add_argument("--no_base", action="store_true", help="Skip the base model variant")
+    parser.add_argument("--expected", default=str(DEFAULT_EXPECTED))
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate only the first N prompts")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: cores // threads)")
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=None,
+        help="Cores pinned to each worker / torch intra-op threads (default: cores // workers)",
+    )
+    parser.add_argument("--shard_size", type=int, default=8, help="Prompts per task")
+    parser.add_argument("--max_new_tokens", type=int, default=256)
+    parser.add_argument("--dtype", default="fp32", choices=["fp32", "bf16"])
+    parser.add_argument(
+        "--score",
+        action="append",
+        default=[],
+        help="Score an existing quick_infer.py JSONL output instead of generating (repeatable)",
+    )
+    parser.add_argument("--write_outputs", default=None, help="Directory for per-variant eval_<name>.jsonl outputs")
+    parser.add_argument("--show", type=int, default=5, help="Mismatched prompts to include per variant")
+    parser.add_argument("--output_json", default=None)
+    return parser.parse_args()
+
+
+def load_expected(path: str, limit: int | None) -> list[dict]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    records = [json.loads(line) for line in lines if line.strip()]
+    return records[:limit] if limit else records
+
+
+def parse_adapters(entries: list[str]) -> dict[str, str]:
+    if not entries:
+        return {"lora": str(DEFAULT_ADAPTER)} if (DEFAULT_ADAPTER / "adapter_config.json").exists() else {}
+    adapters = {}
+    for entry in entries:
+        name, separator, path = entry.partition("=")
+        if not separator or not name or not path:
+            raise SystemExit(f"--adapter must be name=path, got {entry!r}")
+        if name == BASE_VARIANT or name in adapters:
+            raise SystemExit(f"Duplicate or reserved adapter name: {name!r}")
+        adapters[name] = path
+    return adapters
+
+
+# --- scoring ---------------------------------------------------------------
+
+
+def score_calls(predicted: list[dict], expected: list[dict]) -> dict:
+    """Exact / name / parameter agreement of one prompt's calls."""
+    names = [call["function_name"] for call in predicted]
+    expected_names = [call["function_name"] for call in expected]
+    parameters = correct = 0
+    for position, call in enumerate(expected):
+        wanted = call.get("parameters") or {}
+        parameters += len(wanted)
+        if position >= len(predicted) or predicted[position]["function_name"] != call["function_name"]:
+            continue
+        got = predicted[position].get("parameters") or {}
+        correct += sum(1 for key, value in wanted.items() if key in got and got[key] == value)
+    return {
+        "exact": predicted == expected,
+        "name": names == expected_names,
+        "parameters": parameters,
+        "parameters_correct": correct,
+    }
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records: list[dict], expected: list[dict], show: int) -> dict:
+    """Accuracy (and latency when present) of one variant's per-prompt records."""
+    by_index = {record["index"]: record for record in records}
+    exact = name = parameters = parameters_correct = 0
+    mismatches = []
+    for gold in expected:
+        record = by_index.get(gold["index"])
+        predicted = record["parsed_calls"] if record else []
+        scored = score_calls(predicted, gold["expected_calls"])
+        exact += scored["exact"]
+        name += scored["name"]
+        parameters += scored["parameters"]
+        parameters_correct += scored["parameters_correct"]
+        if not scored["exact"] and len(mismatches) < show:
+            mismatches.append({
+                "index": gold["index"],
+                "prompt": gold["prompt"],
+                "expected": gold["expected_calls"],
+                "parsed": predicted,
+            })
+
+    total = len(expected)
+    summary = {
+        "prompts": total,
+        "missing": sum(1 for gold in expected if gold["index"] not in by_index),
+        "accuracy": {
+            "exact_match": round(exact / total, 4),
+            "name_match": round(name / total, 4),
+            "parameter_accuracy": round(parameters_correct / parameters, 4) if parameters else None,
+        },
+    }
+
+    latencies = sorted(record["latency_s"] for record in records if "latency_s" in record)
+    if latencies:
+        summary["latency_ms"] = {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p90": round(percentile(latencies, 0.90) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1),
+        }
+        tokens = [record["generated_tokens"] for record in records]
+        summary["generated_tokens"] = {"mean": round(statistics.mean(tokens), 1), "max": max(tokens)}
+    summary["mismatches"] = mismatches
+    return summary
+
+
+def score_file(path: str) -> list[dict]:
+    """Per-prompt records from a quick_infer.py JSONL output (re-parsed with the current parser)."""
+    records = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            record = json.loads(line)
+            record["parsed_calls"] = parse_function_calls(record["raw_output"])
+            records.append(record)
+    return records
+
+
+# --- workers ---------------------------------------------------------------
+
+
+def core_slices(workers: int, threads: int) -> list[list[int]]:
+    """Disjoint core slices per worker (wraps around when workers * threads > cores)."""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    return [[cores[(worker * threads + offset) % len(cores)] for offset in range(threads)] for worker in range(workers)]
+
+
+def _init_worker(slots, config: dict) -> None:
+    """Pin this process to a free core slice before torch starts its thread pools."""
+    cores = slots.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    os.environ["OMP_NUM_THREADS"] = str(len(cores))
+
+    import torch
+
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+    _WORKER.update(config=config, cores=cores)
+
+
+def _load_worker_model() -> None:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoProcessor
+
+    from function_gemma import BASE_SYSTEM_PROMPT_LINES
+
+    config = _WORKER["config"]
+    started = time.perf_counter()
+    processor = AutoProcessor.from_pretrained(config["model_id"], trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        config["model_id"],
+        dtype=torch.bfloat16 if config["dtype"] == "bf16" else torch.float32,
+        device_map="cpu",
+        trust_remote_code=True,
+    )
+    adapters = config["adapters"]
+    if adapters:
+        from peft import PeftModel
+
+        for index, (name, path) in enumerate(adapters.items()):
+            if index == 0:
+                model = PeftModel.from_pretrained(model, path, adapter_name=name)
+            else:
+                model.load_adapter(path, adapter_name=name)
+    model.eval()
+
+    _WORKER.update(
+        processor=processor,
+        tokenizer=getattr(processor, "tokenizer", processor),
+        model=model,
+        system_prompt="\n".join(BASE_SYSTEM_PROMPT_LINES),
+        load_seconds=time.perf_counter() - started,
+    )
+    # One throwaway generation per variant so one-time setup is not counted as prompt latency
+    for variant in config["variants"]:
+        _generate(variant, "에어컨 켜줘", max_new_tokens=4)
+
+
+def _generate(variant: str, prompt: str, max_new_tokens: int) -> tuple[str, int]:
+    import torch
+    from contextlib import nullcontext
+
+    from home_controller import HOME_FUNCTION_SCHEMAS
+
+    model, tokenizer = _WORKER["model"], _WORKER["tokenizer"]
+    inputs = _WORKER["processor"].apply_chat_template(
+        [
+            {"role": "developer", "content": _WORKER["system_prompt"]},
+            {"role": "user", "content": prompt},
+        ],
+        tools=HOME_FUNCTION_SCHEMAS,
+        add_generation_prompt=True,
+        return_dict=True,
+        return_tensors="pt",
+    )
+    if _WORKER["config"]["adapters"]:
+        if variant == BASE_VARIANT:
+            scope = model.disable_adapter()
+        else:
+            model.set_adapter(variant)
+            scope = nullcontext()
+    else:
+        scope = nullcontext()
+
+    with torch.inference_mode(), scope:
+        output_ids = model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.eos_token_id,
+            do_sample=False,
+        )
+    generated = output_ids[0][inputs["input_ids"].shape[1]:]
+    return tokenizer.decode(generated, skip_special_tokens=False).strip(), len(generated)
+
+
+def run_shard(shard: list[dict]) -> dict:
+    """Generate one shard of prompts for every variant (runs in a pool worker)."""
+    if "model" not in _WORKER:
+        _load_worker_model()
+    config = _WORKER["config"]
+    records = []
+    for variant in config["variants"]:
+        for gold in shard:
+            started = time.perf_counter()
+            raw_output, generated_tokens = _generate(variant, gold["prompt"], config["max_new_tokens"])
+            parsed_calls = parse_function_calls(raw_output)
+            records.append({
+                "variant": variant,
+                "index": gold["index"],
+                "prompt": gold["prompt"],
+                "raw_output": raw_output,
+                "parsed_calls": parsed_calls,
+                "generated_tokens": generated_tokens,
+                "latency_s": time.perf_counter() - started,
+            })
+    return {"pid": os.getpid(), "cores": _WORKER["cores"], "load_seconds": _WORKER["load_seconds"], "records": records}
+
+
+def generate_all(args: argparse.Namespace, expected: list[dict], adapters: dict[str, str]) -> tuple[list[dict], dict]:
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    if args.workers and args.threads_per_worker:
+        workers, threads = args.workers, args.threads_per_worker
+    elif args.workers:
+        workers, threads = args.workers, max(1, available // args.workers)
+    else:
+        threads = args.threads_per_worker or min(4, available)
+        workers = max(1, available // threads)
+    workers = min(workers, max(1, math.ceil(len(expected) / args.shard_size)))
+
+    variants = ([] if args.no_base else [BASE_VARIANT]) + list(adapters)
+    if not variants:
+        raise SystemExit("Nothing to evaluate: --no_base without adapters")
+    config = {
+        "model_id": args.model_id,
+        "adapters": adapters,
+        "variants": variants,
+        "max_new_tokens": args.max_new_tokens,
+        "dtype": args.dtype,
+    }
+
+    context = mp.get_context("spawn")  # fresh interpreters: torch thread pools start after pinning
+    slots = context.Queue()
+    slices = core_slices(workers, threads)
+    for cores in slices:
+        slots.put(cores)
+    shards = [expected[start:start + args.shard_size] for start in range(0, len(expected), args.shard_size)]
+
+    started = time.perf_counter()
+    records: list[dict] = []
+    worker_info: dict[int, dict] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(slots, config)
+    ) as pool:
+        for result in pool.map(run_shard, shards):
+            records.extend(result["records"])
+            worker_info[result["pid"]] = {"cores": result["cores"], "load_s": round(result["load_seconds"], 2)}
+    elapsed = time.perf_counter() - started
+
+    run = {
+        "workers": workers,
+        "threads_per_worker": threads,
+        "core_slices": slices,
+        "shards": len(shards),
+        "wall_s": round(elapsed, 2),
+        "generations_per_s": round(len(records) / elapsed, 2),
+        "worker_processes": list(worker_info.values()),
+    }
+    return records, run
+
+
+def write_outputs(directory: str, records: list[dict], model_id: str, adapters: dict[str, str]) -> None:
+    """Per-variant JSONL in quick_infer.py's format (drop-in for docs/eval_*.jsonl)."""
+    output_dir = Path(directory)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for variant in dict.fromkeys(record["variant"] for record in records):
+        rows = sorted((record for record in records if record["variant"] == variant), key=lambda r: r["index"])
+        with (output_dir / f"eval_{variant}.jsonl").open("w", encoding="utf-8") as handle:
+            for record in rows:
+                handle.write(json.dumps({
+                    "index": record["index"],
+                    "prompt": record["prompt"],
+                    "raw_output": record["raw_output"],
+                    "parsed_calls": record["parsed_calls"],
+                    "model_id": model_id,
+                    "adapter_dir": adapters.get(variant),
+                }, ensure_ascii=False) + "\n")
+
+
+def main() -> None:
+    args = parse_args()
+    expected = load_expected(args.expected, args.limit)
+
+    if args.score:
+        report = {
+            "expected": args.expected,
+            "variants": {Path(path).stem: summarize(score_file(path), expected, args.show) for path in args.score},
+        }
+    else:
+        adapters = parse_adapters(args.adapter)
+        records, run = generate_all(args, expected, adapters)
+        if args.write_outputs:
+            write_outputs(args.write_outputs, records, args.model_id, adapters)
+        report = {
+            "expected": args.expected,
+            "model_id": args.model_id,
+            "adapters": adapters,
+            "run": run,
+            "variants": {
+                variant: summarize([record for record in records if record["variant"] == variant], expected, args.show)
+                for variant in dict.fromkeys(record["variant"] for record in records)
+            },
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output_json:
+        Path(args.output_json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,33 @@
 from __future__ import annotations
 
 import argparse
+import bisect
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
 import sys
+import time
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 import torch
-from datasets import load_dataset
+from datasets import Dataset, load_dataset, load_from_disk
 from peft import LoraConfig, get_peft_model
-from transformers import AutoModelForCausalLM, AutoProcessor, Trainer, TrainingArguments
+from torch.utils.data import IterableDataset, get_worker_info
+from transformers import (
+    AutoModelForCausalLM,
+    AutoProcessor,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 BACKEND_DIR = PROJECT_ROOT / "backend"
@@ -18,15 +36,44 @@ sys.path.append(str(BACKEND_DIR))
 
 from home_controller import HOME_FUNCTION_SCHEMAS  # noqa: E402
 
+# Bump when the tokenized sample format changes so stale caches are not reused.
+TOKENIZE_CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "tokenized"
+DATA_STATE_FILE = "data_state.json"
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="FunctionGemma LoRA fine-tuning")
     parser.add_argument("--model_id", default="google/functiongemma-270m-it")
-    parser.add_argument("--train_file", required=True)
+    parser.add_argument(
+        "--train_file",
+        required=True,
+        help="JSONL file, or comma-separated files/globs/directories of JSONL shards",
+    )
     parser.add_argument("--eval_file", default=None)
     parser.add_argument("--output_dir", required=True)
     parser.add_argument("--max_seq_length", type=int, default=1024)
+    parser.add_argument(
+        "--num_proc",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Tokenization worker processes",
+    )
+    parser.add_argument(
+        "--tokenize_cache_dir",
+        default=str(DEFAULT_CACHE_DIR),
+        help="Tokenized dataset cache directory (empty string disables the cache)",
+    )
     parser.add_argument("--num_train_epochs", type=int, default=3)
+    parser.add_argument("--max_steps", type=int, default=-1, help="Overrides --num_train_epochs when > 0")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream the training shards instead of loading them (tokenized on the fly)",
+    )
+    parser.add_argument("--shuffle_buffer", type=int, default=10000, help="Streaming shuffle buffer size (lines)")
+    parser.add_argument("--dataloader_num_workers", type=int, default=0)
+    parser.add_argument("--resume_from_checkpoint", default=None, help="Checkpoint directory to resume from")
     parser.add_argument("--per_device_train_batch_size", type=int, default=2)
     parser.add_argument("--per_device_eval_batch_size", type=int, default=2)
     parser.add_argument("--gradient_accumulation_steps", type=int, default=8)
@@ -36,8 +83,37 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--save_total_limit", type=int, default=2)
     parser.add_argument("--seed", type=int, default=42)
     parser.add_argument("--gradient_checkpointing", action="store_true")
+    parser.add_argument(
+        "--packing",
+        action="store_true",
+        help="Pack several samples into each max_seq_length row (block-diagonal attention)",
+    )
+    parser.add_argument(
+        "--check_packing",
+        action="store_true",
+        help="With --packing, check before training that a few packed rows give the same loss as unpacked",
+    )
+    parser.add_argument(
+        "--group_by_length",
+        action="store_true",
+        help="Batch rows of similar length together to reduce padding",
+    )
     parser.add_argument("--bf16", action="store_true")
     parser.add_argument("--fp16", action="store_true")
+    parser.add_argument(
+        "--cpu_performance",
+        action="store_true",
+        help="CPU/APU profile: bf16 autocast if the CPU supports it, one intra-op thread per available core",
+    )
+    parser.add_argument("--torch_compile", action="store_true", help="torch.compile the PEFT model")
+    parser.add_argument("--intra_op_threads", type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument("--inter_op_threads", type=int, default=None, help="torch.set_num_interop_threads")
+    parser.add_argument(
+        "--benchmark_steps",
+        type=int,
+        default=0,
+        help="Run N optimizer steps, print samples/s, tokens/s and peak RSS, and save nothing",
+    )
     parser.add_argument("--lora_r", type=int, default=16)
     parser.add_argument("--lora_alpha", type=int, default=32)
     parser.add_argument("--lora_dropout", type=float, default=0.05)
@@ -57,6 +133,41 @@ def _select_dtype(args: argparse.Namespace) -> torch.dtype:
     return torch.float32
 
 
+def _cpu_supports_bf16() -> bool:
+    """True if the CPU has native bf16 instructions (AVX512-BF16/AMX on x86, BF16 on Arm)."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as handle:
+            cpuinfo = handle.read()
+    except OSError:
+        return False
+    for line in cpuinfo.splitlines():
+        if line.startswith(("flags", "Features")):
+            flags = set(line.split(":", 1)[-1].split())
+            return bool(flags & {"avx512_bf16", "amx_bf16", "bf16"})
+    return False
+
+
+def _configure_threads(args: argparse.Namespace) -> None:
+    """Apply intra-/inter-op thread counts (must run before any parallel torch work)."""
+    intra = args.intra_op_threads
+    if intra is None and args.cpu_performance:
+        intra = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    if intra:
+        torch.set_num_threads(intra)
+    if args.inter_op_threads:
+        torch.set_num_interop_threads(args.inter_op_threads)
+    print(
+        f"[threads] intra_op={torch.get_num_threads()} inter_op={torch.get_num_interop_threads()}",
+        flush=True,
+    )
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 def _truncate(example: Dict[str, List[int]], max_len: int) -> Dict[str, List[int]]:
     if max_len <= 0:
         return example
@@ -69,54 +180,521 @@ def _truncate(example: Dict[str, List[int]], max_len: int) -> Dict[str, List[int
     }
 
 
-def _build_sample(
-    processor: AutoProcessor,
-    messages: List[Dict[str, str]],
-    max_len: int,
-) -> Dict[str, List[int]]:
-    if not messages or messages[-1].get("role") != "assistant":
-        raise ValueError("Each sample must end with an assistant tool-call message.")
-
-    prompt_messages = messages[:-1]
-
-    prompt_inputs = processor.apply_chat_template(
-        prompt_messages,
-        tools=HOME_FUNCTION_SCHEMAS,
-        add_generation_prompt=True,
-        return_dict=True,
-        return_tensors="pt",
-    )
-    full_inputs = processor.apply_chat_template(
-        messages,
-        tools=HOME_FUNCTION_SCHEMAS,
-        add_generation_prompt=False,
-        return_dict=True,
-        return_tensors="pt",
-    )
-
-    input_ids = full_inputs["input_ids"][0]
-    attention_mask = full_inputs.get("attention_mask")
-    if attention_mask is None:
-        attention_mask = torch.ones_like(input_ids)
-    else:
-        attention_mask = attention_mask[0]
+class SampleTokenizer:
+    """Tokenizes chat samples, reusing the tokens of the shared tools/system prefix.
+
+    Every sample renders the same tool declarations and developer prompt, which
+    make up most of its tokens. Those are tokenized once; per sample only the
+    remaining text is tokenized, and the completion is tokenized on its own
+    instead of re-tokenizing the whole conversation.
+
+    Text is only split right before or after a special token, where the
+    tokenizer splits anyway, so the result is identical to tokenizing the full
+    rendered conversation. The prefix is verified against a full tokenization
+    once and dropped if it does not match.
+    """
+
+    def __init__(
+        self,
+        processor: AutoProcessor,
+        reference_messages: List[Dict[str, str]],
+        max_len: int,
+        tools: List[Dict[str, Any]] = HOME_FUNCTION_SCHEMAS,
+    ) -> None:
+        self.processor = processor
+        self.tokenizer = getattr(processor, "tokenizer", processor)
+        self.tools = tools
+        self.max_len = max_len
+        special = set(self.tokenizer.all_special_tokens)
+        special.update(getattr(self.tokenizer, "added_tokens_encoder", {}).keys())
+        self.special_tokens = tuple(sorted((t for t in special if t), key=len, reverse=True))
+        self.prefix_text = ""
+        self.prefix_ids: List[int] = []
+        self._init_prefix(reference_messages)
+
+    def _render(self, messages: List[Dict[str, str]], add_generation_prompt: bool) -> str:
+        return self.processor.apply_chat_template(
+            messages,
+            tools=self.tools,
+            add_generation_prompt=add_generation_prompt,
+            tokenize=False,
+        )
 
-    labels = input_ids.clone()
-    prompt_len = prompt_inputs["input_ids"].shape[1]
-    labels[:prompt_len] = -100
+    def _encode_plain(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _is_boundary(self, text: str, index: int) -> bool:
+        """True if the tokenizer splits at `index` anyway (next to a special token)."""
+        if index <= 0 or index >= len(text):
+            return True
+        return text.startswith(self.special_tokens, index) or text[:index].endswith(self.special_tokens)
+
+    def _init_prefix(self, reference_messages: List[Dict[str, str]]) -> None:
+        prompt_messages = reference_messages[:-1]
+        if not prompt_messages:
+            return
+        probes = []
+        for content in ("A", "B"):
+            probe = [dict(message) for message in prompt_messages]
+            probe[-1]["content"] = content
+            probes.append(self._render(probe, add_generation_prompt=True))
+        common = os.path.commonprefix(probes)
+
+        # Cut back to the end of the last special token inside the shared part.
+        cut = 0
+        for token in self.special_tokens:
+            position = common.rfind(token)
+            if position != -1:
+                cut = max(cut, position + len(token))
+        if cut == 0:
+            return
+
+        prefix_text = common[:cut]
+        prefix_ids = self._encode_plain(prefix_text)
+        reference = self._render(prompt_messages, add_generation_prompt=True)
+        if not reference.startswith(prefix_text):
+            return
+        if prefix_ids + self._encode_plain(reference[cut:]) != self._encode_plain(reference):
+            return
+        self.prefix_text = prefix_text
+        self.prefix_ids = prefix_ids
+
+    def _encode(self, text: str) -> List[int]:
+        if self.prefix_text and text.startswith(self.prefix_text):
+            return self.prefix_ids + self._encode_plain(text[len(self.prefix_text):])
+        return self._encode_plain(text)
+
+    def __call__(self, example: Dict[str, Any]) -> Dict[str, List[int]]:
+        messages = example.get("messages")
+        if not isinstance(messages, list):
+            raise ValueError("Each sample must contain a 'messages' list.")
+        if not messages or messages[-1].get("role") != "assistant":
+            raise ValueError("Each sample must end with an assistant tool-call message.")
+
+        prompt_text = self._render(messages[:-1], add_generation_prompt=True)
+        full_text = self._render(messages, add_generation_prompt=False)
+
+        prompt_ids = self._encode(prompt_text)
+        split = len(prompt_text)
+        if full_text.startswith(prompt_text) and self._is_boundary(full_text, split):
+            input_ids = prompt_ids + self._encode_plain(full_text[split:])
+        else:
+            input_ids = self._encode(full_text)
+
+        prompt_len = min(len(prompt_ids), len(input_ids))
+        example = {
+            "input_ids": input_ids,
+            "attention_mask": [1] * len(input_ids),
+            "labels": [-100] * prompt_len + input_ids[prompt_len:],
+        }
+        example = _truncate(example, self.max_len)
+        example["length"] = len(example["input_ids"])
+        return example
 
-    example = {
-        "input_ids": input_ids.tolist(),
-        "attention_mask": attention_mask.tolist(),
-        "labels": labels.tolist(),
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_shards(spec: str) -> List[str]:
+    """Expand a comma-separated list of files, globs and directories into sorted JSONL paths."""
+    shards: List[str] = []
+    for part in (item.strip() for item in spec.split(",")):
+        if not part:
+            continue
+        if os.path.isdir(part):
+            shards.extend(sorted(glob.glob(os.path.join(part, "*.jsonl"))))
+        elif glob.has_magic(part):
+            shards.extend(sorted(glob.glob(part)))
+        else:
+            shards.append(part)
+    if not shards:
+        raise ValueError(f"No JSONL files match {spec!r}")
+    missing = [shard for shard in shards if not os.path.isfile(shard)]
+    if missing:
+        raise FileNotFoundError(f"Missing data files: {missing}")
+    return shards
+
+
+def _count_lines(shards: List[str]) -> int:
+    total = 0
+    for shard in shards:
+        with open(shard, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1 << 20), b""):
+                total += chunk.count(b"\n")
+    return total
+
+
+def _cache_key(data_files: List[str], processor: AutoProcessor, model_id: str, max_len: int) -> str:
+    """Hash of everything that changes the tokenized output."""
+    tokenizer = getattr(processor, "tokenizer", processor)
+    template = getattr(processor, "chat_template", None) or getattr(tokenizer, "chat_template", None)
+    payload = {
+        "version": TOKENIZE_CACHE_VERSION,
+        "data": [_hash_file(path) for path in data_files],
+        "schemas": HOME_FUNCTION_SCHEMAS,
+        "template": template,
+        "tokenizer": [model_id, type(tokenizer).__name__, len(tokenizer)],
+        "max_len": max_len,
     }
-    return _truncate(example, max_len)
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:24]
+
+
+def load_tokenized(
+    data_spec: str,
+    processor: AutoProcessor,
+    args: argparse.Namespace,
+    cache_dir: Optional[str],
+) -> Dataset:
+    """Tokenize JSONL file(s) with worker processes, reusing an on-disk cache when possible."""
+    data_files = resolve_shards(data_spec)
+    cache_path = None
+    if cache_dir:
+        key = _cache_key(data_files, processor, args.model_id, args.max_seq_length)
+        cache_path = Path(cache_dir) / f"{Path(data_files[0]).stem}-{key}"
+        if cache_path.is_dir():
+            print(f"[tokenize] cache hit: {cache_path}", flush=True)
+            return load_from_disk(str(cache_path))
+
+    dataset = load_dataset("json", data_files=data_files)["train"]
+    if len(dataset) == 0:
+        raise ValueError(f"No samples in {data_spec}")
+    sample_tokenizer = SampleTokenizer(processor, dataset[0]["messages"], args.max_seq_length)
+    print(
+        f"[tokenize] {data_spec}: {len(dataset)} samples, num_proc={args.num_proc}, "
+        f"shared prefix={len(sample_tokenizer.prefix_ids)} tokens",
+        flush=True,
+    )
+    dataset = dataset.map(
+        sample_tokenizer,
+        remove_columns=dataset.column_names,
+        num_proc=max(1, min(args.num_proc, len(dataset))),
+        desc="Tokenizing",
+    )
+
+    if cache_path is not None:
+        # Write to a temporary directory first so an interrupted run never leaves a partial cache.
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        dataset.save_to_disk(str(tmp_path))
+        tmp_path.rename(cache_path)
+        print(f"[tokenize] cached: {cache_path}", flush=True)
+        dataset = load_from_disk(str(cache_path))
+    return dataset
+
+
+class StreamingJsonlDataset(IterableDataset):
+    """JSONL shards streamed line by line, shuffled through a buffer and tokenized on the fly.
+
+    The sample order is a pure function of (shards, seed, shuffle_buffer): every
+    epoch shuffles the shard order and the buffer with a generator seeded by
+    (seed, epoch), and epochs follow each other without end (the Trainer stops
+    at max_steps). Dataloader workers all read the same line stream but each
+    parses and tokenizes only the batches it serves, assigned round-robin in
+    the order the DataLoader collects them, so the batches arrive in stream
+    order for any number of workers.
+
+    Resuming skips `start_offset` lines of that stream before anything is
+    parsed, which reproduces the exact remaining order of the interrupted run.
+    """
+
+    def __init__(
+        self,
+        shards: List[str],
+        sample_tokenizer: SampleTokenizer,
+        batch_size: int,
+        seed: int,
+        shuffle_buffer: int,
+        start_offset: int = 0,
+    ) -> None:
+        self.shards = shards
+        self.sample_tokenizer = sample_tokenizer
+        self.batch_size = batch_size
+        self.seed = seed
+        self.shuffle_buffer = shuffle_buffer
+        self.start_offset = start_offset
+
+    def state(self, samples_seen: int) -> Dict[str, Any]:
+        return {
+            "samples_seen": samples_seen,
+            "shards": self.shards,
+            "seed": self.seed,
+            "shuffle_buffer": self.shuffle_buffer,
+        }
+
+    def _epoch_lines(self, epoch: int) -> Iterator[str]:
+        rng = random.Random(f"{self.seed}-{epoch}")
+        shards = list(self.shards)
+        rng.shuffle(shards)
+        buffer: List[str] = []
+        for shard in shards:
+            with open(shard, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    if self.shuffle_buffer <= 1:
+                        yield line
+                    elif len(buffer) < self.shuffle_buffer:
+                        buffer.append(line)
+                    else:
+                        index = rng.randrange(len(buffer))
+                        yield buffer[index]
+                        buffer[index] = line
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _stream(self) -> Iterator[str]:
+        epoch = 0
+        while True:
+            produced = False
+            for line in self._epoch_lines(epoch):
+                produced = True
+                yield line
+            if not produced:
+                raise ValueError(f"No samples in {self.shards}")
+            epoch += 1
+
+    def __iter__(self) -> Iterator[Dict[str, List[int]]]:
+        worker = get_worker_info()
+        num_workers = worker.num_workers if worker is not None else 1
+        worker_id = worker.id if worker is not None else 0
+        for position, line in enumerate(islice(self._stream(), self.start_offset, None)):
+            if (position // self.batch_size) % num_workers != worker_id:
+                continue
+            yield self.sample_tokenizer(json.loads(line))
+
+
+def _first_messages(shards: List[str]) -> List[Dict[str, str]]:
+    for shard in shards:
+        with open(shard, encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    return json.loads(line)["messages"]
+    raise ValueError(f"No samples in {shards}")
+
+
+def load_streaming(
+    processor: AutoProcessor,
+    args: argparse.Namespace,
+) -> tuple[StreamingJsonlDataset, int]:
+    """Streaming training set and the number of optimizer steps to run."""
+    shards = resolve_shards(args.train_file)
+    sample_tokenizer = SampleTokenizer(processor, _first_messages(shards), args.max_seq_length)
+    dataset = StreamingJsonlDataset(
+        shards,
+        sample_tokenizer,
+        batch_size=args.per_device_train_batch_size,
+        seed=args.seed,
+        shuffle_buffer=args.shuffle_buffer,
+    )
+    max_steps = args.max_steps
+    if max_steps <= 0:
+        samples = _count_lines(shards) * args.num_train_epochs
+        max_steps = max(1, -(-samples // (args.per_device_train_batch_size * args.gradient_accumulation_steps)))
+    print(
+        f"[streaming] {len(shards)} shard(s), shuffle_buffer={args.shuffle_buffer}, max_steps={max_steps}",
+        flush=True,
+    )
+    return dataset, max_steps
+
+
+def read_data_offset(checkpoint: str, expected: Dict[str, Any], samples_per_step: int) -> int:
+    """Stream position saved with a checkpoint (falls back to global_step * samples per step)."""
+    state_path = Path(checkpoint) / DATA_STATE_FILE
+    if state_path.is_file():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        for key in ("shards", "seed", "shuffle_buffer"):
+            if state.get(key) != expected[key]:
+                raise ValueError(
+                    f"{state_path}: {key}={state.get(key)!r} does not match this run ({expected[key]!r}); "
+                    "the data order cannot be reproduced."
+                )
+        return int(state["samples_seen"])
+    trainer_state = json.loads((Path(checkpoint) / "trainer_state.json").read_text(encoding="utf-8"))
+    return int(trainer_state["global_step"]) * samples_per_step
+
+
+class DataStateCallback(TrainerCallback):
+    """Writes the streaming position (data_state.json) into every checkpoint."""
+
+    def __init__(self, dataset: StreamingJsonlDataset, samples_per_step: int) -> None:
+        self.dataset = dataset
+        self.samples_per_step = samples_per_step
+
+    def on_save(self, args, state, control, **kwargs):
+        checkpoint = Path(args.output_dir) / f"checkpoint-{state.global_step}"
+        if not checkpoint.is_dir() or not state.is_world_process_zero:
+            return
+        data_state = self.dataset.state(state.global_step * self.samples_per_step)
+        (checkpoint / DATA_STATE_FILE).write_text(json.dumps(data_state, ensure_ascii=False), encoding="utf-8")
+
+
+def pack_dataset(dataset: Dataset, pack_length: int) -> Dataset:
+    """Pack tokenized samples into rows of at most pack_length tokens (best-fit decreasing).
+
+    Each row keeps the lengths of its samples in `seq_lens` so the collator can
+    restart position ids and block attention at every sample boundary. The
+    first token of every sample is excluded from the loss so no sample is
+    trained to predict the next one.
+    """
+    if pack_length <= 0:
+        raise ValueError("--packing requires a positive --max_seq_length.")
+    input_ids = dataset["input_ids"]
+    labels = dataset["labels"]
+    lengths = [len(ids) for ids in input_ids]
+
+    bins: List[List[int]] = []
+    free: List[tuple[int, int]] = []  # sorted (remaining space, bin index)
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True):
+        slot = bisect.bisect_left(free, (lengths[index], -1))
+        if slot == len(free):
+            bins.append([index])
+            remaining, bin_index = pack_length - lengths[index], len(bins) - 1
+        else:
+            remaining, bin_index = free.pop(slot)
+            bins[bin_index].append(index)
+            remaining -= lengths[index]
+        if remaining > 0:
+            bisect.insort(free, (remaining, bin_index))
+
+    rows: Dict[str, List[Any]] = {"input_ids": [], "labels": [], "seq_lens": [], "length": []}
+    for members in bins:
+        row_ids: List[int] = []
+        row_labels: List[int] = []
+        for index in members:
+            row_ids.extend(input_ids[index])
+            row_labels.append(-100)
+            row_labels.extend(labels[index][1:])
+        rows["input_ids"].append(row_ids)
+        rows["labels"].append(row_labels)
+        rows["seq_lens"].append([lengths[index] for index in members])
+        rows["length"].append(len(row_ids))
+
+    total = sum(lengths)
+    print(
+        f"[packing] {len(lengths)} samples -> {len(bins)} rows of <= {pack_length} tokens, "
+        f"fill={total / (len(bins) * pack_length):.1%}",
+        flush=True,
+    )
+    return Dataset.from_dict(rows)
+
+
+class TokenStats:
+    """Real (non-pad) and total token slots collated since the last read, plus running totals.
+
+    Counters live in shared memory so batches collated in (forked) dataloader
+    workers are counted too.
+    """
+
+    def __init__(self) -> None:
+        # real, total, seen_samples, seen_real
+        self._counts = multiprocessing.Array("q", 4)
+
+    @property
+    def seen_samples(self) -> int:
+        return self._counts[2]
+
+    @property
+    def seen_real(self) -> int:
+        return self._counts[3]
+
+    def add(self, real: int, total: int, samples: int) -> None:
+        with self._counts.get_lock():
+            self._counts[0] += real
+            self._counts[1] += total
+            self._counts[2] += samples
+            self._counts[3] += real
+
+    def take(self) -> tuple[int, int]:
+        with self._counts.get_lock():
+            counts = (self._counts[0], self._counts[1])
+            self._counts[0] = self._counts[1] = 0
+        return counts
+
+
+class TokenThroughputCallback(TrainerCallback):
+    """Adds tokens_per_s (non-pad tokens) and pad_ratio to every training log line.
+
+    Counts come from the collators (including dataloader workers), so batches
+    prefetched by workers are counted slightly early. Batches collated for
+    evaluation are discarded when evaluation ends.
+    """
+
+    def __init__(self, stats: TokenStats) -> None:
+        self.stats = stats
+        self._since = time.perf_counter()
+
+    def _reset(self) -> None:
+        self.stats.take()
+        self._since = time.perf_counter()
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._reset()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._reset()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs is None or "loss" not in logs:
+            return
+        now = time.perf_counter()
+        real, total = self.stats.take()
+        elapsed = max(now - self._since, 1e-9)
+        self._since = now
+        logs["tokens_per_s"] = round(real / elapsed, 1)
+        logs["pad_ratio"] = round(1 - real / total, 4) if total else 0.0
+
+
+class BenchmarkCallback(TrainerCallback):
+    """Throughput for --benchmark_steps; the first step (warm-up/compilation) is reported separately."""
+
+    def __init__(self, stats: TokenStats) -> None:
+        self.stats = stats
+        self._start = self._warm = 0.0
+        self._warm_counts = (0, 0)
+        self.report: Dict[str, Any] = {}
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if state.global_step == 1:
+            self._warm = time.perf_counter()
+            self._warm_counts = (self.stats.seen_samples, self.stats.seen_real)
+
+    def on_train_end(self, args, state, control, **kwargs):
+        end = time.perf_counter()
+        steps = state.global_step
+        if steps > 1:
+            elapsed = end - self._warm
+            samples = self.stats.seen_samples - self._warm_counts[0]
+            tokens = self.stats.seen_real - self._warm_counts[1]
+            measured = steps - 1
+        else:
+            elapsed = end - self._start
+            samples, tokens, measured = self.stats.seen_samples, self.stats.seen_real, steps
+        elapsed = max(elapsed, 1e-9)
+        self.report = {
+            "steps": steps,
+            "measured_steps": measured,
+            "first_step_s": round((self._warm or end) - self._start, 3),
+            "step_s": round(elapsed / max(measured, 1), 4),
+            "samples_per_s": round(samples / elapsed, 2),
+            "tokens_per_s": round(tokens / elapsed, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
 
 
 @dataclass
 class CausalLMDataCollator:
     tokenizer: Any
     pad_to_multiple_of: int | None = 8
+    stats: Optional[TokenStats] = None
 
     def __call__(self, features: List[Dict[str, List[int]]]) -> Dict[str, torch.Tensor]:
         input_ids = [f["input_ids"] for f in features]
@@ -138,18 +716,174 @@ class CausalLMDataCollator:
 
         labels_batch[labels_batch == self.tokenizer.pad_token_id] = -100
         batch["labels"] = labels_batch
+        if self.stats is not None:
+            self.stats.add(int(batch["attention_mask"].sum()), batch["attention_mask"].numel(), len(features))
         return batch
 
 
+@dataclass
+class PackedDataCollator:
+    """Collates packed rows with per-sample position ids and a block-diagonal causal mask.
+
+    The 4D mask is additive (0 = attend, dtype min = blocked) as eager/sdpa
+    attention expect. A precomputed 4D mask is used as-is by every layer, so
+    for models with sliding-window layers (Gemma 3) the collator returns one
+    mask per layer type, the sliding one also limited to `sliding_window`
+    tokens. flash_attention_2 derives the sample boundaries from position_ids
+    and applies the window itself, so no mask is built for it.
+    """
+
+    pad_token_id: int
+    mask_dtype: torch.dtype = torch.float32
+    use_4d_mask: bool = True
+    sliding_window: int | None = None
+    pad_to_multiple_of: int | None = 8
+    stats: Optional[TokenStats] = None
+
+    def __call__(self, features: List[Dict[str, List[int]]]) -> Dict[str, torch.Tensor]:
+        width = max(len(f["input_ids"]) for f in features)
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        batch_size = len(features)
+
+        input_ids = torch.full((batch_size, width), self.pad_token_id, dtype=torch.long)
+        labels = torch.full((batch_size, width), -100, dtype=torch.long)
+        position_ids = torch.zeros((batch_size, width), dtype=torch.long)
+        allowed = torch.zeros((batch_size, 1, width, width), dtype=torch.bool)
+        causal = torch.ones((width, width), dtype=torch.bool).tril()
+        real = samples = 0
+        for row, feature in enumerate(features):
+            length = len(feature["input_ids"])
+            input_ids[row, :length] = torch.tensor(feature["input_ids"], dtype=torch.long)
+            labels[row, :length] = torch.tensor(feature["labels"], dtype=torch.long)
+            start = 0
+            for seq_len in feature["seq_lens"]:
+                end = start + seq_len
+                position_ids[row, start:end] = torch.arange(seq_len)
+                allowed[row, 0, start:end, start:end] = causal[:seq_len, :seq_len]
+                start = end
+            # Padding attends only to itself so no softmax row is fully masked.
+            padding = torch.arange(length, width)
+            allowed[row, 0, padding, padding] = True
+            real += length
+            samples += len(feature["seq_lens"])
+
+        batch = {"input_ids": input_ids, "labels": labels, "position_ids": position_ids}
+        if self.use_4d_mask:
+            batch["attention_mask"] = self._additive(allowed)
+            if self.sliding_window is not None:
+                index = torch.arange(width)
+                window = (index[:, None] - index[None, :]) < self.sliding_window
+                batch["attention_mask"] = {
+                    "full_attention": batch["attention_mask"],
+                    "sliding_attention": self._additive(allowed & window),
+                }
+        if self.stats is not None:
+            self.stats.add(real, batch_size * width, samples)
+        return batch
+
+    def _additive(self, allowed: torch.Tensor) -> torch.Tensor:
+        mask = torch.zeros(allowed.shape, dtype=self.mask_dtype)
+        return mask.masked_fill_(~allowed, torch.finfo(self.mask_dtype).min)
+
+
+def _sliding_window(config: Any) -> int | None:
+    """Window of the model's sliding-attention layers, or None if every layer attends globally."""
+    config = config.get_text_config()
+    if "sliding_attention" not in (getattr(config, "layer_types", None) or ()):
+        return None
+    return getattr(config, "sliding_window", None)
+
+
+def check_packed_loss(
+    model: Any,
+    packed_dataset: Dataset,
+    packed_collator: PackedDataCollator,
+    collator: CausalLMDataCollator,
+    rows: int = 4,
+) -> tuple[float, float]:
+    """Compare the loss of the first packed rows with the loss of the same samples collated one per row.
+
+    Both losses average over the same label tokens, so they must match up to
+    float error; a mismatch means packed samples see each other or the mask
+    differs from what the model uses unpacked (e.g. a missing sliding window).
+    """
+    features = [packed_dataset[index] for index in range(min(rows, len(packed_dataset)))]
+    samples = []
+    for feature in features:
+        start = 0
+        for seq_len in feature["seq_lens"]:
+            end = start + seq_len
+            samples.append({
+                "input_ids": feature["input_ids"][start:end],
+                "attention_mask": [1] * seq_len,
+                "labels": feature["labels"][start:end],
+            })
+            start = end
+
+    device = next(model.parameters()).device
+
+    def loss(batch: Dict[str, Any]) -> float:
+        def to_device(value: Any) -> Any:
+            if isinstance(value, dict):
+                return {key: to_device(item) for key, item in value.items()}
+            return value.to(device)
+
+        with torch.no_grad():
+            return float(model(**to_device(batch)).loss)
+
+    stats = (packed_collator.stats, collator.stats)
+    packed_collator.stats = collator.stats = None
+    training = model.training
+    model.eval()
+    try:
+        packed, unpacked = loss(packed_collator(features)), loss(collator(samples))
+    finally:
+        model.train(training)
+        packed_collator.stats, collator.stats = stats
+
+    tolerance = 1e-3 if packed_collator.mask_dtype == torch.float32 else 2e-2
+    print(f"[packing] check on {len(samples)} samples: packed loss={packed:.6f} unpacked loss={unpacked:.6f}", flush=True)
+    if abs(packed - unpacked) > tolerance * max(1.0, abs(unpacked)):
+        raise RuntimeError(
+            f"Packed loss {packed:.6f} differs from unpacked loss {unpacked:.6f}; the packing mask does not match the model."
+        )
+    return packed, unpacked
+
+
 def main() -> None:
     args = parse_args()
     torch.manual_seed(args.seed)
+    _configure_threads(args)
 
     processor = AutoProcessor.from_pretrained(args.model_id, trust_remote_code=True)
     tokenizer = getattr(processor, "tokenizer", processor)
     if tokenizer.pad_token_id is None:
         tokenizer.pad_token_id = tokenizer.eos_token_id
 
+    if args.streaming and (args.packing or args.group_by_length):
+        raise ValueError("--streaming cannot be combined with --packing or --group_by_length.")
+    if args.check_packing and not args.packing:
+        raise ValueError("--check_packing requires --packing.")
+    world_size = int(os.environ.get("WORLD_SIZE", "1"))
+    samples_per_step = args.per_device_train_batch_size * args.gradient_accumulation_steps * world_size
+
+    max_steps = args.max_steps
+    if args.streaming:
+        dataset, max_steps = load_streaming(processor, args)
+        if args.resume_from_checkpoint:
+            dataset.start_offset = read_data_offset(
+                args.resume_from_checkpoint, dataset.state(0), samples_per_step
+            )
+            print(f"[streaming] resuming at sample {dataset.start_offset}", flush=True)
+    else:
+        # Tokenize before the model is loaded so worker processes are not forked from a CUDA-initialized parent.
+        dataset = load_tokenized(args.train_file, processor, args, args.tokenize_cache_dir)
+
+    eval_dataset = None
+    if args.eval_file:
+        eval_dataset = load_tokenized(args.eval_file, processor, args, args.tokenize_cache_dir)
+
     dtype = _select_dtype(args)
     model = AutoModelForCausalLM.from_pretrained(
         args.model_id,
@@ -181,22 +915,32 @@ def main() -> None:
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model.to(device)
 
-    dataset = load_dataset("json", data_files=args.train_file)["train"]
-
-    def tokenize_fn(example: Dict[str, List[Dict[str, str]]]) -> Dict[str, List[int]]:
-        messages = example.get("messages")
-        if not isinstance(messages, list):
-            raise ValueError("Each sample must contain a 'messages' list.")
-        return _build_sample(processor, messages, args.max_seq_length)
-
-    dataset = dataset.map(tokenize_fn, remove_columns=dataset.column_names)
-
-    eval_dataset = None
-    if args.eval_file:
-        eval_dataset = load_dataset("json", data_files=args.eval_file)["train"]
-        eval_dataset = eval_dataset.map(tokenize_fn, remove_columns=eval_dataset.column_names)
-
-    data_collator = CausalLMDataCollator(tokenizer=tokenizer)
+    # CPU profile: keep fp32 master weights and let the Trainer autocast to bf16.
+    use_bf16 = args.bf16
+    if args.cpu_performance and device == "cpu" and not args.fp16:
+        use_bf16 = use_bf16 or _cpu_supports_bf16()
+        print(f"[cpu] bf16 autocast={'on' if use_bf16 else 'off (no CPU bf16 support)'}", flush=True)
+
+    benchmark = args.benchmark_steps > 0
+    if benchmark:
+        eval_dataset = None
+
+    token_stats = TokenStats()
+    if args.packing:
+        dataset = pack_dataset(dataset, args.max_seq_length)
+        if eval_dataset is not None:
+            eval_dataset = pack_dataset(eval_dataset, args.max_seq_length)
+        data_collator = PackedDataCollator(
+            pad_token_id=tokenizer.pad_token_id,
+            mask_dtype=dtype,
+            use_4d_mask=args.attn_implementation != "flash_attention_2",
+            sliding_window=_sliding_window(model.config),
+            stats=token_stats,
+        )
+        if args.check_packing:
+            check_packed_loss(model, dataset, data_collator, CausalLMDataCollator(tokenizer=tokenizer))
+    else:
+        data_collator = CausalLMDataCollator(tokenizer=tokenizer, stats=token_stats)
 
     training_args = TrainingArguments(
         output_dir=args.output_dir,
@@ -205,26 +949,58 @@ def main() -> None:
         gradient_accumulation_steps=args.gradient_accumulation_steps,
         learning_rate=args.learning_rate,
         num_train_epochs=args.num_train_epochs,
+        max_steps=args.benchmark_steps if benchmark else max_steps,
         logging_steps=args.logging_steps,
+        save_strategy="no" if benchmark else "steps",
         save_steps=args.save_steps,
         save_total_limit=args.save_total_limit,
         eval_strategy="steps" if eval_dataset is not None else "no",
         eval_steps=args.save_steps if eval_dataset is not None else None,
         fp16=args.fp16,
-        bf16=args.bf16,
+        bf16=use_bf16,
+        use_cpu=device == "cpu",
+        dataloader_pin_memory=device == "cuda",
+        dataloader_num_workers=args.dataloader_num_workers,
+        # The streaming dataset skips to the saved position itself.
+        ignore_data_skip=args.streaming,
+        torch_compile=args.torch_compile,
         seed=args.seed,
+        group_by_length=args.group_by_length,
+        length_column_name="length",
+        # Keep `length` for the sampler and `seq_lens` for the packed collator.
+        remove_unused_columns=False,
         report_to=[],
     )
 
+    callbacks: List[TrainerCallback] = [TokenThroughputCallback(token_stats)]
+    benchmark_callback = BenchmarkCallback(token_stats)
+    if benchmark:
+        callbacks.append(benchmark_callback)
+    if args.streaming:
+        callbacks.append(DataStateCallback(dataset, samples_per_step))
+
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=dataset,
         eval_dataset=eval_dataset,
         data_collator=data_collator,
+        callbacks=callbacks,
     )
 
-    trainer.train()
+    trainer.train(resume_from_checkpoint=args.resume_from_checkpoint)
+    if benchmark:
+        report = {
+            **benchmark_callback.report,
+            "device": device,
+            "bf16": use_bf16,
+            "torch_compile": args.torch_compile,
+            "threads": [torch.get_num_threads(), torch.get_num_interop_threads()],
+            "packing": args.packing,
+            "batch": [args.per_device_train_batch_size, args.gradient_accumulation_steps],
+        }
+        print(json.dumps(report), flush=True)
+        return
     model.save_pretrained(args.output_dir)
 
 
@@ -4,10 +4,10 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import re
 import sys
+import time
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 
 import torch
 from peft import PeftModel
@@ -19,6 +19,7 @@ sys.path.append(str(BACKEND_DIR))
 
 from home_controller import HOME_FUNCTION_SCHEMAS  # noqa: E402
 from function_gemma import BASE_SYSTEM_PROMPT_LINES  # noqa: E402
+from function_call_parser import parse_function_calls  # noqa: E402
 
 DEFAULT_PROMPTS = [
     "로봇 청소기 끄고 환풍기 켜",
@@ -29,12 +30,6 @@ DEFAULT_PROMPTS = [
     "TV 켜고 에어컨 26도, 조명 50%, 커튼 닫아줘",
 ]
 
-CALL_BLOCK_RE = re.compile(
-    r"<start_(?:of_)?function_call>(.*?)<end_(?:of_)?function_call>",
-    re.DOTALL,
-)
-
-
 def load_env(env_path: Path) -> None:
     if not env_path.exists():
         return
@@ -61,6 +56,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--prompt", action="append", default=[])
     parser.add_argument("--prompt_file", default=None)
     parser.add_argument("--max_new_tokens", type=int, default=256)
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Generate prompts in length-sorted, left-padded batches of this size",
+    )
     parser.add_argument(
         "--attn_implementation",
         default="eager",
@@ -111,48 +112,101 @@ def read_prompts(args: argparse.Namespace) -> List[str]:
     return prompts or DEFAULT_PROMPTS
 
 
-def coerce_value(value: str) -> object:
-    value = value.strip()
-    if value.lstrip("-").isdigit():
-        return int(value)
-    try:
-        return float(value)
-    except ValueError:
-        return value
-
-
-def parse_parameters(params_str: str) -> dict:
-    params: dict = {}
-    if not params_str.strip():
-        return params
-    for key, value in re.findall(r"(\w+):<escape>([^<]*)<escape>", params_str):
-        params[key] = coerce_value(value)
-    return params
-
-
-def parse_function_calls(output: str) -> List[dict]:
-    segments = CALL_BLOCK_RE.findall(output)
-    if not segments and "call:" in output:
-        segments = [output]
-
-    calls: List[dict] = []
-    for segment in segments:
-        text = segment.strip()
-        if text.startswith("call:"):
-            text = text[5:]
-        brace_start = text.find("{")
-        brace_end = text.rfind("}")
-        if brace_start == -1 or brace_end == -1 or brace_end < brace_start:
-            continue
-        function_name = text[:brace_start].strip()
-        params_str = text[brace_start + 1 : brace_end]
-        calls.append(
-            {
-                "function_name": function_name,
-                "parameters": parse_parameters(params_str),
-            }
-        )
-    return calls
+def build_inputs(processor: AutoProcessor, system_prompt: str, prompt: str) -> dict:
+    messages = [
+        {"role": "developer", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    return processor.apply_chat_template(
+        messages,
+        tools=HOME_FUNCTION_SCHEMAS,
+        add_generation_prompt=True,
+        return_dict=True,
+        return_tensors="pt",
+    )
+
+
+def eos_token_ids(model: AutoModelForCausalLM, tokenizer) -> set:
+    eos_ids = model.generation_config.eos_token_id
+    if eos_ids is None:
+        return {tokenizer.eos_token_id}
+    if isinstance(eos_ids, int):
+        return {eos_ids}
+    return set(eos_ids)
+
+
+def generate_single(
+    model: AutoModelForCausalLM,
+    processor: AutoProcessor,
+    tokenizer,
+    system_prompt: str,
+    prompts: List[str],
+    args: argparse.Namespace,
+    device: torch.device,
+) -> Iterator[tuple[int, str, int]]:
+    for idx, prompt in enumerate(prompts):
+        inputs = build_inputs(processor, system_prompt, prompt)
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+
+        with torch.inference_mode():
+            output_ids = model.generate(
+                **inputs,
+                max_new_tokens=args.max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=False,
+            )
+
+        generated_ids = output_ids[0][inputs["input_ids"].shape[1] :]
+        output_text = tokenizer.decode(generated_ids, skip_special_tokens=False).strip()
+        yield idx, output_text, len(generated_ids)
+
+
+def generate_batched(
+    model: AutoModelForCausalLM,
+    processor: AutoProcessor,
+    tokenizer,
+    system_prompt: str,
+    prompts: List[str],
+    args: argparse.Namespace,
+    device: torch.device,
+) -> Iterator[tuple[int, str, int]]:
+    """Length-sorted, left-padded batch generation (greedy, same output as single)."""
+    tokenized = [
+        build_inputs(processor, system_prompt, prompt)["input_ids"][0].tolist()
+        for prompt in prompts
+    ]
+    order = sorted(range(len(prompts)), key=lambda i: len(tokenized[i]))
+    pad_id = tokenizer.pad_token_id
+    stop_ids = eos_token_ids(model, tokenizer)
+
+    for start in range(0, len(order), args.batch_size):
+        chunk = order[start : start + args.batch_size]
+        max_len = max(len(tokenized[i]) for i in chunk)
+        input_ids = torch.full((len(chunk), max_len), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(chunk), max_len), dtype=torch.long)
+        for row, i in enumerate(chunk):
+            ids = tokenized[i]
+            input_ids[row, max_len - len(ids) :] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, max_len - len(ids) :] = 1
+
+        with torch.inference_mode():
+            output_ids = model.generate(
+                input_ids=input_ids.to(device),
+                attention_mask=attention_mask.to(device),
+                max_new_tokens=args.max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=False,
+            )
+
+        for row, i in enumerate(chunk):
+            generated = output_ids[row][max_len:].tolist()
+            # Drop padding emitted after this sequence finished.
+            for position, token_id in enumerate(generated):
+                if token_id in stop_ids:
+                    generated = generated[: position + 1]
+                    break
+            output_text = tokenizer.decode(generated, skip_special_tokens=False).strip()
+            yield i, output_text, len(generated)
 
 
 def main() -> None:
@@ -187,55 +241,56 @@ def main() -> None:
         output_path.parent.mkdir(parents=True, exist_ok=True)
         output_handle = output_path.open("w", encoding="utf-8")
 
-    for idx, prompt in enumerate(prompts, start=1):
-        messages = [
-            {"role": "developer", "content": system_prompt},
-            {"role": "user", "content": prompt},
-        ]
-        inputs = processor.apply_chat_template(
-            messages,
-            tools=HOME_FUNCTION_SCHEMAS,
-            add_generation_prompt=True,
-            return_dict=True,
-            return_tensors="pt",
-        )
-        inputs = {k: v.to(device) for k, v in inputs.items()}
+    generate = generate_batched if args.batch_size > 1 else generate_single
+    outputs: List[str | None] = [None] * len(prompts)
+    generated_tokens = 0
+    next_idx = 0
+    started = time.perf_counter()
+
+    for i, output_text, num_tokens in generate(
+        model, processor, tokenizer, system_prompt, prompts, args, device
+    ):
+        outputs[i] = output_text
+        generated_tokens += num_tokens
+
+        # Emit results in prompt order as soon as they are available.
+        while next_idx < len(prompts) and outputs[next_idx] is not None:
+            idx = next_idx + 1
+            prompt = prompts[next_idx]
+            output_text = outputs[next_idx]
+            next_idx += 1
+            calls = parse_function_calls(output_text)
+
+            result = {
+                "index": idx,
+                "prompt": prompt,
+                "raw_output": output_text,
+                "parsed_calls": calls,
+                "model_id": args.model_id,
+                "adapter_dir": None if args.no_adapter else args.adapter_dir,
+            }
 
-        with torch.inference_mode():
-            output_ids = model.generate(
-                **inputs,
-                max_new_tokens=args.max_new_tokens,
-                pad_token_id=tokenizer.eos_token_id,
-                do_sample=False,
-            )
+            if output_handle:
+                output_handle.write(json.dumps(result, ensure_ascii=False) + "\n")
 
-        generated_ids = output_ids[0][inputs["input_ids"].shape[1] :]
-        output_text = tokenizer.decode(generated_ids, skip_special_tokens=False).strip()
-        calls = parse_function_calls(output_text)
-
-        result = {
-            "index": idx,
-            "prompt": prompt,
-            "raw_output": output_text,
-            "parsed_calls": calls,
-            "model_id": args.model_id,
-            "adapter_dir": None if args.no_adapter else args.adapter_dir,
-        }
-
-        if output_handle:
-            output_handle.write(json.dumps(result, ensure_ascii=False) + "\n")
-
-        if not args.quiet:
-            print("=" * 80)
-            print(f"[{idx}] USER: {prompt}")
-            print("RAW OUTPUT:")
-            print(output_text)
-            print("PARSED CALLS:")
-            print(json.dumps(calls, ensure_ascii=False, indent=2))
+            if not args.quiet:
+                print("=" * 80)
+                print(f"[{idx}] USER: {prompt}")
+                print("RAW OUTPUT:")
+                print(output_text)
+                print("PARSED CALLS:")
+                print(json.dumps(calls, ensure_ascii=False, indent=2))
 
+    elapsed = time.perf_counter() - started
     if output_handle:
         output_handle.close()
 
+    print(
+        f"prompts={len(prompts)} batch_size={args.batch_size} elapsed={elapsed:.2f}s "
+        f"prompts/s={len(prompts) / elapsed:.2f} tokens/s={generated_tokens / elapsed:.1f}",
+        file=sys.stderr,
+    )
+
 
 if __name__ == "__main__":
     main()